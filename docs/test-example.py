@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
-from sputnik import runner
 from sputnik import TestHarness
+from sputnik.runner import runner
 
 # This example is built for version 0.2
 class name_of_test:
@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 
 setup(
     name='sputnik',
@@ -7,5 +7,7 @@ setup(
     author_email='ppmx@users.noreply.github.com',
     packages=['sputnik'],
     description='testing framework (current research project)',
+    entry_points={
+        'console_scripts': ['sputnik = sputnik.cli:main'],
+    },
 )
-
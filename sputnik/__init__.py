@@ -1,4 +1,23 @@
 #!/usr/bin/env python3
 
-from sputnik.crafter import *
+# The crafter (and everything it needs) is imported on the first access of one of its names,
+# so tools like 'sputnik rename' don't pay for it.
 
+# public names of the package -> module defining them:
+_LAZY = {
+    'TestHarness': 'sputnik.crafter',
+    'indent': 'sputnik.tools',
+}
+
+# the function runner() is imported from sputnik.runner, binding it here would shadow the module:
+__all__ = list(_LAZY)
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module 'sputnik' has no attribute '{name}'")
+
+    import importlib
+
+    value = getattr(importlib.import_module(_LAZY[name]), name)
+    globals()[name] = value
+    return value
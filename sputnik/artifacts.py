@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+
+""" This module holds a content-addressed cache of build artifacts, so the library blobs of the
+builder (see prebuild.py) and the targets of TestHarness.build_target() are built only once for
+all build hosts and CI workers sharing the cache.
+
+The cache holds two kinds of entries:
+
+- objects: the content of a file, addressed by its sha256 hash. The hash is verified whenever
+  an object is read, corrupt objects are removed.
+- actions: a JSON description of the outputs of a build step (relative path -> object and file
+  mode), addressed by the hash of every input of that step (see key()).
+
+Every entry is stored in a local directory. A remote backend is consulted on local misses and
+receives every stored entry, it is either a directory on a shared filesystem or an HTTP server
+(see serve()). Writes are atomic (temporary file and rename), so concurrent builds never read
+partial entries. The local directory is shrunk to its size limit by removing the least
+recently used entries.
+
+The cache is configured by the "cache" section of the crafter (or builder) configuration:
+
+    "cache": {
+        "directory": "~/.cache/sputnik",
+        "remote": "http://cache.example.org:8741",
+        "max_size": 10737418240
+    }
+
+Example:
+
+    $ python -m sputnik.artifacts -d /srv/sputnik-cache serve -p 8741
+    $ python -m sputnik.artifacts -d ~/.cache/sputnik stats
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import time
+
+KINDS = ["objects", "actions"]
+
+DEFAULT_DIRECTORY = "~/.cache/sputnik"
+DEFAULT_PORT = 8741
+
+# temporary files older than this (in seconds) are left over by killed writers:
+STALE = 3600
+
+HASH = re.compile(r"^[0-9a-f]{64}$")
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def key(*parts):
+    """ Combine the given JSON serializable inputs of a build step into the key of its action. """
+
+    return digest(json.dumps(parts, sort_keys=True).encode())
+
+@functools.lru_cache(maxsize=None)
+def tool_version(path):
+    """ Returns:
+        The output of 'path --version' without the path of the tool, so the keys of the
+        hosts sharing a cache only depend on the versions of their tools.
+    """
+
+    try:
+        proc = subprocess.run([path, '--version'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return f"{os.path.basename(path)} unavailable"
+
+    lines = proc.stdout.decode(errors='replace').splitlines()
+
+    # clang and opt print their installation directory:
+    return '\n'.join(l for l in lines if not l.strip().startswith('InstalledDir:')).replace(path, os.path.basename(path))
+
+def directory_digest(path):
+    """ Returns:
+        The hash of the relative paths and the contents of every file below path or None if
+        path isn't a directory.
+    """
+
+    if not os.path.isdir(path):
+        return None
+
+    h = hashlib.sha256()
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        for name in sorted(names):
+            full = os.path.join(root, name)
+            with open(full, 'rb') as f:
+                h.update(os.path.relpath(full, path).encode() + b'\0' + digest(f.read()).encode() + b'\n')
+
+    return h.hexdigest()
+
+def valid(kind, name):
+    return kind in KINDS and bool(HASH.match(name))
+
+class LocalBackend:
+    """ This backend stores the entries inside a directory (<root>/<kind>/<xx>/<key>). It is
+    used for the local cache and for caches on a shared filesystem. """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.logger = logging.getLogger("artifacts")
+
+    def __repr__(self):
+        return self.root
+
+    def path(self, kind, name):
+        return os.path.join(self.root, kind, name[:2], name)
+
+    def contains(self, kind, name):
+        return os.path.isfile(self.path(kind, name))
+
+    def get(self, kind, name):
+        """ Returns:
+            The content of the entry or None if there is no such entry.
+        """
+
+        path = self.path(kind, name)
+
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        if kind == "objects" and digest(data) != name:
+            self.logger.warning(f"remove corrupt object '{path}'")
+            self.remove(path)
+            return None
+
+        # the modification time tracks the last use (see evict()):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return data
+
+    def put(self, kind, name, data):
+        path = self.path(kind, name)
+
+        if kind == "objects" and os.path.isfile(path):
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            self.remove(tmp)
+            raise
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        """ Returns:
+            A list of tuples (mtime, size, path) of every entry.
+        """
+
+        entries = list()
+        now = time.time()
+
+        for kind in KINDS:
+            for directory, _, files in os.walk(os.path.join(self.root, kind)):
+                for name in files:
+                    path = os.path.join(directory, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+
+                    if name.startswith(".tmp_"):
+                        if now - st.st_mtime > STALE:
+                            self.remove(path)
+                        continue
+
+                    entries.append((st.st_mtime, st.st_size, path))
+
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_size, keep=()):
+        """ Remove the least recently used entries until the entries take at most max_size
+        bytes.
+
+        Args:
+            max_size: maximal number of bytes of the entries
+            keep: entries as tuples (kind, name) that are never removed (like the entries of
+                the build step stored just now)
+
+        Returns:
+            The number of removed bytes.
+        """
+
+        keep = {self.path(kind, name) for kind, name in keep}
+
+        entries = sorted(self.entries())
+        size = sum(s for _, s, _ in entries)
+        removed = 0
+
+        for _, s, path in entries:
+            if size - removed <= max_size:
+                break
+            if path in keep:
+                continue
+            self.remove(path)
+            removed += s
+
+        if removed:
+            self.logger.info(f"evicted {removed} bytes from '{self.root}'")
+
+        return removed
+
+class HTTPBackend:
+    """ This backend talks to a cache server (see serve()) by GET, HEAD and PUT requests on
+    <url>/<kind>/<key>. """
+
+    def __init__(self, url, timeout=60):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def __repr__(self):
+        return self.url
+
+    def request(self, method, kind, name, data=None):
+        import urllib.request
+
+        request = urllib.request.Request(f"{self.url}/{kind}/{name}", data=data, method=method)
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def contains(self, kind, name):
+        import urllib.error
+
+        try:
+            self.request('HEAD', kind, name).close()
+            return True
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return False
+            raise
+
+    def get(self, kind, name):
+        import urllib.error
+
+        try:
+            with self.request('GET', kind, name) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    def put(self, kind, name, data):
+        self.request('PUT', kind, name, data).close()
+
+def backend(location):
+    """ Returns:
+        The backend for the given location: an HTTPBackend for http(s) URLs and a LocalBackend
+        for every other path.
+    """
+
+    if location.startswith("http://") or location.startswith("https://"):
+        return HTTPBackend(location)
+    return LocalBackend(location)
+
+class ArtifactCache:
+    """ This class combines the local backend and the optional remote backend. Failures of the
+    remote backend are logged, but never fail a build. """
+
+    def __init__(self, local, remote=None, max_size=None):
+        """ Args:
+            local: LocalBackend instance
+            remote: backend instance or None
+            max_size: maximal size of the local backend in bytes (None: unlimited)
+        """
+
+        self.local, self.remote, self.max_size = local, remote, max_size
+        self.logger = logging.getLogger("artifacts")
+
+    def get(self, kind, name):
+        data = self.local.get(kind, name)
+
+        if data is not None or self.remote is None:
+            return data
+
+        try:
+            data = self.remote.get(kind, name)
+        except Exception as e:
+            self.logger.warning(f"remote cache '{self.remote}' failed: {e}")
+            return None
+
+        if data is None:
+            return None
+
+        if kind == "objects" and digest(data) != name:
+            self.logger.warning(f"remote cache '{self.remote}' sent a corrupt object {name}")
+            return None
+
+        self.local.put(kind, name, data)
+        return data
+
+    def put(self, kind, name, data):
+        self.local.put(kind, name, data)
+
+        if self.remote is None:
+            return
+
+        try:
+            if kind != "objects" or not self.remote.contains(kind, name):
+                self.remote.put(kind, name, data)
+        except Exception as e:
+            self.logger.warning(f"remote cache '{self.remote}' failed: {e}")
+
+    def store(self, name, directory, files):
+        """ Store the given output files of a build step.
+
+        Args:
+            name: key of the build step (see key())
+            directory: directory the paths of the files are relative to
+            files: list of relative paths of the output files
+        """
+
+        outputs = dict()
+
+        for path in sorted(files):
+            with open(os.path.join(directory, path), 'rb') as f:
+                data = f.read()
+
+            obj = digest(data)
+            self.put("objects", obj, data)
+
+            mode = os.stat(os.path.join(directory, path)).st_mode & 0o777
+            outputs[path] = {'object': obj, 'mode': mode}
+
+        self.put("actions", name, json.dumps({'files': outputs}, indent=4).encode())
+
+        if self.max_size is not None:
+            keep = [("actions", name)] + [("objects", o['object']) for o in outputs.values()]
+            self.local.evict(self.max_size, keep)
+
+    def restore(self, name, directory):
+        """ Restore the output files of a build step into directory. Nothing is written unless
+        every output is available.
+
+        Returns:
+            The list of the restored relative paths or None on a miss.
+        """
+
+        action = self.get("actions", name)
+        if action is None:
+            return None
+
+        try:
+            outputs = json.loads(action)['files']
+        except (ValueError, KeyError):
+            self.logger.warning(f"broken action {name}")
+            return None
+
+        contents = dict()
+        for path, output in outputs.items():
+            contents[path] = self.get("objects", output['object'])
+            if contents[path] is None:
+                return None
+
+        for path, output in outputs.items():
+            dest = os.path.join(directory, path)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+            fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=os.path.dirname(dest))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(contents[path])
+            os.chmod(tmp, output['mode'])
+            os.replace(tmp, dest)
+
+        return sorted(outputs)
+
+def from_config(config):
+    """ Returns:
+        The ArtifactCache described by config['cache'] or None if there is no such section.
+    """
+
+    section = config.get('cache')
+    if not section:
+        return None
+
+    local = LocalBackend(section.get('directory', DEFAULT_DIRECTORY))
+    remote = backend(section['remote']) if section.get('remote') else None
+
+    return ArtifactCache(local, remote, section.get('max_size'))
+
+def snapshot(directory):
+    """ Returns:
+        A dictionary mapping the relative path of every file below directory to its
+        modification time and size.
+    """
+
+    files = dict()
+
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            files[os.path.relpath(path, directory)] = (st.st_mtime_ns, st.st_size)
+
+    return files
+
+def changed(directory, before):
+    """ Returns:
+        The relative paths of the files below directory that were created or modified since
+        the given snapshot was taken.
+    """
+
+    return sorted(p for p, s in snapshot(directory).items() if before.get(p) != s)
+
+def serve(root, host='', port=DEFAULT_PORT):
+    """ Serve the directory root as remote cache over HTTP (see HTTPBackend). Objects are only
+    accepted if their content matches their key. """
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    store = LocalBackend(root)
+    logger = logging.getLogger("artifacts")
+
+    class Handler(BaseHTTPRequestHandler):
+        def entry(self):
+            parts = self.path.strip('/').split('/')
+            if len(parts) != 2 or not valid(*parts):
+                self.send_error(400, "invalid entry")
+                return None
+            return parts
+
+        def reply(self, body):
+            entry = self.entry()
+            if entry is None:
+                return
+
+            data = store.get(*entry)
+            if data is None:
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if body:
+                self.wfile.write(data)
+
+        def do_GET(self):
+            self.reply(True)
+
+        def do_HEAD(self):
+            self.reply(False)
+
+        def do_PUT(self):
+            entry = self.entry()
+            if entry is None:
+                return
+
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            if entry[0] == "objects" and digest(data) != entry[1]:
+                self.send_error(400, "content doesn't match the key")
+                return
+
+            store.put(*entry, data)
+            self.send_response(201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    logger.info(f"serve '{store.root}' on port {server.server_address[1]}")
+
+    return server
+
+def main():
+    """ This function is called if this script should be run standalone. """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage the cache of build artifacts')
+    parser.add_argument('-d', '--directory', default=DEFAULT_DIRECTORY, help='directory of the cache')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('serve', help='serve the cache over HTTP')
+    p.add_argument('-H', '--host', default='', help='address to listen on')
+    p.add_argument('-p', '--port', type=int, default=DEFAULT_PORT, help='port to listen on')
+
+    sub.add_parser('stats', help='print the size of the cache')
+
+    p = sub.add_parser('evict', help='shrink the cache')
+    p.add_argument('-s', '--size', type=int, required=True, help='maximal size in bytes')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(name)s | %(levelname)s | %(message)s")
+
+    if args.command == 'serve':
+        server = serve(args.directory, args.host, args.port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    elif args.command == 'stats':
+        entries = LocalBackend(args.directory).entries()
+        print(f"[+] {len(entries)} entries, {sum(s for _, s, _ in entries)} bytes")
+    elif args.command == 'evict':
+        removed = LocalBackend(args.directory).evict(args.size)
+        print(f"[+] removed {removed} bytes")
+
+if __name__ == "__main__":
+    main()
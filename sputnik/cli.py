@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+""" This module is the 'sputnik' command. Every subcommand is the main() of one module, which is
+imported only when that subcommand runs, so quick commands don't pay for the crafter.
+
+Example:
+
+    $ sputnik prebuild -c ./configs/config_builder.json -w
+    $ sputnik craft tests/isalnum.py:isalnum -c ./configs/config_crafter.json -w 4 8
+    $ sputnik run ./targets/*/*/*.bc -b 3600
+    $ sputnik imports
+"""
+
+import sys
+
+# subcommand -> (module, description):
+COMMANDS = {
+    'prebuild':    ('sputnik.prebuild', "build the blobs of the libraries"),
+    'introduce':   ('sputnik.introduce', "write the default config of a library"),
+    'rename':      ('sputnik.rename', "rename the symbols of LLVM IR code"),
+    'craft':       ('sputnik.runner', "build test harnesses of test classes"),
+    'run':         ('sputnik.scheduler', "run KLEE on built targets with a time budget"),
+    'replay':      ('sputnik.replay', "replay KLEE test cases on every library"),
+    'widths':      ('sputnik.widths', "report the KLEE tests per array width"),
+    'triage':      ('sputnik.triage', "deduplicate and minimize findings"),
+    'seeds':       ('sputnik.seeds', "seed a fuzzing target with KLEE test cases"),
+    'concrete':    ('sputnik.concrete', "run a concrete test harness on generated inputs"),
+    'coverage':    ('sputnik.coverage', "collect and rank the coverage of the libraries"),
+    'symbols':     ('sputnik.symbols', "query the symbol index of a library"),
+    'equivalence': ('sputnik.equivalence', "cluster the implementations statically"),
+    'cache':       ('sputnik.artifacts', "manage the cache of build artifacts"),
+    'daemon':      ('sputnik.daemon', "build test harnesses by a resident daemon"),
+    'imports':     ('sputnik.cli', "measure the import time of every subcommand"),
+}
+
+def usage():
+    lines = ["usage: sputnik <command> [<args>]", "", "commands:"]
+    lines += [f"  {name:<12} {description}" for name, (_, description) in COMMANDS.items()]
+    lines += ["", "Run 'sputnik <command> -h' for the arguments of a command."]
+    return '\n'.join(lines)
+
+def measure(module, repeat=5):
+    """ Measure the time a fresh interpreter needs to import the given module.
+
+    Returns:
+        The minimal time over repeat runs in seconds.
+    """
+
+    import subprocess
+
+    code = ("import time; t = time.perf_counter(); "
+            f"import {module}; print(time.perf_counter() - t)")
+
+    times = list()
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True)
+        times.append(float(proc.stdout))
+
+    return min(times)
+
+def benchmark():
+    """ Print the import time of the module of every subcommand. """
+    import argparse
+    import subprocess
+
+    parser = argparse.ArgumentParser(description='Measure the import time of every subcommand')
+    # no choices=: argparse checks the empty list of nargs='*' against them and rejects it
+    parser.add_argument('commands', nargs='*', default=None, metavar='command', help='subcommands (default: all)')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='runs per module (the fastest counts)')
+    parser.add_argument('-d', '--detail', action='store_true', help='show the slowest imports of every module (-X importtime)')
+    args = parser.parse_args()
+
+    unknown = [c for c in args.commands or [] if c not in COMMANDS]
+    if unknown:
+        parser.error(f"unknown subcommands {', '.join(unknown)} (choose from {', '.join(COMMANDS)})")
+
+    commands = args.commands or [c for c in COMMANDS if c != 'imports']
+    modules = ['sputnik', 'sputnik.cli'] + [COMMANDS[c][0] for c in commands]
+
+    for module in modules:
+        print(f"{module:<22} {measure(module, args.repeat) * 1000:8.1f} ms")
+
+        if not args.detail:
+            continue
+
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                              stderr=subprocess.PIPE, text=True)
+
+        # lines like 'import time:       150 |        300 | name' (self and cumulative time):
+        imports = list()
+        for line in proc.stderr.splitlines()[1:]:
+            fields = line.split('|')
+            if len(fields) == 3:
+                imports.append((int(fields[1]), fields[2].rstrip()))
+
+        for cumulative, name in sorted(imports, reverse=True)[1:6]:
+            print(f"    {name:<30} {cumulative / 1000:8.1f} ms")
+
+    return 0
+
+def main(argv=None):
+    """ Run the subcommand given by argv (default: sys.argv[1:]).
+
+    Returns:
+        The exit status of the subcommand.
+    """
+
+    argv = sys.argv[1:] if argv is None else argv
+
+    if not argv or argv[0] in ['-h', '--help']:
+        print(usage())
+        return 0
+
+    command, args = argv[0], argv[1:]
+
+    if command not in COMMANDS:
+        print(f"sputnik: unknown command '{command}'\n", file=sys.stderr)
+        print(usage(), file=sys.stderr)
+        return 2
+
+    # the module parses sys.argv itself:
+    sys.argv = [f"sputnik {command}"] + args
+
+    if command == 'imports':
+        return benchmark()
+
+    import importlib
+
+    status = importlib.import_module(COMMANDS[command][0]).main()
+    return status if isinstance(status, int) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,6 +16,7 @@ Example:
     /tmp/isalnum.bc: LLVM IR bitcode
 """
 
+import asyncio
 import subprocess
 import os
 
@@ -25,6 +26,14 @@ COMPILER     = TOOLS + "clang"
 LINKER       = TOOLS + "llvm-link"
 ASSEMBLER    = TOOLS + "llvm-as"
 DISASSEMBLER = TOOLS + "llvm-dis"
+OPTIMIZER    = TOOLS + "opt"
+
+# flags to instrument code for gcov (see coverage.py):
+COVERAGE_FLAGS = "--coverage"
+
+# flags to instrument code for libFuzzer and to link its driver (see TestHarness.build_target_libfuzzer()):
+FUZZER_FLAGS = "-fsanitize=fuzzer-no-link"
+FUZZER_LINK_FLAGS = "-fsanitize=fuzzer"
 
 class CompileError(Exception):
     pass
@@ -54,7 +63,20 @@ def compile_collection(srcs, cflags, cwd):
 
     return files, stats
 
+# function that runs the commands of run_command() instead of a blocking subprocess. It is set
+# while an orchestrator.Orchestrator is active, so the toolchain steps of synchronous builds
+# become asynchronous tasks of its event loop.
+dispatcher = None
+
 def run_command(call, cwd=None):
+    if dispatcher is not None:
+        return dispatcher(call, cwd)
+
+    return run_process(call, cwd)
+
+def run_process(call, cwd=None):
+    """ Run the shell command call as blocking subprocess. """
+
     proc = subprocess.run(call, shell=True, stderr=subprocess.PIPE, cwd=cwd)
 
     if proc.returncode != 0:
@@ -62,6 +84,17 @@ def run_command(call, cwd=None):
 
     return proc.stderr.decode() if proc.stderr else None
 
+async def run_command_async(call, cwd=None):
+    """ This is the awaitable variant of run_command(). """
+
+    proc = await asyncio.create_subprocess_shell(call, stderr=asyncio.subprocess.PIPE, cwd=cwd)
+    _, stderr = await proc.communicate()
+
+    if proc.returncode != 0:
+        raise CompileError(stderr.decode())
+
+    return stderr.decode() if stderr else None
+
 def compile_file(dest, src, cflags, cwd=None):
     """ This function invokes the compiler binary to generate a file dest based on cflags and on
     the input file src. It returns a warning string if the compiler raised one or None otherwise.
@@ -85,3 +118,27 @@ def disassemble(dest, src):
 def assemble(dest, src):
     call = f"{ASSEMBLER} -o {dest} {src}"
     return run_command(call)
+
+def optimize(dest, src, args=''):
+    """ This function invokes the optimizer binary on src with the given passes in args. """
+
+    call = f"{OPTIMIZER} {args} -o {dest} {src}"
+    return run_command(call)
+
+def strip(dest, src, symbols):
+    """ This function internalizes every symbol of src except the given symbols and removes
+    everything that isn't reachable from those symbols afterwards. The list of kept symbols is
+    stored next to dest as dest + '.symbols'.
+
+    Args:
+        dest: path to the stripped module
+        src: path to the module that should be stripped
+        symbols: iterable of symbol names (without leading '@') that should be kept
+    """
+
+    symbols_file = dest + '.symbols'
+
+    with open(symbols_file, 'w') as f:
+        f.write('\n'.join(symbols) + '\n')
+
+    return optimize(dest, src, f"-internalize -internalize-public-api-file={symbols_file} -globaldce")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+""" This module runs the concrete test harnesses (see TestHarness.set_engine_concrete()). Such
+a test harness is a shared object exporting sputnik_batch() which runs every library on every
+input record of a batch. The inputs are generated in bulk with NumPy and the outputs of the
+libraries are compared and clustered vectorized.
+
+Example:
+
+    $ python -m sputnik.concrete ./targets/isalnum/isalnum.so -n 1000000
+"""
+
+import ctypes
+import json
+
+from sputnik.inputs import InputLayout, numpy
+
+# status of a library that didn't run because the input violates an assumption:
+SKIPPED = 255
+
+# number of records that are passed to the shared object at once:
+BATCH_SIZE = 1 << 16
+
+class ConcreteTarget:
+    """ This class loads a concrete test harness and runs input records on it. """
+
+    def __init__(self, path):
+        """ Args:
+            path: path to the shared object built by TestHarness.build_target_concrete()
+        """
+
+        self.path = path
+
+        with open(path.rsplit('.', 1)[0] + '.json') as f:
+            description = json.load(f)
+
+        self.function = description['function']
+        self.libs = description['libs']
+        self.ret = description.get('ret')
+        self.pointers = description.get('outputs', list())
+
+        # library name -> object instrumented for gcov (or None without coverage mode):
+        self.coverage = description.get('coverage')
+
+        self.so = ctypes.CDLL(path)
+        self.so.sputnik_batch.restype = ctypes.c_int
+        self.so.sputnik_batch.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p, ctypes.c_void_p]
+
+        size = lambda name: ctypes.c_size_t.in_dll(self.so, name).value
+
+        self.record_size = size('sputnik_record_size')
+        self.output_size = size('sputnik_output_size')
+
+        sizes = (ctypes.c_size_t * len(description['inputs'])).in_dll(self.so, 'sputnik_input_sizes')
+        self.layout = InputLayout(description['inputs'], list(sizes))
+
+        assert self.layout.record_size == self.record_size
+
+    def decode_output(self, output):
+        """ Split the output of a library into a dictionary mapping 'return' and the names of
+        the pointer arguments to their values. Returned pointers are described by the argument
+        they point to. """
+
+        layout = InputLayout(self.pointers)
+        ret_size = len(output) - layout.record_size
+        values = dict()
+
+        if ret_size and self.ret['ptr_depth']:
+            ptr = int.from_bytes(bytes(output[:ret_size]), 'little', signed=True)
+            if ptr == -1:
+                values['return'] = "NULL"
+            elif ptr == -2:
+                values['return'] = "<unknown pointer>"
+            else:
+                values['return'] = f"{self.pointers[ptr >> 16]['name']} + {ptr & 0xffff}"
+        elif ret_size:
+            ret = InputLayout([self.ret], [ret_size])
+            values['return'] = ret.unpack(bytes(output[:ret_size]))[self.ret['name']]
+
+        values.update(layout.unpack(bytes(output[ret_size:])))
+
+        return values
+
+    def run(self, records):
+        """ Run every library on every record.
+
+        Args:
+            records: NumPy array of shape (n, self.record_size) and type uint8
+
+        Returns:
+            A tuple (outputs, status) of NumPy arrays. outputs has the shape (n, libs,
+            self.output_size) and holds the output of every library for every record. status
+            has the shape (n, libs) and holds 0 if the library returned, SKIPPED if the record
+            violates an assumption or the number of the signal that crashed the library.
+        """
+
+        np = numpy()
+
+        records = np.ascontiguousarray(records, dtype=np.uint8)
+        n, libs = len(records), len(self.libs)
+
+        outputs = np.zeros((n, libs, self.output_size), dtype=np.uint8)
+        status = np.zeros((n, libs), dtype=np.uint8)
+
+        for start in range(0, n, BATCH_SIZE):
+            stop = min(start + BATCH_SIZE, n)
+            self.so.sputnik_batch(
+                records[start:stop].ctypes.data, stop - start,
+                outputs[start:stop].ctypes.data, status[start:stop].ctypes.data
+            )
+
+        return outputs, status
+
+    def dump_coverage(self):
+        """ Write the coverage counters of the libraries to their .gcda files and reset them (see
+        coverage.py). Nothing happens if the test harness isn't built in coverage mode. """
+
+        if self.coverage:
+            self.so.sputnik_coverage_dump()
+
+def cluster(outputs, status):
+    """ Cluster the libraries for every record like verifier() of the test harness does: two
+    libraries are in the same cluster if their outputs and their status are equal.
+
+    Args:
+        outputs, status: the result of ConcreteTarget.run()
+
+    Returns:
+        A NumPy array of shape (n, libs). The cluster of a library is 1 + the index of the
+        first library that is equal to it.
+    """
+
+    np = numpy()
+
+    n, libs, size = outputs.shape
+    assignments = np.empty((n, libs), dtype=np.int64)
+
+    # compare in chunks to limit the memory of the (chunk, libs, libs, size) comparison:
+    chunk = max(1, (1 << 24) // max(1, libs * libs * max(size, 1)))
+
+    for start in range(0, n, chunk):
+        o = outputs[start:start + chunk]
+        s = status[start:start + chunk]
+
+        equal = (o[:, :, None, :] == o[:, None, :, :]).all(axis=3)
+        equal &= s[:, :, None] == s[:, None, :]
+
+        assignments[start:start + chunk] = equal.argmax(axis=2) + 1
+
+    return assignments
+
+def assignment_string(libs, assignment):
+    """ Format the assignment of the libraries to clusters like the message of verifier(). """
+
+    return ''.join(f"{lib}:{cluster}\n" for lib, cluster in zip(libs, assignment))
+
+def check(target, records):
+    """ Run the records on the target and collect every divergence.
+
+    Args:
+        target: ConcreteTarget instance
+        records: NumPy array of input records
+
+    Returns:
+        A dictionary holding the number of executed and skipped records, the number of
+        divergent records and for every distinct assignment of the libraries to clusters the
+        number of records and the first record that leads to that assignment.
+    """
+
+    np = numpy()
+
+    outputs, status = target.run(records)
+    assignments = cluster(outputs, status)
+
+    valid = (status != SKIPPED).all(axis=1)
+    divergent = valid & (assignments != 1).any(axis=1)
+
+    report = {
+        'function': target.function,
+        'executed': int(valid.sum()),
+        'skipped': int((~valid).sum()),
+        'divergent': int(divergent.sum()),
+        'clusters': list(),
+    }
+
+    if divergent.any():
+        patterns, first, counts = np.unique(assignments[divergent], axis=0, return_index=True, return_counts=True)
+        indices = np.flatnonzero(divergent)[first]
+
+        for pattern, index, count in zip(patterns, indices, counts):
+            report['clusters'].append({
+                'assignment': assignment_string(target.libs, pattern),
+                'count': int(count),
+                'input': {k: v.hex() if isinstance(v, bytes) else v
+                          for k, v in target.layout.unpack(records[index]).items()},
+                'status': status[index].tolist(),
+            })
+
+    return report
+
+def main():
+    """ This function is called if this script should be run standalone. """
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Run a concrete test harness on generated inputs')
+    parser.add_argument('target', help='path to the shared object of the concrete test harness')
+    parser.add_argument('-n', '--count', type=int, default=1 << 20, help='number of generated inputs')
+    parser.add_argument('-s', '--seed', type=int, default=None, help='seed of the input generation')
+    args = parser.parse_args()
+
+    target = ConcreteTarget(args.target)
+
+    start = time.time()
+    report = check(target, target.layout.generate(args.count, args.seed))
+    duration = time.time() - start
+
+    print(json.dumps(report, indent=4))
+    print(f"[+] {report['executed']} inputs checked on {len(target.libs)} libraries in {duration:.2f}s")
+
+if __name__ == "__main__":
+    main()
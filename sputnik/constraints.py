@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+""" This module holds declarative constraints on the input arguments of a test (see
+TestHarness.add_constraint()). A constraint is lowered to C code depending on the engine:
+
+- symex: a single klee_assume() of an expression without short-circuit operators, so KLEE
+  doesn't fork on the constraint itself
+- fuzzing: code that clamps the decoded input into the constrained domain, so afl-fuzz doesn't
+  waste executions on rejected inputs
+- concrete: the expression is used like any assumption (the record is skipped)
+
+input_space() counts the values every argument has left under its constraints, which gives the
+size of the input space of a test before KLEE is launched (see TestHarness.input_space()).
+
+Example:
+
+    self.add_constraint(constraints.Range('n', 0, 16))
+    self.add_constraint(constraints.Length('src', 0, 4))
+    self.add_constraint(constraints.Printable('src'))
+    self.add_constraint(constraints.Relation('n <= sizeof(dest)'))
+"""
+
+import math
+
+from sputnik.inputs import Field
+
+class Constraint:
+    """ Base class of the constraints. """
+
+    # name of the constrained argument (None if the constraint relates several arguments):
+    name = None
+
+    def expression(self, variable):
+        """ Returns:
+            A C expression that is true if and only if the argument satisfies the constraint.
+        """
+
+        raise NotImplementedError
+
+    def clamp(self, variable):
+        """ Returns:
+            A list of C code lines that change the argument so it satisfies the constraint or
+            None if the constraint can't be enforced by changing the input.
+        """
+
+        return None
+
+    def validate(self, variable):
+        """ Raise a ValueError if no value of the argument satisfies the constraint. """
+
+        return
+
+def conjunction(expressions):
+    return ' & '.join(f"({e})" for e in expressions) or "1"
+
+def disjunction(expressions):
+    return ' | '.join(f"({e})" for e in expressions) or "0"
+
+class Range(Constraint):
+    """ The integer argument name is in the range [low, high]. """
+
+    def __init__(self, name, low, high):
+        self.name, self.low, self.high = name, low, high
+
+    def validate(self, variable):
+        if self.low > self.high:
+            raise ValueError(f"empty range [{self.low}, {self.high}] of argument '{self.name}'")
+
+    def expression(self, variable):
+        return f"({self.name} >= {self.low}) & ({self.name} <= {self.high})"
+
+    def clamp(self, variable):
+        span = self.high - self.low + 1
+        value = f"(unsigned long long) {self.name} - (unsigned long long) ({self.low})"
+        return [f"if ({self.name} < {self.low} || {self.name} > {self.high}) "
+                f"{self.name} = ({variable.type}) ({self.low} + (long long) (({value}) % {span}ULL));"]
+
+class OneOf(Constraint):
+    """ The integer argument name is one of the given values. """
+
+    def __init__(self, name, values):
+        self.name, self.values = name, sorted(set(values))
+
+    def expression(self, variable):
+        return disjunction(f"{self.name} == {v}" for v in self.values)
+
+    def clamp(self, variable):
+        values = ', '.join(str(v) for v in self.values)
+        return [f"if (!({self.expression(variable)})) {{",
+                f"\tstatic const long long sputnik_values_{self.name}[] = {{ {values} }};",
+                f"\t{self.name} = ({variable.type}) sputnik_values_{self.name}"
+                f"[(unsigned long long) {self.name} % {len(self.values)}];",
+                "}"]
+
+class Length(Constraint):
+    """ The string argument name has a length (strlen()) in the range [low, high]. """
+
+    def __init__(self, name, low=0, high=None):
+        self.name, self.low, self.high = name, low, high
+
+    def bounds(self, variable):
+        high = variable.array_size - 1 if self.high is None else min(self.high, variable.array_size - 1)
+        return self.low, high
+
+    def validate(self, variable):
+        low, high = self.bounds(variable)
+        if low > high:
+            raise ValueError(f"length of argument '{self.name}' is at least {low}, "
+                             f"but at most {high} fits into its array")
+
+    def expression(self, variable):
+        low, high = self.bounds(variable)
+        expressions = [f"{self.name}[{i}] != '\\0'" for i in range(low)]
+        expressions.append(disjunction(f"{self.name}[{i}] == '\\0'" for i in range(high + 1)))
+        return conjunction(expressions)
+
+    def clamp(self, variable):
+        low, high = self.bounds(variable)
+        return [f"{self.name}[{high}] = '\\0';",
+                f"for (size_t sputnik_j = 0; sputnik_j < {low}; sputnik_j++) {{",
+                f"\tif ({self.name}[sputnik_j] == '\\0') {{",
+                f"\t\t{self.name}[sputnik_j] = 'A';",
+                f"\t\t{self.name}[sputnik_j + 1] = '\\0';",
+                "\t}",
+                "}"]
+
+class Printable(Constraint):
+    """ Every character of the string argument name (up to the null byte) is printable. """
+
+    def __init__(self, name):
+        self.name = name
+
+    def expression(self, variable):
+        return conjunction(f"({self.name}[{i}] == '\\0') | (({self.name}[{i}] >= 0x20) & ({self.name}[{i}] < 0x7f))"
+                           for i in range(variable.array_size - 1))
+
+    def clamp(self, variable):
+        return [f"for (size_t sputnik_j = 0; sputnik_j < {variable.array_size - 1} && {self.name}[sputnik_j]; sputnik_j++) {{",
+                f"\tif ({self.name}[sputnik_j] < 0x20 || {self.name}[sputnik_j] >= 0x7f)",
+                f"\t\t{self.name}[sputnik_j] = 0x20 + (unsigned char) {self.name}[sputnik_j] % 95;",
+                "}"]
+
+class Relation(Constraint):
+    """ An arbitrary C expression relating several arguments like 'n <= sizeof(dest)'. It can't
+    be clamped, so the fuzzing test harness rejects inputs violating it. """
+
+    def __init__(self, expression):
+        self._expression = expression
+
+    def expression(self, variable):
+        return self._expression
+
+def count_values(variable, constraints):
+    """ Count the values of a variable input argument satisfying the given constraints of that
+    argument. Strings are counted as distinct C strings (the bytes after the null byte don't
+    count), every other argument by its size on this host. """
+
+    field = Field(variable.name, variable.type, variable.ptr_depth, variable.array_size)
+
+    if field.isstring:
+        alphabet = 95 if any(isinstance(c, Printable) for c in constraints) else 255
+        low, high = 0, field.count - 1
+        for c in constraints:
+            if isinstance(c, Length):
+                low, high = max(low, c.bounds(variable)[0]), min(high, c.bounds(variable)[1])
+        return sum(alphabet ** n for n in range(low, high + 1))
+
+    if not field.integral or field.isarray:
+        return 256 ** field.size
+
+    low, high = field.limits()
+    values = None
+
+    for c in constraints:
+        if isinstance(c, Range):
+            low, high = max(low, c.low), min(high, c.high)
+        elif isinstance(c, OneOf):
+            values = set(c.values) if values is None else values & set(c.values)
+
+    if values is not None:
+        return len([v for v in values if low <= v <= high])
+    return max(0, high - low + 1)
+
+def input_space(variables, constraints):
+    """ Compute the size of the input space of the given variables under the constraints.
+
+    Args:
+        variables: list of language.Variable instances (the variable input arguments)
+        constraints: list of Constraint instances
+
+    Returns:
+        A dictionary with the number of values of every variable ('variables'), their product
+        ('total'), log2 of the total ('bits') and the relations that aren't considered
+        ('unconsidered'). The total is an upper bound if there are such relations.
+    """
+
+    space = {'variables': dict(), 'total': 1, 'bits': 0.0, 'unconsidered': list()}
+
+    for v in variables:
+        count = count_values(v, [c for c in constraints if c.name == v.name])
+        space['variables'][v.name] = count
+        space['total'] *= count
+
+    space['unconsidered'] = [c.expression(None) for c in constraints if c.name is None]
+    space['bits'] = round(math.log2(space['total']), 1) if space['total'] else 0.0
+
+    return space
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+
+""" This module measures which parts of the libraries the generated inputs exercise. In coverage
+mode the builder compiles every blob into an object instrumented for gcov (prebuild --coverage)
+and the concrete test harnesses link these objects ("coverage": true in the crafter config).
+Every input replayed on a concrete test harness adds to the counters (.gcda) of the library
+objects, no matter which test replayed it. The counters are summarized per library and per
+function into a SQLite database. The ranking lists the tested functions whose implementations
+(including every function they reach, see symbols.SymbolIndex.closure()) are covered worst,
+so the KLEE scheduler can start with them (scheduler.py -p).
+
+Example:
+
+    $ python -m sputnik.coverage collect ./concrete/strcpy.so --klee ./symex/klee-out-* --afl ./fuzzing/findings
+    $ python -m sputnik.coverage update -c ./configs/config_builder.json -d coverage.db
+    $ python -m sputnik.coverage rank -c ./configs/config_builder.json -d coverage.db -o ranking.json
+"""
+
+import glob
+import json
+import logging
+import os
+import re
+import sqlite3
+import subprocess
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from sputnik import ktest
+from sputnik.inputs import numpy
+
+# gcov of the toolchain (the gcov of GCC can't read the counters of clang):
+GCOV = "llvm-cov gcov"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS libs (
+    lib TEXT PRIMARY KEY,
+    gcda TEXT,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS functions (
+    lib TEXT,
+    function TEXT,
+    file TEXT,
+    called INTEGER,
+    lines INTEGER,
+    lines_hit INTEGER,
+    branches INTEGER,
+    branches_hit INTEGER,
+    PRIMARY KEY (lib, function, file)
+);
+"""
+
+# '        5:   12:    if (x) {' (the count is '-', '#####', '=====' or a number maybe followed by '*'):
+LINE = re.compile(r"^\s*([^:]+):\s*(\d+):")
+FUNCTION = re.compile(r"^function (\S+) called (\d+)")
+BRANCH = re.compile(r"^branch\s+\d+\s+(taken (\d+)|never executed)")
+
+def counters(lib):
+    """ Returns:
+        The path to the .gcda file of the library object instrumented for gcov.
+    """
+
+    return lib.coverage_target.rsplit('.', 1)[0] + '.gcda'
+
+def parse_gcov(lines):
+    """ Summarize the output of gcov -t -b -c per function.
+
+    Args:
+        lines: iterable of the lines written by gcov
+
+    Returns:
+        A dictionary mapping tuples (source file, function) to a dictionary with the keys
+        'called', 'lines', 'lines_hit', 'branches' and 'branches_hit'.
+    """
+
+    functions, source, current = dict(), None, None
+
+    for line in lines:
+        match = FUNCTION.match(line)
+        if match:
+            current = functions.setdefault((source, match.group(1)), {
+                'called': 0, 'lines': 0, 'lines_hit': 0, 'branches': 0, 'branches_hit': 0
+            })
+            current['called'] += int(match.group(2))
+            continue
+
+        match = BRANCH.match(line)
+        if match:
+            if current is not None:
+                current['branches'] += 1
+                current['branches_hit'] += 1 if match.group(2) and int(match.group(2)) else 0
+            continue
+
+        match = LINE.match(line)
+        if not match:
+            continue
+
+        if int(match.group(2)) == 0:
+            # the header of the next source file:
+            if line.split(':', 2)[2].startswith('Source:'):
+                source, current = line.split(':', 3)[3].strip(), None
+            continue
+
+        count = match.group(1).strip().rstrip('*')
+        if current is not None and count != '-':
+            current['lines'] += 1
+            current['lines_hit'] += 1 if count.isdigit() and int(count) else 0
+
+    return functions
+
+def summarize(lib):
+    """ Run gcov on the counters of the library. gcov runs inside the library directory, so it
+    finds the sources by the relative paths the builder compiled them with.
+
+    Returns:
+        A list of tuples (function, file, called, lines, lines_hit, branches, branches_hit) with
+        the original function names.
+    """
+
+    if not os.path.isfile(counters(lib)):
+        return list()
+
+    call = f"{GCOV} -t -b -c -o {lib.coverage_target} {lib.coverage_target}"
+    proc = subprocess.run(call, shell=True, cwd=lib.directory, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"gcov failed on '{counters(lib)}': {proc.stderr.decode()}")
+
+    functions = parse_gcov(proc.stdout.decode(errors='replace').splitlines())
+
+    return [(lib.build.original_name(function), source, c['called'], c['lines'], c['lines_hit'],
+             c['branches'], c['branches_hit']) for (source, function), c in functions.items()]
+
+class CoverageDatabase:
+    """ This class holds the summarized coverage of every library. """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def update(self, lib, rows):
+        """ Replace the coverage of the library by the given summary (see summarize()). """
+
+        with self.db:
+            self.db.execute("DELETE FROM functions WHERE lib = ?", (lib.name,))
+            self.db.executemany("INSERT OR REPLACE INTO functions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                [(lib.name,) + row for row in rows])
+            self.db.execute("INSERT OR REPLACE INTO libs VALUES (?, ?, ?)", (lib.name, counters(lib), time.time()))
+
+    def function(self, lib, members):
+        """ Sum the coverage of the given functions of a library. Functions with the same name
+        (like file local functions of different translation units) are told apart by their
+        source file: a function defined in a header is counted for the translation units
+        that don't have a definition of their own.
+
+        Args:
+            lib: name of the library
+            members: list of tuples (function, tu) with the translation unit of the symbol
+                index that defines the function (None matches every source file)
+
+        Returns:
+            A dictionary with the keys 'lines', 'lines_hit', 'branches' and 'branches_hit' or
+            None if the database doesn't know any of the functions.
+        """
+
+        names = sorted({name for name, _ in members})
+        marks = ', '.join('?' * len(names))
+        rows = self.db.execute(f"SELECT function, file, lines, lines_hit, branches, branches_hit "
+                               f"FROM functions WHERE lib = ? AND function IN ({marks})", [lib] + names).fetchall()
+
+        tus = dict()
+        for name, tu in members:
+            tus.setdefault(name, list()).append(tu)
+
+        selected = dict()
+        for name, tu in members:
+            candidates = [r for r in rows if r[0] == name]
+            matching = [r for r in candidates if tu is None or same_source(r[1], tu)]
+
+            if not matching:
+                # defined in a header, but not in a file of another translation unit:
+                others = [t for t in tus[name] if t != tu]
+                matching = [r for r in candidates if not any(same_source(r[1], t) for t in others)]
+
+            selected.update({r[:2]: r[2:] for r in matching})
+
+        if not selected:
+            return None
+
+        return dict(zip(['lines', 'lines_hit', 'branches', 'branches_hit'], map(sum, zip(*selected.values()))))
+
+    def libraries(self):
+        """ Returns:
+            A dictionary mapping every library to its summed coverage.
+        """
+
+        rows = self.db.execute("SELECT lib, SUM(lines), SUM(lines_hit), SUM(branches), SUM(branches_hit) "
+                               "FROM functions GROUP BY lib ORDER BY lib")
+        return {r[0]: dict(zip(['lines', 'lines_hit', 'branches', 'branches_hit'], r[1:])) for r in rows}
+
+    def functions(self):
+        return [r[0] for r in self.db.execute("SELECT DISTINCT function FROM functions ORDER BY function")]
+
+def same_source(file, tu):
+    """ Returns:
+        True if the source file reported by gcov (relative to the library directory or
+        absolute) is the source the translation unit tu of the symbol index is compiled from.
+        The builder mirrors the source tree, so both paths only differ in their extension.
+    """
+
+    if file is None:
+        return False
+
+    stem, tu = os.path.normpath(file).rsplit('.', 1)[0], os.path.normpath(tu).rsplit('.', 1)[0]
+    return stem == tu or stem.endswith(os.sep + tu)
+
+def ratio(c):
+    total = c['lines'] + c['branches']
+    return (c['lines_hit'] + c['branches_hit']) / total if total else 1.0
+
+def collect(target_path, klee_dirs=(), afl_dirs=()):
+    """ Replay every KLEE test case and every input of the afl-fuzz queues on a concrete test
+    harness built in coverage mode and write the counters of the libraries.
+
+    Returns:
+        The number of replayed inputs.
+    """
+
+    from sputnik.replay import load_target, build_records
+
+    np = numpy()
+    target = load_target(os.path.abspath(target_path))
+
+    if not target.coverage:
+        raise ValueError(f"'{target_path}' isn't built in coverage mode")
+
+    records = list()
+
+    for directory in klee_dirs:
+        tests = ktest.load_directory(directory)
+        if tests:
+            records += [bytes(r) for r in build_records(target.layout, tests)]
+
+    for directory in afl_dirs:
+        # the queue of a single instance or the queues of every instance of a campaign:
+        for path in sorted(glob.glob(os.path.join(directory, '**', 'queue', 'id:*'), recursive=True)):
+            with open(path, 'rb') as f:
+                records.append(target.layout.from_fuzzing(f.read()))
+
+    if records:
+        records = np.array([np.frombuffer(r, dtype=np.uint8) for r in records], dtype=np.uint8)
+        target.run(records.reshape(-1, target.layout.record_size))
+        target.dump_coverage()
+
+    return len(records)
+
+def update(libs, path, jobs=None):
+    """ Summarize the counters of every library into the database at path. """
+
+    db = CoverageDatabase(path)
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            summaries = list(pool.map(summarize, libs))
+
+        for lib, rows in zip(libs, summaries):
+            db.update(lib, rows)
+    finally:
+        db.close()
+
+def rank(libs, path, functions=None):
+    """ Rank the tested functions by the coverage of their implementations. The coverage of a
+    function in a library is the coverage of every function it reaches in that library (taken
+    from the symbol index, without index only the function itself counts).
+
+    Args:
+        libs: list of library.Library instances
+        path: path to the coverage database
+        functions: names of the tested functions (default: every function of the database)
+
+    Returns:
+        A list of dictionaries (function, ratio, uncovered, libs) with the worst covered function
+        first. Functions without coverage data are listed last with ratio None.
+    """
+
+    db = CoverageDatabase(path)
+    ranking = list()
+
+    try:
+        for function in functions or db.functions():
+            entry = {'function': function, 'ratio': None, 'uncovered': 0, 'libs': dict()}
+            total = {'lines': 0, 'lines_hit': 0, 'branches': 0, 'branches_hit': 0}
+
+            for lib in libs:
+                index = lib.build.symbol_index()
+                members = [s[:2] for s in index.closure([function]) if s[1]] if index else list()
+
+                c = db.function(lib.name, members or [(function, None)])
+                if c is None:
+                    continue
+
+                entry['libs'][lib.name] = c | {'ratio': round(ratio(c), 4)}
+                total = {k: total[k] + c[k] for k in total}
+
+            if entry['libs']:
+                entry['ratio'] = round(ratio(total), 4)
+                entry['uncovered'] = total['lines'] - total['lines_hit'] + total['branches'] - total['branches_hit']
+
+            ranking.append(entry)
+    finally:
+        db.close()
+
+    ranking.sort(key=lambda e: (e['ratio'] is None, e['ratio'] or 0, -e['uncovered']))
+    return ranking
+
+def reset(libs):
+    """ Remove the counters of every library. """
+
+    for lib in libs:
+        try:
+            os.remove(counters(lib))
+        except FileNotFoundError:
+            pass
+
+def main():
+    """ This function is called if this script should be run standalone. """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Collect and rank the coverage of the libraries')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('collect', help='replay inputs on a concrete test harness built in coverage mode')
+    p.add_argument('target', help='path to the shared object of the concrete test harness')
+    p.add_argument('--klee', nargs='*', default=[], help='KLEE output directories')
+    p.add_argument('--afl', nargs='*', default=[], help='afl-fuzz output directories')
+
+    for name, description in [('update', 'summarize the counters into the database'),
+                              ('rank', 'rank the functions by their coverage'),
+                              ('reset', 'remove the counters')]:
+        p = sub.add_parser(name, help=description)
+        p.add_argument('-c', '--config', default='./configs/config_builder.json', help='path to the builder (or crafter) config')
+        if name != 'reset':
+            p.add_argument('-d', '--database', default='coverage.db', help='path to the coverage database')
+        if name == 'update':
+            p.add_argument('-j', '--jobs', type=int, default=None, help='number of libraries summarized in parallel')
+        if name == 'rank':
+            p.add_argument('-n', '--number', type=int, default=20, help='number of printed functions')
+            p.add_argument('-o', '--output', default=None, help='path of the ranking (JSON)')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(name)s | %(levelname)s | %(message)s")
+
+    if args.command == 'collect':
+        n = collect(args.target, args.klee, args.afl)
+        print(f"[+] replayed {n} inputs")
+        return
+
+    from sputnik.library import Library
+
+    with open(args.config) as f:
+        config = json.load(f)
+
+    libs = [Library.load(p) for p in config['libs']]
+
+    if args.command == 'reset':
+        reset(libs)
+    elif args.command == 'update':
+        update(libs, args.database, args.jobs)
+
+        db = CoverageDatabase(args.database)
+        for lib, c in db.libraries().items():
+            print(f"[+] {lib}: {c['lines_hit']}/{c['lines']} lines, {c['branches_hit']}/{c['branches']} branches")
+        db.close()
+    elif args.command == 'rank':
+        ranking = rank(libs, args.database, list(config.get('functions', dict())) or None)
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(ranking, f, indent=4)
+
+        for entry in ranking[:args.number]:
+            covered = "no data" if entry['ratio'] is None else f"{entry['ratio']:.1%} covered"
+            print(f"[+] {entry['function']}: {covered}, {entry['uncovered']} lines and branches uncovered")
+
+if __name__ == "__main__":
+    main()
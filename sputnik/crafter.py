@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
 
+import copy
+import hashlib
 import json
 import os
 import logging
 import itertools
 
+from concurrent.futures import ThreadPoolExecutor
+
+from sputnik import artifacts
 from sputnik import language
 from sputnik import library
 from sputnik import tools
 from sputnik import compiler
+from sputnik import constraints
+from sputnik import equivalence
 from sputnik import rename
 
 from sputnik.tools import indent
@@ -44,6 +51,51 @@ class TestHarness:
 
     general_max_array_width = int()
 
+    # boolean that flags if the slim library blobs should be used
+    slim = False
+
+    # boolean that flags if only the entry points should be extracted from the library blobs
+    extract_entries = False
+
+    # directory name inside the build directory of a library that caches the extracted blobs
+    EXTRACTIONS_DIR = "extractions"
+
+    # boolean that flags if up to date targets should be skipped by build_target()
+    incremental = False
+
+    # name of the file inside a target folder describing the inputs of that target
+    MANIFEST = "manifest.json"
+
+    # boolean that flags if libraries with identical entry points should be called only once
+    collapse_identical = False
+
+    # equivalence table of the implementations of every function (see equivalence.py) or None
+    equivalence = None
+
+    # number of parallel jobs while building a target (None: number of cores)
+    jobs = None
+
+    # artifacts.ArtifactCache holding built targets or None
+    cache = None
+
+    # boolean that flags if the concrete test harness links the libraries instrumented for gcov
+    coverage = False
+
+    # boolean that flags if a single symex target covers every array width by a symbolic length
+    symbolic_width = False
+
+    # name of the symbolic object holding the effective array width (see symbolic_width)
+    WIDTH_OBJECT = "sputnik_width"
+
+    # name of the file inside a symex target folder describing its array widths (see widths.py)
+    WIDTHS = "widths.json"
+
+    # smallest array width of a test (see build_targets_array())
+    MIN_ARRAY_WIDTH = 2
+
+    # engine -> extension of the target built by build_target_{engine}() (see target_path())
+    TARGET_EXTENSIONS = {'symex': 'bc', 'fuzzing': 'afl', 'libfuzzer': 'libfuzzer', 'concrete': 'so'}
+
     @classmethod
     def load_general_config(cls, configfile):
         """ Set the test-unrelated config for test harnesses in general. This
@@ -63,12 +115,47 @@ class TestHarness:
         cls.wordsize = config['wordsize']
         cls.verifier = config['verifier']
 
+        # link the stripped library blobs (see prebuild.py --slim) instead of the full ones:
+        cls.slim = config.get('slim', False)
+
+        # link only the entry points of the libraries and everything they need:
+        cls.extract_entries = config.get('extract_entries', False)
+
+        # rebuild a target only if its manifest shows that one of its inputs changed:
+        cls.incremental = config.get('incremental', False)
+
+        # call libraries with identical code of the entry point only once:
+        cls.collapse_identical = config.get('collapse_identical', False)
+
+        # placement and pooling of the temporary build directories:
+        tools.workspaces.configure(**config.get('workspace', dict()))
+
+        # number of parallel jobs while building a target:
+        cls.jobs = config.get('jobs', None)
+
+        # share the built targets with other hosts:
+        cls.cache = artifacts.from_config(config)
+
+        # collect the coverage of the libraries by the concrete test harness:
+        cls.coverage = config.get('coverage', False)
+
+        # cover every array width by a single symex target:
+        cls.symbolic_width = config.get('symbolic_width', False)
+
+        # skip functions whose implementations are identical in every library:
+        cls.equivalence = None
+        if config.get('equivalence'):
+            cls.equivalence = equivalence.load_table(config['equivalence'])
+
         # configuration for symex engine:
         cls.config['symex'] = config['symex'].copy()
 
         # configuration for fuzzing engine:
         cls.config['fuzzing'] = config['fuzzing'].copy()
 
+        # configuration for libfuzzer engine:
+        cls.config['libfuzzer'] = config.get('libfuzzer', dict()).copy()
+
     def __init__(self):
         """ TODO: Add some fancy architecture description here
         """
@@ -96,6 +183,10 @@ class TestHarness:
         # self.engine should be in ['symex', 'fuzzing']
         self.engine = None
 
+        # Mapping from lib.name to the name of the library whose call replaces the call of
+        # that library (see identical_libs()).
+        self.duplicates = dict()
+
         self.clean_state()
 
     def clean_state(self):
@@ -105,6 +196,9 @@ class TestHarness:
         # holding strings of boolean expressions like 'x <= 3'
         self.assumptions = list()
 
+        # holding constraints.Constraint instances (see add_constraint())
+        self.constraints = list()
+
     def set_engine_symex(self):
         self.engine = 'symex'
 
@@ -115,6 +209,12 @@ class TestHarness:
         # build_target_fuzzing():
         self.testcases_fuzzing = {'default': ''}
 
+    def set_engine_concrete(self):
+        self.engine = 'concrete'
+
+    def set_engine_libfuzzer(self):
+        self.engine = 'libfuzzer'
+
     @property
     def signature(self):
         """ Getter for signature object """
@@ -176,6 +276,13 @@ class TestHarness:
         self.generate_arguments()
         self.define_assumptions()
 
+        for constraint in self.constraints:
+            if constraint.name is None:
+                continue
+            if constraint.name not in self.arguments_cache:
+                raise ValueError(f"constraint on unknown argument '{constraint.name}'")
+            constraint.validate(self.arguments_cache[constraint.name])
+
     def engine_wrapper(self, method):
         # Note: Because I maybe want to switch the engine on the fly I don't use
         # something like builtin decorators. Unfortunately: https://stackoverflow.com/a/5067661.
@@ -185,6 +292,30 @@ class TestHarness:
         new_method = f"{method}_{self.engine}"
         return getattr(self, new_method)
 
+    def width_symbolic(self):
+        """ Returns:
+            True if the effective array width is a symbolic value bounded by self.array_width
+            (only the symex engine supports it, the other engines use the fixed width).
+        """
+
+        return self.symbolic_width and self.engine == 'symex'
+
+    def width_expression(self, variable=None):
+        """ Args:
+            variable: language.Variable of an array argument or None for self.array_width
+
+        Returns:
+            A C expression holding the effective width of the array: the symbolic width if the
+            array is allocated with self.array_width in symbolic width mode, its size otherwise.
+        """
+
+        size = self.array_width if variable is None else variable.array_size
+
+        if self.width_symbolic() and size == self.array_width:
+            return self.WIDTH_OBJECT
+
+        return str(size)
+
     def generate_header(self):
         return list() + self.engine_wrapper("generate_header")()
 
@@ -194,6 +325,12 @@ class TestHarness:
     def generate_header_fuzzing(self):
         return ["#include <stdio.h>", "void abort(void);"]
 
+    def generate_header_concrete(self):
+        return ["#include <setjmp.h>", "#include <signal.h>", "#include <string.h>", "void abort(void);"]
+
+    def generate_header_libfuzzer(self):
+        return ["#include <stdint.h>", "#include <stdio.h>", "#include <string.h>", "void abort(void);"]
+
     def generate_return_values(self):
         code = list()
 
@@ -244,6 +381,12 @@ class TestHarness:
             if not arg.value:
                 code += self.define_input(arg)
 
+        if self.width_symbolic():
+            # the arrays are allocated with the maximal width, the assumptions use this one:
+            width = constraints.Range(self.WIDTH_OBJECT, self.MIN_ARRAY_WIDTH, self.array_width)
+            code.append(f"klee_make_symbolic(&{self.WIDTH_OBJECT}, sizeof({self.WIDTH_OBJECT}), \"{self.WIDTH_OBJECT}\");")
+            code += self.generate_constraint_symex(width, None)
+
         return code
 
     def define_input(self, variable):
@@ -274,7 +417,10 @@ class TestHarness:
 
     def define_input_fuzzing(self, variable):
         """ Generates code to receive test input from afl-fuzz via stdin and generates
-        test input simultaniously """
+        test input simultaniously. Numbers are whitespace delimited tokens, the single character
+        after a number is consumed as separator. Strings are encoded as their length (a number)
+        followed by the raw characters, so they may be empty or hold whitespace. Characters
+        and wint_t values are read raw (see inputs.InputLayout.from_fuzzing()). """
 
         arg = variable.name if variable.isptr else f"&{variable.name}"
 
@@ -285,11 +431,22 @@ class TestHarness:
             fmtstr = "%zu"
             testcase = "1234\n"
         elif variable.type == "char" and variable.isptr:
-            fmtstr = f"%{variable.array_size - 1}s"
-            testcase = "A" * variable.array_size + '\n'
+            # the length is clamped to the array, the rest of the string stays in the input:
+            n = variable.array_size - 1
+            testcase = f"{n}\n" + "A" * n
+            self.testcases_fuzzing = {k: v + testcase for k, v in self.testcases_fuzzing.items()}
+            return [
+                "{",
+                "\tsize_t sputnik_length = 0;",
+                "\tscanf(\"%zu%*c\", &sputnik_length);",
+                f"\tif (sputnik_length > {n}) sputnik_length = {n};",
+                f"\tsputnik_length = fread({arg}, 1, sputnik_length, stdin);",
+                f"\t{arg}[sputnik_length] = '\\0';",
+                "}",
+            ]
         elif variable.type == "char" and not variable.isptr:
             fmtstr = "%c"
-            testcase = "A\n"
+            testcase = "A"
         elif variable.type == "long int":
             fmtstr = "%ld"
             testcase = "1234\n"
@@ -297,23 +454,69 @@ class TestHarness:
             fmtstr = "%lld"
             testcase = "1234\n"
         elif variable.type == "long":
-            fmtstr = "%l"
+            fmtstr = "%ld"
             testcase = "1234\n"
         elif variable.type == "long long":
-            fmtstr = "%ll"
+            fmtstr = "%lld"
             testcase = "1234\n"
         elif variable.type == 'wint_t':
-            # this is a special variant:
-            testcase = 'AA\n'
+            # this is a special variant (read through stdio, which buffers the input of scanf):
+            testcase = 'AAAA'
             self.testcases_fuzzing = {k: v + testcase for k, v in self.testcases_fuzzing.items()}
-            return [f"read(0, {arg}, 4);"]
+            return [f"fread({arg}, 4, 1, stdin);"]
         else:
             raise Exception()
 
         self.testcases_fuzzing = {k: v + testcase for k, v in self.testcases_fuzzing.items()}
 
+        if fmtstr != "%c":
+            # consume the separator, so a following character isn't read as whitespace:
+            fmtstr += "%*c"
+
         return [f"scanf(\"{fmtstr}\", {arg});"]
 
+    def input_variables(self):
+        """ Returns:
+            A list of the arguments that are variable input values in the order of
+            self.arguments_cache (see define_input_space()).
+        """
+
+        return [arg for arg in self.arguments_cache.values() if not arg.value]
+
+    def input_offset(self, variable):
+        """ Returns:
+            A C expression of the offset of the variable inside an input record (see
+            inputs.InputLayout).
+        """
+
+        return ' + '.join(['0'] + [f"sizeof({v.name})" for v in self.input_variables()[
+            :self.input_variables().index(variable)]])
+
+    def input_record_size(self):
+        """ Returns:
+            A C expression of the size of an input record.
+        """
+
+        return ' + '.join(['0'] + [f"sizeof({v.name})" for v in self.input_variables()])
+
+    def define_input_concrete(self, variable):
+        """ Generates code to copy the value of the variable out of the current input record
+        (see inputs.InputLayout). """
+
+        return [f"memcpy(&{variable.name}, sputnik_record + {self.input_offset(variable)}, sizeof({variable.name}));"]
+
+    def define_input_libfuzzer(self, variable):
+        """ Generates code to copy the value of the variable out of the input of libFuzzer,
+        which is a raw input record (see inputs.InputLayout). Strings are terminated instead of
+        rejecting every input without terminator (see define_assumptions()). """
+
+        code = [f"memcpy(&{variable.name}, sputnik_data + {self.input_offset(variable)}, sizeof({variable.name}));"]
+
+        if variable.isptr and variable.type == 'char' and self.array_width:
+            code.append(f"{variable.name}[{variable.array_size - 1}] = '\\0';")
+
+        return code
+
     def generate_environment(self):
         # like global variables...
         return list()
@@ -341,6 +544,11 @@ class TestHarness:
         code += self.generate_environment()
         code.append("")
 
+        if self.width_symbolic():
+            code.append("// the effective array width (symbolic):")
+            code.append(f"size_t {self.WIDTH_OBJECT};")
+            code.append("")
+
         return code
 
     def generate_entry_declaration(self):
@@ -357,7 +565,13 @@ class TestHarness:
         code = list()
 
         for lib_name, entry in self.entries.items():
-            code.append(entry.call())
+            if lib_name in self.duplicates:
+                # the code is identical, so is the result:
+                original = self.entries[self.duplicates[lib_name]]
+                if entry.ret.type != "void" or entry.ret.ptr_depth:
+                    code.append(f"{entry.ret.name} = {original.ret.name};")
+            else:
+                code.append(entry.call())
 
         return code
 
@@ -369,6 +583,25 @@ class TestHarness:
 
         self.assumptions.append(assumption)
 
+    def add_constraint(self, constraint):
+        """ Add a declarative constraint on the input arguments (see constraints.py). Unlike an
+        assumption, a constraint is lowered depending on the engine: a single klee_assume() for
+        symex and clamping of the decoded input for fuzzing.
+
+        Args:
+            constraint: constraints.Constraint instance like constraints.Range('n', 0, 16)
+        """
+
+        self.constraints.append(constraint)
+
+    def input_space(self):
+        """ Returns:
+            A dictionary describing the size of the input space of this test under its
+            constraints (see constraints.input_space()).
+        """
+
+        return constraints.input_space(self.input_variables(), self.constraints)
+
     def define_assumptions(self):
         """ If this method is not overloaded in the test we try to make
         some clever assumptions on our own.
@@ -378,7 +611,9 @@ class TestHarness:
             if arg.isptr and arg.type == 'char':
                 if self.array_width:
                     #self.add_assumption(f"{arg.name}[{self.array_width - 1}] == '\\0'")
-                    self.add_assumption(f"{arg.name}[{arg.array_size - 1}] == '\\0'")
+                    width = self.width_expression(arg)
+                    last = arg.array_size - 1 if width.isdigit() else f"{width} - 1"
+                    self.add_assumption(f"{arg.name}[{last}] == '\\0'")
                 else:
                     self.add_assumption(f"{arg.name}[0] == '\\0'")
 
@@ -396,8 +631,28 @@ class TestHarness:
         for expr in self.assumptions:
             code.append(self.engine_wrapper("generate_assumption")(expr))
 
+        for constraint in self.constraints:
+            variable = self.arguments_cache.get(constraint.name)
+            code += self.engine_wrapper("generate_constraint")(constraint, variable)
+
         return code
 
+    def generate_constraint_symex(self, constraint, variable):
+        return [f"klee_assume({constraint.expression(variable)});"]
+
+    def generate_constraint_fuzzing(self, constraint, variable):
+        clamp = constraint.clamp(variable)
+        if clamp is None:
+            return [self.generate_assumption_fuzzing(constraint.expression(variable))]
+        return clamp
+
+    def generate_constraint_concrete(self, constraint, variable):
+        return [self.generate_assumption_concrete(constraint.expression(variable))]
+
+    def generate_constraint_libfuzzer(self, constraint, variable):
+        # the input bytes are mutated blindly, so they are clamped like the fuzzing input:
+        return self.generate_constraint_fuzzing(constraint, variable)
+
     def generate_assumption_symex(self, expr):
         #return f"klee_assume({expr});"
         return f"if (!({expr})) return 0;"
@@ -405,6 +660,12 @@ class TestHarness:
     def generate_assumption_fuzzing(self, expr):
         return f"if (!({expr})) return 0;"
 
+    def generate_assumption_concrete(self, expr):
+        return f"if (!({expr})) {{ sputnik_status[sputnik_i] = SPUTNIK_SKIPPED; continue; }}"
+
+    def generate_assumption_libfuzzer(self, expr):
+        return f"if (!({expr})) return 0;"
+
     def generate_verify_function(self):
         if self.verifier == "new":
             return self.new_generate_verify_function()
@@ -597,6 +858,31 @@ void verifier()
         code.append("// code from generate_variables():")
         code += self.generate_variables()
 
+        code += self.generate_main()
+        code.append("")
+
+        if len(self.libs) > 1:
+            code += self.generate_evaluation_function()
+            code.append("")
+
+            code += self.generate_verify_function()
+            code.append("")
+
+            code += self.generate_abort_function()
+            code.append("")
+
+        return '\n'.join(code)
+
+    def generate_main(self):
+        """ Returns:
+            A list of C code implementing the entry point of the test harness.
+        """
+
+        return self.engine_wrapper("generate_main")()
+
+    def generate_main_default(self):
+        code = list()
+
         code.append("int main()")
         code.append("{")
 
@@ -605,19 +891,164 @@ void verifier()
 
         code.append("\treturn 0;")
         code.append("}")
+
+        return code
+
+    def generate_main_symex(self):
+        return self.generate_main_default()
+
+    def generate_main_fuzzing(self):
+        return self.generate_main_default()
+
+    def generate_main_libfuzzer(self):
+        """ The libFuzzer test harness has no main function (the driver of libFuzzer is linked
+        instead). libFuzzer calls LLVMFuzzerTestOneInput() in-process for every input, which is a
+        raw input record. Shorter inputs are ignored, the rest of longer inputs is ignored.
+        """
+
+        code = list()
+
+        code.append("int LLVMFuzzerTestOneInput(const uint8_t *sputnik_data, size_t sputnik_size)")
+        code.append("{")
+        code.append(f"\tif (sputnik_size < {self.input_record_size()})")
+        code.append("\t\treturn 0;")
         code.append("")
 
-        if len(self.libs) > 1:
-            code += self.generate_evaluation_function()
-            code.append("")
+        code += indent(self.generate_test_harness_body())
+        code.append("")
 
-            code += self.generate_verify_function()
-            code.append("")
+        code.append("\treturn 0;")
+        code.append("}")
 
-            code += self.generate_abort_function()
+        return code
+
+    def generate_main_concrete(self):
+        """ The concrete test harness is a shared object without a main function. It exports
+        the function sputnik_batch() that runs every library on every input record of a batch
+        and writes the output of every library (the return value and the content of every
+        pointer argument) to the output buffer. A crash of a library is caught and stored as
+        signal number in the status buffer (see concrete.py).
+        """
+
+        inputs = self.input_variables()
+        pointers = [arg for arg in inputs if arg.isptr]
+        n = len(self.libs)
+
+        ret = self.signature.ret
+        if ret.type == "void" and not ret.isptr:
+            ret_size = "0"
+        elif ret.isptr:
+            ret_size = "sizeof(long)"
+        else:
+            ret_size = f"sizeof({ret.type_str()})"
+
+        code = list()
+
+        code.append("#define SPUTNIK_SKIPPED 255")
+        code.append("")
+        code.append(f"const size_t sputnik_libs = {n};")
+        code.append(f"const size_t sputnik_record_size = {self.input_record_size()};")
+        output_size = ' + '.join([ret_size] + [f"sizeof({v.name})" for v in pointers])
+        code.append(f"const size_t sputnik_output_size = {output_size};")
+        sizes = ', '.join([f"sizeof({v.name})" for v in inputs] + ['0'])
+        code.append(f"const size_t sputnik_input_sizes[] = {{ {sizes} }};")
+        code.append("")
+
+        code.append("static sigjmp_buf sputnik_jmp;")
+        code.append("static volatile int sputnik_signal;")
+        code.append("")
+        code.append("static void sputnik_handler(int sig)")
+        code.append("{")
+        code.append("\tsputnik_signal = sig;")
+        code.append("\tsiglongjmp(sputnik_jmp, 1);")
+        code.append("}")
+        code.append("")
+
+        # returned pointers are compared by the argument they point to:
+        code.append("static long sputnik_pointer_id(const void *ptr)")
+        code.append("{")
+        code.append("\tif (ptr == 0) return -1;")
+        for i, arg in enumerate(pointers):
+            code.append(f"\tif ((const char *) ptr >= (const char *) &{arg.name} && "
+                        f"(const char *) ptr < (const char *) &{arg.name} + sizeof({arg.name}))")
+            code.append(f"\t\treturn {i} * 65536 + ((const char *) ptr - (const char *) &{arg.name});")
+        code.append("\treturn -2;")
+        code.append("}")
+        code.append("")
+
+        signals = ["SIGSEGV", "SIGBUS", "SIGFPE", "SIGILL", "SIGABRT"]
+
+        code.append("int sputnik_batch(const unsigned char *sputnik_inputs, size_t sputnik_count, "
+                    "unsigned char *sputnik_outputs, unsigned char *sputnik_status)")
+        code.append("{")
+        code += [f"\tvoid (*sputnik_old_{s})(int) = signal({s}, sputnik_handler);" for s in signals]
+        code.append("")
+        code.append("\tfor (volatile size_t sputnik_k = 0; sputnik_k < sputnik_count; sputnik_k++) {")
+        code.append("\t\tconst unsigned char *sputnik_record = sputnik_inputs + sputnik_k * sputnik_record_size;")
+        code.append("")
+        code.append(f"\t\tfor (volatile size_t sputnik_lib = 0; sputnik_lib < {n}; sputnik_lib++) {{")
+
+        body = list()
+        body.append("size_t sputnik_i = sputnik_k * sputnik_libs + sputnik_lib;")
+        body.append("unsigned char *sputnik_output = sputnik_outputs + sputnik_i * sputnik_output_size;")
+        body.append("")
+        body.append("// code from define_input_space():")
+        body += self.define_input_space()
+        body.append("")
+        body.append("// code from generate_assumptions():")
+        body += self.generate_assumptions()
+        body.append("")
+        body.append("if (sigsetjmp(sputnik_jmp, 1)) {")
+        body.append("\tsputnik_status[sputnik_i] = sputnik_signal;")
+        body.append("\tcontinue;")
+        body.append("}")
+        body.append("")
+        body.append("switch (sputnik_lib) {")
+
+        for i, lib in enumerate(self.libs):
+            entry = self.entries[lib.name]
+
+            body.append(f"case {i}:")
+            body.append(f"\t{entry.call()}")
+            if ret.isptr:
+                body.append(f"\t*(long *) sputnik_output = sputnik_pointer_id({entry.ret.name});")
+            elif ret_size != "0":
+                body.append(f"\tmemcpy(sputnik_output, &{entry.ret.name}, {ret_size});")
+            body.append("\tbreak;")
+
+        body.append("}")
+        body.append("")
+
+        offset = [ret_size]
+        for arg in pointers:
+            body.append(f"memcpy(sputnik_output + {' + '.join(offset)}, &{arg.name}, sizeof({arg.name}));")
+            offset.append(f"sizeof({arg.name})")
+
+        body.append("sputnik_status[sputnik_i] = 0;")
+
+        code += indent(body, 3)
+        code.append("\t\t}")
+        code.append("\t}")
+        code.append("")
+        code += [f"\tsignal({s}, sputnik_old_{s});" for s in signals]
+        code.append("")
+        code.append("\treturn 0;")
+        code.append("}")
+
+        if self.coverage:
+            # the counters are written at exit, but the workers of a process pool never exit
+            # normally. The libgcov functions are hidden, so they are exported by a wrapper:
+            code.append("")
+            code.append("void __gcov_dump(void);")
+            code.append("void __gcov_reset(void);")
             code.append("")
+            code.append("void sputnik_coverage_dump(void)")
+            code.append("{")
+            code.append("\t__gcov_dump();")
+            code.append("\t__gcov_reset();")
+            code.append("}")
 
-        return '\n'.join(code)
+        return code
 
     def generate_abort_function(self):
         code = list()
@@ -637,6 +1068,14 @@ void verifier()
         # TODO fuzzing afl abort with error message?!
         return ["abort();"]
 
+    def abort_concrete(self):
+        # the libraries are compared by concrete.py, so verifier() is never called
+        return ["abort();"]
+
+    def abort_libfuzzer(self):
+        # libFuzzer catches the abort and stores the input as crash:
+        return ["fprintf(stderr, \"sputnik: %s\\n\", message);", "abort();"]
+
     def generate_test_harness_body(self):
         code = list()
 
@@ -663,8 +1102,8 @@ void verifier()
 
     def generate_evaluation_function_array(self):
         """ This method generates code for an evaluation function
-        that expects arrays of length self.array_width stored as pointers
-        in eval_return_values.
+        that expects arrays of length self.array_width (or of the symbolic width) stored as
+        pointers in eval_return_values.
 
         Returns:
             List of C code implementing the lib_eval() function.
@@ -676,7 +1115,7 @@ void verifier()
         code.append("\tchar *b = eval_return_values[j];")
         code.append("")
 
-        code.append(f"\tfor (size_t c = 0; c < {self.array_width}; c++)")
+        code.append(f"\tfor (size_t c = 0; c < {self.width_expression()}; c++)")
         code.append(f"\t\tif (a[c] != b[c]) return 1;")
         code.append("")
 
@@ -702,7 +1141,7 @@ void verifier()
     # BUILDER FUNCTIONS:
     #
 
-    def build_semantic_wrappers(self, lib, target, tmp='/tmp/'):
+    def build_semantic_wrappers(self, lib, target, tmp=None):
         """
         Als Seiteneffekt dieser Funktion wird self.entries und self.links angepasst.
 
@@ -711,6 +1150,25 @@ void verifier()
             target: path where the blob should be stored
         """
 
+        target, entry = self.compile_semantic_wrappers(lib, target, tmp)
+        self.set_semantic_entry(lib, entry)
+
+        return [target]
+
+    def compile_semantic_wrappers(self, lib, target, tmp=None):
+        """ Build the semantic wrappers for the given library without changing the state of
+        this test, so the wrappers of several libraries can be built concurrently. Every call
+        works in its own temporary directory.
+
+        Args:
+            lib: library.Library instance the wrappers are built for
+            target: path where the blob should be stored
+            tmp: parent directory of the temporary directory (None: a pooled workspace)
+
+        Returns:
+            A tuple (target, name of the renamed entry point of that library).
+        """
+
         cflags = self.CFLAGS_SEMANTIC_WRAPPER.format(lib_cflags=lib.compiler_flags)
 
         local_tmp = tools.generate_tmp_dir(tmp, f"sputnik_tmp_semantics_{lib.name}_")
@@ -736,16 +1194,333 @@ void verifier()
 
         mapping = rename.rename(target, blob, lib.name)
 
-        # set the entry point to the new and renamed function (the semantic wrapper function)
-        self.entries[lib.name].name = mapping['@' + self.entries[lib.name].name][1:]
-        self.entries[lib.name].ret.rename("ret_" + lib.name)
-
         # compile the blob and update the list of linkable files:
         #compiler.assemble(target, blob)
 
         tools.cleanup_tmp_dir(local_tmp)
 
-        return [target]
+        return target, mapping['@' + self.entries[lib.name].name][1:]
+
+    def set_semantic_entry(self, lib, name):
+        # set the entry point to the new and renamed function (the semantic wrapper function)
+        self.entries[lib.name].name = name
+        self.entries[lib.name].ret.rename("ret_" + lib.name)
+
+    def build_all_semantic_wrappers(self):
+        """ Build the semantic wrappers for every library concurrently (at most self.jobs at
+        once). The entry points are updated in the order of self.libs afterwards, so the
+        result doesn't depend on the order the builds finish.
+
+        Returns:
+            A dictionary mapping every library name to the path of its built wrappers.
+        """
+
+        def build(lib):
+            target = os.path.join(self.tmp, f"semantics_{lib.name}.ll")
+            return self.compile_semantic_wrappers(lib, target)
+
+        if not self.libs:
+            return dict()
+
+        with ThreadPoolExecutor(max_workers=min(len(self.libs), self.jobs or os.cpu_count())) as pool:
+            results = list(pool.map(build, self.libs))
+
+        wrappers = dict()
+        for lib, (target, entry) in zip(self.libs, results):
+            self.set_semantic_entry(lib, entry)
+            wrappers[lib.name] = target
+
+        return wrappers
+
+    def library_blob(self, lib):
+        """ Returns:
+            The path to the blob of the given library that should be linked into the target.
+        """
+
+        return lib.slim_target if self.slim else lib.target
+
+    def extract_blob(self, lib, symbols):
+        """ Extract the given symbols and all definitions that are reachable from them out of
+        the blob of the given library. The extracted blobs are cached inside the build directory
+        of that library by the hash of the blob and the extracted symbols.
+
+        Args:
+            lib: library.Library instance
+            symbols: iterable of the (renamed) symbol names that should be extracted
+
+        Returns:
+            The path to the extracted blob.
+        """
+
+        import hashlib
+        import tempfile
+
+        blob = self.library_blob(lib)
+        symbols = sorted(symbols)
+
+        key = hashlib.sha256('\n'.join(symbols).encode()).hexdigest()[:16]
+        name = symbols[0] if len(symbols) == 1 else key
+        folder = os.path.join(lib.builddir, self.EXTRACTIONS_DIR, tools.file_hash(blob)[:16])
+        target = os.path.join(folder, f"{name}.bc")
+
+        if os.path.isfile(target):
+            return target
+
+        os.makedirs(folder, exist_ok=True)
+
+        # write to a private file first so concurrent builds (also threads of this process)
+        # never see half written blobs:
+        fd, tmp_target = tempfile.mkstemp(prefix=f"{name}.", suffix='.tmp', dir=folder)
+        os.close(fd)
+
+        try:
+            compiler.strip(tmp_target, blob, symbols)
+            os.replace(tmp_target, target)
+        finally:
+            for path in [tmp_target, tmp_target + '.symbols']:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+        return target
+
+    def library_link(self, lib, semantic_wrapper=None):
+        """ Determine the library blob that should be linked for the given library. This is
+        the blob of that library or, if self.extract_entries is set, the extraction of the
+        entry point and its callees. If there is a semantic wrapper for that library then the
+        symbols the wrapper needs from the library are extracted instead of the entry point.
+
+        Args:
+            lib: library.Library instance
+            semantic_wrapper: path to the built semantic wrapper of that library or None
+
+        Returns:
+            The path to the blob that should be linked.
+        """
+
+        if self.coverage and self.engine == 'concrete':
+            if not os.path.isfile(lib.coverage_target):
+                raise FileNotFoundError(f"'{lib.coverage_target}' is missing, run the builder with --coverage")
+            return lib.coverage_target
+
+        if not self.extract_entries:
+            return self.library_blob(lib)
+
+        if semantic_wrapper:
+            symbols = rename.detect_declarations(semantic_wrapper)
+        else:
+            symbols = [self.entries[lib.name].name]
+
+        return self.extract_blob(lib, symbols)
+
+    def provably_identical(self):
+        """ Check if every library shares the same implementation of the function of this test
+        according to the equivalence table (see equivalence.py). Such a test can't show a
+        divergence. Tests with semantic wrappers are never considered identical.
+        """
+
+        if self.equivalence is None or self.semantic_wrappers:
+            return False
+
+        return equivalence.single_class(self.equivalence, self.function, [lib.name for lib in self.libs])
+
+    def identical_libs(self):
+        """ Find the libraries whose entry points are identical: the code reachable from the
+        entry point (with the original symbol names, see symbols.SymbolIndex.closure_hash())
+        is the same. Libraries without symbol index or without a definition of the entry point
+        are never identical to another one.
+
+        Returns:
+            A dictionary mapping the name of every library that is identical to a preceding
+            library to the name of that first library.
+        """
+
+        duplicates, first = dict(), dict()
+
+        for lib in self.libs:
+            index = lib.build.symbol_index()
+            if index is None:
+                continue
+
+            entry = lib.build.original_name(self.entries[lib.name].name)
+            if index.resolve(entry) is None:
+                continue
+
+            closure = index.closure_hash([entry])
+
+            if closure in first:
+                duplicates[lib.name] = first[closure]
+            else:
+                first[closure] = lib.name
+
+        return duplicates
+
+    def generate_manifest(self, roots=None):
+        """ Generate the manifest describing every input of the target of this test. This is
+        the hash of the test harness, the hashes of the semantic wrappers and for every
+        library the hash of its blob and the hash of the code that is reachable from the
+        symbols the test needs from that library (see symbols.SymbolIndex.closure_hash()).
+
+        Args:
+            roots: dictionary mapping a library name to the list of (original) symbol names the
+                test needs from that library. It defaults to the entry points.
+
+        Returns:
+            A dictionary that can be stored as manifest.
+        """
+
+        # generating the harness changes the fuzzing testcases, so we restore them afterwards:
+        testcases = copy.deepcopy(self.testcases_fuzzing)
+        harness = self.generate_test_harness()
+        self.testcases_fuzzing = testcases
+
+        manifest = {
+            'version': self.VERSION,
+            'function': self.function,
+            'engine': self.engine,
+            'slim': self.slim,
+            'extract_entries': self.extract_entries,
+            'coverage': self.coverage and self.engine == 'concrete',
+            'harness': hashlib.sha256(harness.encode()).hexdigest(),
+            'semantic_wrappers': {w: tools.file_hash(w) for w in self.semantic_wrappers},
+            'libs': dict(),
+        }
+
+        if self.engine == 'fuzzing':
+            # run.sh depends on the configuration of the campaign:
+            manifest['campaign'] = self.fuzzing_campaign(f"{self.function}.afl")
+        elif self.engine == 'libfuzzer':
+            manifest['campaign'] = self.libfuzzer_campaign(f"{self.function}.libfuzzer")
+
+        for lib in self.libs:
+            if roots and lib.name in roots:
+                lib_roots = roots[lib.name]
+            else:
+                lib_roots = [lib.build.original_name(self.entries[lib.name].name)]
+
+            index = lib.build.symbol_index()
+
+            manifest['libs'][lib.name] = {
+                'blob': tools.file_hash(self.library_blob(lib)),
+                'roots': sorted(lib_roots),
+                'closure': index.closure_hash(sorted(lib_roots)) if index else None,
+            }
+
+        return manifest
+
+    def load_manifest(self, target_folder):
+        try:
+            with open(os.path.join(target_folder, self.MANIFEST)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return None
+
+    def store_manifest(self, target_folder, manifest):
+        with open(os.path.join(target_folder, self.MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=4)
+
+    def up_to_date(self, target_folder):
+        """ Check if the target inside target_folder was built from the same inputs as the
+        target this test would build now. A library is considered unchanged if the code
+        reachable from the symbols the test needs didn't change, even if other parts of that
+        library changed. If there is no symbol index for a library, the hash of the whole
+        blob is compared instead.
+
+        Returns:
+            The path to the existing target if it is up to date or None otherwise.
+        """
+
+        old = self.load_manifest(target_folder)
+
+        if not old or not os.path.isfile(old.get('target', '')):
+            return None
+
+        roots = None
+        if self.semantic_wrappers:
+            # the symbols a semantic wrapper needs are only known after building it. But they
+            # can't change as long as the wrapper itself doesn't change:
+            if old['semantic_wrappers'] != {w: tools.file_hash(w) for w in self.semantic_wrappers}:
+                return None
+            roots = {name: lib['roots'] for name, lib in old['libs'].items()}
+
+        new = self.generate_manifest(roots)
+
+        def key(manifest):
+            manifest = copy.deepcopy(manifest)
+            manifest.pop('target', None)
+            for lib in manifest['libs'].values():
+                if lib['closure'] is not None:
+                    del lib['blob']
+            return manifest
+
+        return old['target'] if key(old) == key(new) else None
+
+    def cache_key(self, manifest):
+        """ Calculate the key of the target in the artifact cache. It covers the manifest
+        (without paths), the configuration of the engine (with the content of the KLEE headers
+        instead of their path) and the versions of the toolchain, so hosts with the same
+        toolchain share their targets.
+
+        Returns:
+            The key as hex string (see artifacts.key()).
+        """
+
+        manifest = copy.deepcopy(manifest)
+        manifest.pop('target', None)
+        manifest['semantic_wrappers'] = sorted(manifest['semantic_wrappers'].values())
+
+        config = dict(self.config.get(self.engine) or dict())
+        if 'klee_headers' in config:
+            config['klee_headers'] = artifacts.directory_digest(config['klee_headers'])
+
+        toolchain = [artifacts.tool_version(t) for t in [compiler.COMPILER, compiler.LINKER, compiler.OPTIMIZER]]
+
+        return artifacts.key('target', manifest, config, toolchain)
+
+    def target_path(self, target_folder, engine=None):
+        """ Returns:
+            The path of the target the given engine (default: self.engine) builds inside
+            target_folder.
+        """
+
+        extension = TestHarness.TARGET_EXTENSIONS[engine or self.engine]
+        return os.path.join(target_folder, f"{self.function}.{extension}")
+
+    def restore_target(self, target_folder, key):
+        """ Restore the target of this test from the artifact cache.
+
+        Returns:
+            The path to the restored target or None on a miss.
+        """
+
+        restored = self.cache.restore(key, target_folder)
+        if not restored:
+            return None
+
+        target = self.target_path(target_folder)
+        if os.path.basename(target) not in restored:
+            return None
+
+        return target
+
+    def restore_test_harness(self, target_folder, key):
+        """ Write the test harness of a target restored from the artifact cache into its
+        folder. With semantic wrappers the harness calls the renamed wrappers, which are only
+        known after building them, so the harness built with the target is restored instead.
+        """
+
+        path = os.path.join(target_folder, "test_harness.c")
+
+        if not self.semantic_wrappers:
+            self.write_test_harness(path)
+            return
+
+        restored = self.cache.restore(artifacts.key(key, 'harness'), target_folder)
+        if restored:
+            os.replace(os.path.join(target_folder, restored[0]), path)
+        else:
+            logging.warning(f"{self.function}: the test harness isn't cached, '{path}' isn't written")
 
     def build_target(self, target_folder, test_harness=False, **kwargs):
         """ This method is the overall build process to generate a blob that is intended to put
@@ -756,24 +1531,83 @@ void verifier()
             keep_test_harness: string specifying path where generated test harness should be stored or None
         """
 
+        # only the concrete test harness doesn't call the entries by generate_entry_calls():
+        self.duplicates = dict()
+        if self.collapse_identical and not self.semantic_wrappers and self.engine in ['symex', 'fuzzing', 'libfuzzer']:
+            self.duplicates = self.identical_libs()
+
+            for lib, original in self.duplicates.items():
+                logging.info(f"{self.function}: {lib} is identical to {original}, it isn't called")
+
+        if self.incremental:
+            target = self.up_to_date(target_folder)
+
+            if target:
+                logging.info(f"target '{target}' is up to date")
+                return target
+
+        manifest = self.generate_manifest()
+
+        # instrumented targets embed the paths of the counters, so they aren't shared:
+        if self.cache and not manifest['coverage']:
+            key = self.cache_key(manifest)
+            target = self.restore_target(target_folder, key)
+
+            if target:
+                logging.info(f"target '{target}' restored from the artifact cache")
+
+                if test_harness:
+                    self.restore_test_harness(target_folder, key)
+
+                # the symbols the semantic wrappers need are unknown, so compare whole blobs:
+                if self.semantic_wrappers:
+                    for lib in manifest['libs'].values():
+                        lib['closure'] = None
+
+                manifest['target'] = os.path.abspath(target)
+                self.store_manifest(target_folder, manifest)
+                return target
+
+            before = artifacts.snapshot(target_folder)
+
         # Create a temporary build directory:
         self.tmp = tools.generate_tmp_dir(add=f"sputnik_{self.function}_")
 
-        links = [lib.target for lib in self.libs]
+        wrappers = {lib.name: None for lib in self.libs}
 
         # Build semantic wrapper for every included lib:
         if self.semantic_wrappers:
+            wrappers = self.build_all_semantic_wrappers()
+
+            # remember the symbols every wrapper needs from its library:
+            roots = dict()
             for lib in self.libs:
-                target_semwrapper = os.path.join(self.tmp, f"semantics_{lib.name}.ll")
-                links += self.build_semantic_wrappers(lib, target_semwrapper)
+                names = rename.detect_declarations(wrappers[lib.name])
+                roots[lib.name] = sorted(lib.build.original_name(n) for n in names)
+
+            manifest = self.generate_manifest(roots) | {'harness': manifest['harness']}
+
+        links = [self.library_link(lib, wrappers[lib.name]) for lib in self.libs
+                 if lib.name not in self.duplicates]
+        links += [w for w in wrappers.values() if w]
 
         # write and compile test harness:
         source_test_harness = self.write_test_harness(os.path.join(self.tmp, "main.c"))
         target = self.engine_wrapper("build_target")(target_folder, source_test_harness, links)
 
+        if self.cache and not manifest['coverage']:
+            self.cache.store(key, target_folder, artifacts.changed(target_folder, before))
+
+            # the entry points are renamed while the semantic wrappers are built:
+            if self.semantic_wrappers:
+                self.cache.store(artifacts.key(key, 'harness'), self.tmp, [os.path.basename(source_test_harness)])
+
         if test_harness:
             tools.copyfile(os.path.join(target_folder, f"test_harness.c"), source_test_harness)
 
+        manifest['target'] = os.path.abspath(target)
+        self.store_manifest(target_folder, manifest)
+
         return target
 
     def build_target_symex(self, target_folder, source_test_harness, links):
@@ -787,11 +1621,26 @@ void verifier()
         links.append(llvm_test_harness)
 
         # determine path of blob:
-        target = os.path.join(target_folder, f"{self.function}.bc")
+        target = self.target_path(target_folder)
 
         #logging.debug("link %s to %s" % (local_links, target))
         compiler.link(target, links)
 
+        # report the size of the symbolic input space to size the budget of KLEE:
+        space = self.input_space()
+        logging.info(f"{self.function}: input space of 2^{space['bits']} values")
+
+        with open(os.path.join(target_folder, "input_space.json"), 'w') as f:
+            json.dump(space, f, indent=4)
+
+        # map the KLEE tests of this target to their array width (see widths.py):
+        with open(os.path.join(target_folder, self.WIDTHS), 'w') as f:
+            json.dump({
+                'object': self.WIDTH_OBJECT if self.width_symbolic() else None,
+                'low': self.MIN_ARRAY_WIDTH if self.width_symbolic() else self.array_width,
+                'high': self.array_width,
+            }, f, indent=4)
+
         return target
 
     def build_target_fuzzing(self, target_folder, source_test_harness, links):
@@ -808,24 +1657,229 @@ void verifier()
 
         # invoke afl-gcc -o ./a.out main.c *.o
         ls = ' '.join(compiled_links)
-        target = os.path.join(target_folder, f"{self.function}.afl")
+        target = self.target_path(target_folder, 'fuzzing')
         compiler.run_command(f"afl-gcc -o {target} {source_test_harness} {ls}")
 
+        # describe the input encoding, so test cases can be converted without this test:
+        from sputnik.inputs import InputLayout
+
+        with open(target.rsplit('.', 1)[0] + '.json', 'w') as f:
+            json.dump({
+                'function': self.function,
+                'inputs': InputLayout.from_variables(self.input_variables()).describe(),
+            }, f, indent=4)
+
         # create toolset inside that target folder
         self.generate_toolchain_fuzzing(target_folder, target)
 
         return target
 
+    def build_target_libfuzzer(self, target_folder, source_test_harness, links):
+        """ Hint: This method is called by build_target of a wrapper function """
+
+        # every blob is instrumented while it is compiled, so the libraries are covered too:
+        def compile(src):
+            dest = os.path.join(self.tmp, os.path.basename(src) + '.o')
+            compiler.compile_file(dest, src, f"-c -g -O1 {compiler.FUZZER_FLAGS}")
+            return dest
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            compiled_links = list(pool.map(compile, links))
+
+        target = self.target_path(target_folder)
+        sources = ' '.join([source_test_harness] + compiled_links)
+        compiler.compile_file(target, sources, f"-g -O1 {compiler.FUZZER_LINK_FLAGS}")
+
+        # describe the input records, so crashes and the corpus can be decoded without this test:
+        from sputnik.inputs import InputLayout
+
+        with open(target.rsplit('.', 1)[0] + '.json', 'w') as f:
+            json.dump({
+                'function': self.function,
+                'inputs': InputLayout.from_variables(self.input_variables()).describe(),
+            }, f, indent=4)
+
+        self.generate_toolchain_libfuzzer(target_folder, target)
+
+        return target
+
+    def build_target_concrete(self, target_folder, source_test_harness, links):
+        """ Hint: This method is called by build_target of a wrapper function """
+
+        compiled_links = list()
+
+        for src in links:
+            # the objects instrumented for gcov are compiled by the builder already:
+            if src.endswith('.o'):
+                compiled_links.append(src)
+                continue
+
+            dest = os.path.join(self.tmp, os.path.basename(src) + '.o')
+            compiler.compile_file(dest, src, '-fPIC -c')
+            compiled_links.append(dest)
+
+        target = self.target_path(target_folder)
+        sources = ' '.join([source_test_harness] + compiled_links)
+        cflags = '-shared -fPIC -g' + (f" {compiler.COVERAGE_FLAGS}" if self.coverage else '')
+        compiler.compile_file(target, sources, cflags)
+
+        # describe the input records, so the shared object can be used without this test:
+        from sputnik.inputs import InputLayout
+
+        with open(target.rsplit('.', 1)[0] + '.json', 'w') as f:
+            json.dump({
+                'function': self.function,
+                'libs': [lib.name for lib in self.libs],
+                'inputs': InputLayout.from_variables(self.input_variables()).describe(),
+                'ret': InputLayout.from_variables([self.signature.ret]).describe()[0],
+                'outputs': InputLayout.from_variables([a for a in self.input_variables() if a.isptr]).describe(),
+                'coverage': {lib.name: lib.coverage_target for lib in self.libs} if self.coverage else None,
+            }, f, indent=4)
+
+        return target
+
+    def replay(self, target_folder, directories, jobs=None):
+        """ Build the concrete test harness of this test and replay the .ktest files of the
+        given KLEE output directories on it (see replay.py). This method expects a prepared
+        test that isn't built yet.
+
+        Args:
+            target_folder: folder where the concrete test harness should be stored
+            directories: list of KLEE output directories of this test
+            jobs: number of directories that are replayed in parallel
+
+        Returns:
+            A dictionary mapping every directory to the list of its replayed test cases.
+        """
+
+        from sputnik import replay
+
+        engine = self.engine
+        self.set_engine_concrete()
+
+        try:
+            target = self.build_target(target_folder)
+            self.cleanup_all()
+        finally:
+            self.engine = engine
+
+        return replay.replay(target, directories, jobs)
+
+    def fuzzing_campaign(self, target):
+        """ Generate the commands of an afl-fuzz campaign. The campaign consists of one main
+        instance and instances - 1 secondary instances sharing the findings folder as sync
+        directory (configured by the keys 'instances' and 'pin' of the fuzzing section of the
+        configuration). If 'pin' is true, instance i is pinned to CPU i, a list of CPUs is used
+        round robin. An instance is resumed from its own queue if it has one (see run.sh).
+
+        Returns:
+            A list of shell commands starting one instance each.
+        """
+
+        instances = max(1, int(self.config['fuzzing'].get('instances', 1)))
+        pin = self.config['fuzzing'].get('pin', False)
+
+        if pin is True:
+            cpus = list(range(os.cpu_count() or 1))
+        elif pin:
+            cpus = list(pin)
+        else:
+            cpus = list()
+
+        commands = list()
+
+        for i in range(instances):
+            name = "main" if i == 0 else f"secondary{i:02d}"
+            role = "-M" if i == 0 else "-S"
+
+            command = f"afl-fuzz -i \"$(input {name})\" -o findings {role} {name} -- ./{os.path.basename(target)}"
+            if cpus:
+                command = f"taskset -c {cpus[i % len(cpus)]} " + command
+            if instances > 1:
+                command += f" > findings/{name}.log 2>&1 &"
+
+            commands.append(command)
+
+        return commands
+
+    def libfuzzer_campaign(self, target):
+        """ Generate the command of a libFuzzer campaign. libFuzzer runs 'jobs' fuzzing jobs in
+        'workers' processes (keys of the libfuzzer section of the configuration, the environment
+        variables JOBS and WORKERS of run.sh override them). The jobs share the corpus folder, so
+        a campaign is resumed from the corpus it left. Crashes are written to crashes/.
+
+        Returns:
+            The shell command starting the campaign (further arguments of run.sh are appended).
+        """
+
+        from sputnik.inputs import InputLayout
+
+        config = self.config['libfuzzer']
+        jobs = max(1, int(config.get('jobs', 1)))
+        workers = max(1, int(config.get('workers', min(jobs, os.cpu_count() or 1))))
+        size = InputLayout.from_variables(self.input_variables()).record_size
+
+        command = f"./{os.path.basename(target)} -jobs=${{JOBS:-{jobs}}} -workers=${{WORKERS:-{workers}}}"
+        command += f" -max_len={size} -artifact_prefix=crashes/"
+        if config.get('args'):
+            command += f" {config['args']}"
+
+        return command + ' "$@" corpus testcases'
+
+    def generate_toolchain_libfuzzer(self, target_folder, target):
+        with open(os.path.join(target_folder, "run.sh"), 'w') as f:
+            f.write('\n'.join([
+                '#!/bin/sh',
+                'cd "$(dirname "$0")"',
+                'mkdir -p corpus crashes',
+                f"exec {self.libfuzzer_campaign(target)}",
+                '']
+            ))
+
+        os.chmod(os.path.join(target_folder, "run.sh"), 0o755)
+
+        # the first input is a record of zeros:
+        from sputnik.inputs import InputLayout
+
+        layout = InputLayout.from_variables(self.input_variables())
+        os.makedirs(os.path.join(target_folder, "testcases"), exist_ok=True)
+
+        with open(os.path.join(target_folder, "testcases", "testcase_default"), 'wb') as f:
+            f.write(bytes(layout.record_size))
+
+    def seed_fuzzing(self, target_folder, directories):
+        """ Convert the .ktest files of the given KLEE output directories of this test into
+        test cases of the fuzzing target inside target_folder (see seeds.py). The fuzzing
+        target has to be built already.
+
+        Returns:
+            A list of the paths of the new test cases.
+        """
+
+        from sputnik import seeds
+
+        target = self.target_path(target_folder, 'fuzzing')
+        testcases = os.path.join(target_folder, "testcases")
+
+        return seeds.import_ktests(seeds.load_layout(target), directories, testcases)
+
     def generate_toolchain_fuzzing(self, target_folder, target):
-        # 1. create run.sh for convenient starting of fuzzer
+        # 1. create run.sh for convenient starting of the fuzzing campaign
         # 2. create testcases and a findings folder
         with open(os.path.join(target_folder, "run.sh"), 'w') as f:
             f.write('\n'.join([
                 '#!/bin/sh',
-                'rm -rf findings/*',
-                f"afl-fuzz -i testcases -o findings -- ./{os.path.basename(target)}"]
+                'cd "$(dirname "$0")"',
+                '# resume every instance from its own queue if it exists:',
+                'input() { if [ -d "findings/$1/queue" ]; then echo -; else echo testcases; fi; }',
+                "trap 'kill 0' INT TERM",
+                *self.fuzzing_campaign(target),
+                'wait',
+                '']
             ))
 
+        os.chmod(os.path.join(target_folder, "run.sh"), 0o755)
+
         os.makedirs(os.path.join(target_folder, "findings"), exist_ok=True)
         os.makedirs(os.path.join(target_folder, "testcases"), exist_ok=True)
 
@@ -851,6 +1905,10 @@ void verifier()
             A list of built blobs.
         """
 
+        if self.provably_identical():
+            logging.info(f"{self.function}: every implementation is identical, skip it")
+            return list()
+
         blob = self.build_target(next(folder_iter), test_harness)
 
         if not keep_folder:
@@ -859,11 +1917,34 @@ void verifier()
         return [blob]
 
     def build_targets_array(self, folder_iter, **kwargs):
+        """ Build a target for every array width from MIN_ARRAY_WIDTH up to
+        general_max_array_width in steps of 20%. In symbolic width mode (symex only) a single
+        target allocates the arrays with the maximal width and covers every width by the
+        symbolic value WIDTH_OBJECT instead (see widths.py for a report per width).
+
+        Returns:
+            A list of built blobs.
+        """
+
         blobs = list()
 
         m = self.general_max_array_width
 
-        for self.array_width in range(2, m + 1, max(int(m * 0.2), 1)):
+        # the semantic wrappers of the test are only known after preparing it:
+        self.array_width = m
+        self.prepare()
+
+        if self.provably_identical():
+            logging.info(f"{self.function}: every implementation is identical, skip it")
+            return blobs
+
+        if self.width_symbolic():
+            blobs.append(self.build_target(next(folder_iter), **kwargs))
+            self.cleanup_all()
+
+            return blobs
+
+        for self.array_width in range(self.MIN_ARRAY_WIDTH, m + 1, max(int(m * 0.2), 1)):
             # especially: recover a clean state
             self.prepare()
 
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+""" This module keeps the crafter resident in a daemon, so a build of many tests doesn't pay for
+starting Python, importing the crafter, parsing the config, loading every library with its
+rename mapping and fetching the signatures again and again. The daemon accepts build requests
+over a Unix domain socket and builds them with a single orchestrator (see orchestrator.py), so
+the toolchain steps of all clients share the same limit.
+
+Every message is a single line of JSON. A build request names the test class by the path of
+its file (or its module) and its name:
+
+    {"command": "build", "test": "tests/isalnum.py:isalnum", "engine": "symex",
+     "widths": [4, 8], "symbolic_width": false, "output": "./targets", "test_harness": false}
+
+The reply lists the blobs (or the error) of every build:
+
+    {"ok": true, "builds": [{"function": "isalnum", "width": 4, "blobs": [...]}, ...]}
+
+A test file is imported once and imported again after it changed. Send "reload" after the
+libraries were rebuilt.
+
+Example:
+
+    $ python -m sputnik.daemon serve -c ./configs/config_crafter.json -j 8 &
+    $ python -m sputnik.daemon build tests/isalnum.py:isalnum -e symex -w 4 8 -o ./targets
+    $ python -m sputnik.daemon stop
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from sputnik import orchestrator
+from sputnik.runner import create_builds, load_test, test_spec
+
+def default_socket():
+    return f"/tmp/sputnik-{os.getuid()}.sock"
+
+class Daemon:
+    """ This class holds the resident state: the general configuration of the crafter (with the
+    loaded libraries and the artifact cache) and the orchestrator running in its own thread. """
+
+    def __init__(self, config, jobs=None):
+        """ Args:
+            config: path to the crafter config
+            jobs: number of toolchain steps running at once
+        """
+
+        self.config = config
+        self.jobs = jobs
+        self.logger = logging.getLogger("daemon")
+
+        self.lock = threading.Lock()
+        self.active = 0
+        self.stats = {'requests': 0, 'builds': 0, 'started': time.time()}
+
+        self.loop = None
+        self.thread = None
+        self.orchestrator = None
+
+        self.load()
+
+    def load(self):
+        from sputnik.crafter import TestHarness
+
+        TestHarness.load_general_config(self.config)
+        self.logger.info(f"loaded '{self.config}' with {len(TestHarness.libs)} libraries")
+
+    def start(self):
+        """ Start the event loop of the orchestrator in its own thread. """
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+        self.orchestrator = orchestrator.Orchestrator(self.jobs)
+        asyncio.run_coroutine_threadsafe(self.orchestrator.__aenter__(), self.loop).result()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.orchestrator.__aexit__(None, None, None), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def build(self, request):
+        """ Build the test of the given request for every requested array width.
+
+        Returns:
+            The reply to the request.
+        """
+
+        engine = request.get('engine', 'symex')
+        output = os.path.abspath(request.get('output', './targets'))
+        builds = list()
+
+        # counted before the test is prepared, so a reload can't swap the libraries meanwhile:
+        with self.lock:
+            self.active += 1
+
+        try:
+            cls = load_test(request['test'])
+            builds = create_builds([cls], output, engine, request.get('widths'), request.get('symbolic_width', False))
+
+            coroutine = self.orchestrator.build_many(builds, test_harness=request.get('test_harness', False))
+            results = asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.stats['builds'] += len(builds)
+
+        reply = list()
+        for (test, _), result in zip(builds, results):
+            entry = {'function': test.function, 'width': test.array_width}
+            if isinstance(result, Exception):
+                entry['error'] = str(result)
+            else:
+                entry['blobs'] = result
+            reply.append(entry)
+
+        return {'ok': all('blobs' in r for r in reply), 'builds': reply}
+
+    def reload(self):
+        """ Load the configuration and the libraries again (e.g. after running the builder). """
+
+        with self.lock:
+            if self.active:
+                return {'ok': False, 'error': f"{self.active} requests are building"}
+            self.load()
+
+        return {'ok': True}
+
+    def handle(self, request):
+        """ Returns:
+            The reply to the given request.
+        """
+
+        with self.lock:
+            self.stats['requests'] += 1
+
+        command = request.get('command', 'build')
+        start = time.time()
+
+        try:
+            if command == 'build':
+                reply = self.build(request)
+            elif command == 'reload':
+                reply = self.reload()
+            elif command == 'ping':
+                reply = {'ok': True, 'stats': self.stats | {'active': self.active}}
+            else:
+                reply = {'ok': False, 'error': f"unknown command '{command}'"}
+        except Exception as e:
+            self.logger.exception(f"request {request} failed")
+            reply = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+
+        reply['seconds'] = round(time.time() - start, 3)
+        return reply
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                reply = {'ok': False, 'error': f"invalid request: {e}"}
+            else:
+                if request.get('command') == 'stop':
+                    self.send({'ok': True})
+                    threading.Thread(target=self.server.shutdown).start()
+                    return
+                reply = self.server.daemon.handle(request)
+
+            self.send(reply)
+
+    def send(self, reply):
+        self.wfile.write(json.dumps(reply).encode() + b'\n')
+        self.wfile.flush()
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve(daemon, path):
+    """ Serve requests on the Unix domain socket path until a client sends 'stop'. """
+
+    if os.path.exists(path):
+        # a socket nobody listens on anymore is left over by a killed daemon:
+        try:
+            request(path, {'command': 'ping'}, timeout=1)
+            raise RuntimeError(f"a daemon is listening on '{path}' already")
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(path)
+
+    daemon.start()
+
+    with Server(path, Handler) as server:
+        server.daemon = daemon
+        os.chmod(path, 0o600)
+        daemon.logger.info(f"listening on '{path}'")
+
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path)
+            daemon.stop()
+
+def request(path, message, timeout=None):
+    """ Send a request to the daemon listening on path.
+
+    Returns:
+        The reply of the daemon.
+    """
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(path)
+        s.sendall(json.dumps(message).encode() + b'\n')
+
+        with s.makefile('rb') as f:
+            line = f.readline()
+
+    if not line:
+        raise ConnectionError("the daemon closed the connection")
+
+    return json.loads(line)
+
+def main():
+    """ This function is called if this script should be run standalone. """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build test harnesses by a resident daemon')
+    parser.add_argument('-s', '--socket', default=default_socket(), help='path to the Unix domain socket')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('serve', help='start the daemon')
+    p.add_argument('-c', '--config', default='./configs/config_crafter.json', help='path to the crafter config')
+    p.add_argument('-j', '--jobs', type=int, default=None, help='number of toolchain steps running at once')
+    p.add_argument('-v', '--verbose', action='store_true', help='increase output verbosity')
+
+    p = sub.add_parser('build', help='build tests')
+    p.add_argument('tests', nargs='+', help="tests like 'path/to/tests.py:isalnum'")
+    p.add_argument('-o', '--output', default='./targets', help='folder the targets are stored in')
+    p.add_argument('-e', '--engine', default='symex', choices=['symex', 'fuzzing', 'libfuzzer', 'concrete'])
+    p.add_argument('-w', '--widths', type=int, nargs='*', default=None, help='array widths (default: general_max_array_width)')
+    p.add_argument('--symbolic-width', action='store_true', help='cover every width up to the largest one by a single symex target')
+    p.add_argument('-t', '--test-harness', action='store_true', help='keep the test harness in the target folder')
+
+    sub.add_parser('ping', help='print the state of the daemon')
+    sub.add_parser('reload', help='load the config and the libraries again')
+    sub.add_parser('stop', help='stop the daemon')
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                            format="%(asctime)-8s | %(name)s | %(levelname)s | %(message)s", datefmt="%H:%M:%S")
+        serve(Daemon(args.config, args.jobs), args.socket)
+        return 0
+
+    if args.command != 'build':
+        reply = request(args.socket, {'command': args.command})
+        print(json.dumps(reply, indent=4))
+        return 0 if reply['ok'] else 1
+
+    failed = 0
+    for test in args.tests:
+        reply = request(args.socket, {
+            'command': 'build',
+            'test': test_spec(test),
+            'engine': args.engine,
+            'widths': args.widths,
+            'symbolic_width': args.symbolic_width,
+            'output': os.path.abspath(args.output),
+            'test_harness': args.test_harness,
+        })
+
+        if 'builds' not in reply:
+            failed += 1
+            print(f"[!] {test}: {reply['error']}")
+            continue
+
+        for build in reply['builds']:
+            if 'error' in build:
+                failed += 1
+                print(f"[!] {build['function']} (width {build['width']}): {build['error']}")
+            else:
+                for blob in build['blobs']:
+                    print(f"[+] {blob}")
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+""" This module clusters the implementations of the listed functions statically before any
+test harness is built. The prebuilt blob of every library is disassembled and the code
+reachable from every function is fingerprinted with the original symbol names (the renamed
+symbols are mapped back by the rename mapping of that library). Libraries with the same
+fingerprint of a function share an identical implementation of that function. A function
+whose implementations build a single class can't show a divergence, so the crafter and the
+KLEE scheduler skip it.
+
+Example:
+
+    $ python -m sputnik.equivalence -c ./configs/config_builder.json -o equivalence.json
+    $ cat equivalence.json
+    {
+        "isalnum": [["musl", "musl_old"], ["diet"]],
+        ...
+    }
+"""
+
+import json
+import logging
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+from sputnik import compiler
+from sputnik import symbols
+from sputnik import tools
+from sputnik.library import Library
+
+def load_module(lib):
+    """ Disassemble the blob of the given library and scan it with the original symbol names.
+
+    Returns:
+        A tuple (definitions, declarations) like symbols.scan() returns them, but every renamed
+        symbol is named and referenced by its original name.
+    """
+
+    tmp = tools.generate_tmp_dir(add=f"sputnik_equivalence_{lib.name}_")
+
+    try:
+        ll = os.path.join(tmp, os.path.basename(lib.target).rsplit('.', 1)[0] + '.ll')
+        compiler.disassemble(ll, lib.target)
+        definitions, declarations = symbols.scan(ll)
+    finally:
+        tools.cleanup_tmp_dir(tmp)
+
+    original = lambda name: lib.build.original_name(name)
+
+    def sub(match):
+        name = match.group(1).strip('"')
+        return '@' + original(name) if original(name) != name else match.group(0)
+
+    for definition in definitions.values():
+        definition['lines'] = [symbols.SYMBOL.sub(sub, line) for line in definition['lines']]
+        definition['refs'] = [original(r) for r in definition['refs']]
+
+    definitions = {original(n): d for n, d in definitions.items()}
+    declarations = {original(n): k for n, k in declarations.items()}
+
+    return definitions, declarations
+
+def fingerprint_function(definitions, name):
+    """ Calculate the fingerprint of the code reachable from the given function like
+    symbols.SymbolIndex.closure_hash() does (see symbols.structural_hash()).
+
+    Returns:
+        The fingerprint as string or None if the function isn't defined.
+    """
+
+    if name not in definitions:
+        return None
+
+    internal_names = {n for n, d in definitions.items() if d['internal']}
+
+    def lookup(current, context):
+        definition = definitions.get(current)
+        if definition is None:
+            return None
+
+        digest = symbols.fingerprint(current, definition, internal_names)
+        return current, digest, definition['internal'], [(r, None) for r in definition['refs']]
+
+    return symbols.structural_hash([(name, None)], lookup)
+
+def fingerprint_library(libpath, functions):
+    """ Returns:
+        A tuple (name of the library, dictionary mapping every function to its fingerprint)
+    """
+
+    lib = Library.load(libpath)
+    definitions, _ = load_module(lib)
+
+    return lib.name, {f: fingerprint_function(definitions, f) for f in functions}
+
+def classify(libpaths, functions, jobs=None):
+    """ Build the equivalence table of the given functions.
+
+    Args:
+        libpaths: list of paths to the libraries (like config['libs'])
+        functions: list of function names (like config['functions'].keys())
+        jobs: number of libraries that are fingerprinted in parallel
+
+    Returns:
+        A dictionary mapping every function to the list of its equivalence classes. A class is
+        the list of the names of the libraries sharing an identical implementation. Libraries
+        that don't define the function build a class on their own each.
+    """
+
+    logger = logging.getLogger("equivalence")
+    functions = list(functions)
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        fingerprints = list(pool.map(fingerprint_library, libpaths, [functions] * len(libpaths)))
+
+    table = dict()
+
+    for function in functions:
+        classes = dict()
+
+        for lib, prints in fingerprints:
+            key = prints[function] or f"undefined in {lib}"
+            classes.setdefault(key, list()).append(lib)
+
+        table[function] = list(classes.values())
+
+        if len(classes) == 1:
+            logger.info(f"{function}: every implementation is identical")
+
+    return table
+
+def load_table(path):
+    with open(path) as f:
+        return json.load(f)
+
+def single_class(table, function, libs):
+    """ Check if every given library shares the same implementation of the function according
+    to the equivalence table.
+
+    Args:
+        table: equivalence table (see classify())
+        function: name of the function
+        libs: list of library names
+
+    Returns:
+        True if the function can be skipped
+    """
+
+    if function not in table:
+        return False
+
+    return any(set(libs) <= set(c) for c in table[function])
+
+def main():
+    """ This function is called if this script should be run standalone. """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Cluster the implementations of the listed functions statically')
+    parser.add_argument('-c', '--config', default='./configs/config_builder.json', help='path to the builder config')
+    parser.add_argument('-o', '--output', default='equivalence.json', help='path of the equivalence table')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of libraries fingerprinted in parallel')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(name)s | %(levelname)s | %(message)s")
+
+    with open(args.config) as f:
+        config = json.load(f)
+
+    table = classify(config['libs'], config['functions'].keys(), args.jobs)
+
+    with open(args.output, 'w') as f:
+        json.dump(table, f, indent=4)
+
+    single = [f for f, classes in table.items() if len(classes) == 1]
+    print(f"[+] {len(single)} of {len(table)} functions have a single equivalence class")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+
+""" This module describes the binary layout of the test input of a test harness. A test input
+is stored as record holding the value of every variable input argument (those arguments of
+TestHarness.arguments_cache without a fixed value) one after another in the order of the
+arguments_cache. The layout is shared by every engine that feeds concrete inputs into a test
+harness (the concrete engine, replaying of .ktest files, ...).
+
+The input generation depends on NumPy, which is imported on first use.
+"""
+
+import ctypes
+import re
+
+# C types whose values can be generated and decoded (the size is the size on this host):
+CTYPES = {
+    'char': ctypes.c_byte,
+    'signed char': ctypes.c_byte,
+    'unsigned char': ctypes.c_ubyte,
+    'short': ctypes.c_short,
+    'short int': ctypes.c_short,
+    'unsigned short': ctypes.c_ushort,
+    'unsigned short int': ctypes.c_ushort,
+    'int': ctypes.c_int,
+    'unsigned': ctypes.c_uint,
+    'unsigned int': ctypes.c_uint,
+    'long': ctypes.c_long,
+    'long int': ctypes.c_long,
+    'unsigned long': ctypes.c_ulong,
+    'unsigned long int': ctypes.c_ulong,
+    'long long': ctypes.c_longlong,
+    'long long int': ctypes.c_longlong,
+    'unsigned long long': ctypes.c_ulonglong,
+    'unsigned long long int': ctypes.c_ulonglong,
+    'size_t': ctypes.c_size_t,
+    'ssize_t': ctypes.c_ssize_t,
+    'wint_t': ctypes.c_uint,
+    'wchar_t': ctypes.c_int,
+    'float': ctypes.c_float,
+    'double': ctypes.c_double,
+}
+
+# scalar fields having at most this many values are enumerated exhaustively:
+SMALL_DOMAIN = 512
+
+def numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("the input generation needs NumPy (pip install numpy)")
+    return numpy
+
+class Field:
+    """ This class describes the place of a single argument inside of an input record. """
+
+    def __init__(self, name, type, ptr_depth, array_size, size=None, offset=0):
+        self.name, self.type = name, type
+        self.ptr_depth, self.array_size = ptr_depth, array_size
+        self.offset = offset
+
+        # pointers to char and void are arrays, every other pointer is a single value:
+        self.isarray = ptr_depth > 0 and type in ["void", "char"]
+        self.count = array_size if self.isarray else 1
+
+        if size is None:
+            size = self.count * ctypes.sizeof(self.ctype or ctypes.c_byte)
+        self.size = size
+
+    @property
+    def ctype(self):
+        return CTYPES.get('char' if self.type == 'void' else self.type)
+
+    @property
+    def isstring(self):
+        return self.isarray and self.type == 'char'
+
+    @property
+    def signed(self):
+        return self.ctype is not None and self.ctype(-1).value == -1
+
+    @property
+    def integral(self):
+        return self.ctype is not None and self.type not in ['float', 'double']
+
+    def limits(self):
+        """ Returns:
+            A tuple (minimum, maximum) of the values of one element of that field.
+        """
+
+        bits = 8 * ctypes.sizeof(self.ctype)
+        if self.signed:
+            return -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+        return 0, (1 << bits) - 1
+
+    def domain(self):
+        """ Returns:
+            A list of every value of that field if its domain is small (like char or an int
+            holding a character) or None otherwise.
+        """
+
+        if self.isarray or not self.integral:
+            return None
+
+        low, high = self.limits()
+        if high - low < SMALL_DOMAIN:
+            return list(range(low, high + 1))
+
+        if self.type in ['int', 'wint_t']:
+            # int arguments are mostly characters (like in isalnum()) or EOF:
+            return [v for v in range(-128, 256) if low <= v <= high]
+
+        return None
+
+    def boundaries(self):
+        """ Returns:
+            A list of interesting values of one element of that field.
+        """
+
+        if not self.integral:
+            return [0]
+
+        low, high = self.limits()
+        values = [low, low + 1, -1, 0, 1, 0x7f, 0x80, 0xff, high - 1, high]
+        return sorted(set(v for v in values if low <= v <= high))
+
+    def describe(self):
+        return {'name': self.name, 'type': self.type, 'ptr_depth': self.ptr_depth,
+                'array_size': self.array_size}
+
+class InputLayout:
+    """ This class describes the layout of the records holding the inputs of a test harness. """
+
+    @staticmethod
+    def from_variables(variables, sizes=None):
+        """ Create the layout of the given language.Variable instances.
+
+        Args:
+            variables: list of language.Variable instances
+            sizes: list of the sizes of the variables (like sizeof() in the test harness). The
+                sizes are derived from the types on this host if they aren't given.
+        """
+
+        description = [{'name': v.name, 'type': v.type, 'ptr_depth': v.ptr_depth,
+                        'array_size': v.array_size} for v in variables]
+        return InputLayout(description, sizes)
+
+    def __init__(self, description, sizes=None):
+        """ Args:
+            description: list of dictionaries as returned by self.describe()
+            sizes: list of the sizes of the fields or None
+        """
+
+        self.fields = list()
+        offset = 0
+
+        for i, d in enumerate(description):
+            size = sizes[i] if sizes else None
+            field = Field(d['name'], d['type'], d['ptr_depth'], d['array_size'], size, offset)
+            self.fields.append(field)
+            offset += field.size
+
+        self.record_size = offset
+
+    def describe(self):
+        return [f.describe() for f in self.fields]
+
+    def field(self, name):
+        return next(f for f in self.fields if f.name == name)
+
+    def pack(self, values):
+        """ Build a record out of a dictionary mapping the field names to their values. Values
+        of arrays are bytes (padded with zeros), every other value is an int or raw bytes.
+        """
+
+        record = bytearray(self.record_size)
+
+        for f in self.fields:
+            value = values.get(f.name, 0)
+
+            if isinstance(value, int):
+                value = value.to_bytes(f.size, 'little', signed=value < 0)
+            elif isinstance(value, str):
+                value = value.encode('latin-1')
+
+            value = bytes(value[:f.size])
+            record[f.offset:f.offset + len(value)] = value
+
+        return bytes(record)
+
+    def unpack(self, record):
+        """ Split a record into a dictionary mapping the field names to their values. """
+
+        values = dict()
+
+        for f in self.fields:
+            raw = bytes(record[f.offset:f.offset + f.size])
+
+            if not f.isarray and f.integral:
+                values[f.name] = int.from_bytes(raw, 'little', signed=f.signed)
+            elif not f.isarray and f.ctype is not None:
+                values[f.name] = f.ctype.from_buffer_copy(raw).value
+            else:
+                values[f.name] = raw
+
+        return values
+
+    def from_fuzzing(self, data):
+        """ Decode an input of the fuzzing test harness (the data afl-fuzz writes to stdin,
+        see TestHarness.define_input_fuzzing()) into a record. The fields are read one after
+        another like the test harness does: a number is a token (leading whitespace is skipped)
+        followed by a single separator, a string is its length (a number) followed by as many
+        raw characters (at most the size of the array minus one), characters and wint_t values
+        are raw.
+
+        Args:
+            data: bytes of the fuzzing input
+
+        Returns:
+            The record as bytes.
+        """
+
+        values, position = dict(), 0
+        whitespace = b' \t\n\v\f\r'
+
+        def number():
+            """ Read a number and its separator like scanf("%d%*c") or None. """
+            nonlocal position
+            while position < len(data) and data[position] in whitespace:
+                position += 1
+            match = re.match(rb"[+-]?\d+", data[position:])
+            if not match:
+                return None
+            position += match.end() + 1
+            return int(match.group(0))
+
+        for f in self.fields:
+            if f.type == 'wint_t' and not f.isarray:
+                values[f.name] = data[position:position + 4]
+                position += 4
+            elif f.type == 'char' and not f.isarray:
+                values[f.name] = data[position:position + 1]
+                position += 1
+            elif f.isstring:
+                length = number()
+                if length is None:
+                    break
+                # negative lengths wrap around like in strtoul(), so they are clamped as well:
+                if length < 0 or length > f.count - 1:
+                    length = f.count - 1
+                values[f.name] = data[position:position + length]
+                position += length
+            elif f.integral:
+                value = number()
+                if value is None:
+                    break
+                low, high = f.limits()
+                values[f.name] = (value - low) % (high - low + 1) + low
+            else:
+                break
+
+        return self.pack(values)
+
+    def to_fuzzing(self, record):
+        """ Encode a record as input of the fuzzing test harness (the inverse of
+        from_fuzzing()). Characters and wint_t values are written raw, every number is
+        followed by a newline as separator and every string is written as its length and its
+        characters up to the first null byte.
+
+        Args:
+            record: the record as bytes
+
+        Returns:
+            The input as bytes.
+        """
+
+        values = self.unpack(record)
+        data = bytearray()
+
+        for f in self.fields:
+            if f.type == 'wint_t' and not f.isarray:
+                data += bytes(record[f.offset:f.offset + 4])
+            elif f.type == 'char' and not f.isarray:
+                data += bytes(record[f.offset:f.offset + 1])
+            elif f.isstring:
+                string = values[f.name][:f.count - 1].split(b'\0')[0]
+                data += str(len(string)).encode() + b'\n' + string
+            elif f.integral:
+                data += str(values[f.name]).encode() + b'\n'
+            else:
+                break
+
+        return bytes(data)
+
+    def set_field(self, records, field, values):
+        """ Write the values (one per record) into the given field of every record. """
+
+        np = numpy()
+        dtype = np.dtype(field.ctype)
+        raw = np.ascontiguousarray(np.asarray(values).astype(dtype)).view(np.uint8)
+        records[:, field.offset:field.offset + field.size] = raw.reshape(len(records), -1)
+
+    def generate(self, count, seed=None):
+        """ Generate input records with NumPy. The records start with the exhaustive
+        enumeration of all fields having a small domain (if there are few enough combinations),
+        followed by records setting single fields to boundary values. The remaining records are
+        random. Strings are terminated by a null byte at a random position.
+
+        Args:
+            count: number of records that should be generated
+            seed: seed of the random number generator
+
+        Returns:
+            A NumPy array of shape (count, self.record_size) and type uint8.
+        """
+
+        np = numpy()
+        rng = np.random.default_rng(seed)
+
+        records = rng.integers(0, 256, size=(count, self.record_size), dtype=np.uint8)
+        position = 0
+
+        # exhaustive enumeration of the small domains:
+        small = [(f, f.domain()) for f in self.fields if f.domain() is not None]
+        combinations = 1
+        for _, domain in small:
+            combinations *= len(domain)
+
+        if small and combinations <= count // 2:
+            grids = np.meshgrid(*[np.array(d) for _, d in small], indexing='ij')
+            for (f, _), grid in zip(small, grids):
+                self.set_field(records[:combinations], f, grid.reshape(-1))
+            position = combinations
+
+        # boundary values of every single field:
+        for f in self.fields:
+            if f.isstring:
+                lengths = [0, 1, f.count - 1]
+                values = [bytes([0x41] * l) for l in lengths] + [bytes([0xff] * (f.count - 1))]
+                for value in values:
+                    if position >= count:
+                        break
+                    records[position, f.offset:f.offset + f.size] = 0
+                    records[position, f.offset:f.offset + len(value)] = np.frombuffer(value, np.uint8)
+                    position += 1
+            elif not f.isarray and f.ctype is not None:
+                for value in f.boundaries():
+                    if position >= count:
+                        break
+                    self.set_field(records[position:position + 1], f, [value])
+                    position += 1
+
+        # terminate the random strings:
+        for f in self.fields:
+            if f.isstring and f.count > 0:
+                rows = records[position:, f.offset:f.offset + f.count]
+                nul = rng.integers(0, f.count, size=len(rows))
+                rows[np.arange(f.count)[None, :] >= nul[:, None]] = 0
+
+        return records
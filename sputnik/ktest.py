@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+""" This module reads the .ktest files written by KLEE. A .ktest file holds the concrete value
+of every object that was made symbolic by klee_make_symbolic() for one test case. """
+
+import glob
+import os
+import struct
+
+class KTestError(Exception):
+    pass
+
+class KTest:
+    @staticmethod
+    def load(path):
+        """ Parse the .ktest file of given filename path and return a KTest object. """
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        position = 0
+
+        def read(size):
+            nonlocal position
+            if position + size > len(data):
+                raise KTestError(f"unexpected end of file '{path}'")
+            chunk = data[position:position + size]
+            position += size
+            return chunk
+
+        def read_uint32():
+            return struct.unpack('>I', read(4))[0]
+
+        if read(5) not in [b'KTEST', b'BOUT\n']:
+            raise KTestError(f"invalid magic in '{path}'")
+
+        version = read_uint32()
+        args = [read(read_uint32()).decode(errors='replace') for _ in range(read_uint32())]
+
+        if version >= 2:
+            # symArgvs and symArgvLen:
+            read_uint32()
+            read_uint32()
+
+        objects = list()
+        for _ in range(read_uint32()):
+            name = read(read_uint32()).decode(errors='replace')
+            objects.append((name, read(read_uint32())))
+
+        return KTest(path, version, args, objects)
+
+    def __init__(self, path, version, args, objects):
+        """ Args:
+            path: path of the .ktest file
+            version: version of the file format
+            args: list of the command line arguments of that KLEE run
+            objects: list of tuples (name, bytes) of the symbolic objects
+        """
+
+        self.path, self.version, self.args, self.objects = path, version, args, objects
+
+    @property
+    def name(self):
+        return os.path.basename(self.path).rsplit('.', 1)[0]
+
+    def values(self):
+        """ Returns:
+            A dictionary mapping the name of every symbolic object to its content.
+        """
+
+        return dict(self.objects)
+
+    def errors(self):
+        """ Returns:
+            A list of paths of the error reports (like 'test000001.sputnik_error.err') that
+            KLEE wrote for this test case.
+        """
+
+        return sorted(glob.glob(self.path.rsplit('.', 1)[0] + '.*.err'))
+
+def load_directory(directory):
+    """ Load every .ktest file of a KLEE output directory (like 'klee-out-0') in order. """
+
+    return [KTest.load(p) for p in sorted(glob.glob(os.path.join(directory, '*.ktest')))]
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import functools
 import re
 import copy
 
@@ -201,8 +202,10 @@ class Variable:
     def __eq__(self, other):
         return self.name == other.name and self.type == other.type and self.ptr_depth == other.ptr_depth and self.array_size == other.array_size
 
+@functools.lru_cache(maxsize=None)
 def function_signature_raw(fname):
-    """ This method fetches the signature of a function from the man page.
+    """ This method fetches the signature of a function from the man page. The signature is
+    cached, so the man page is read once per process.
 
     Returns:
         The proper signature as string.
@@ -1,11 +1,19 @@
 #!/usr/bin/env python3
 
+import fnmatch
 import json
 import os
 
 class Build:
     FILENAME_NAME_MAPPING   = "rename_mapping.json"
     FILENAME_INCLUDED_FILES = "included_files.json"
+    FILENAME_SYMBOL_INDEX   = "symbols.db"
+
+    # directories of the builder inside the build directory (the build directory mirrors the
+    # source tree, so these names are skipped while scanning the sources):
+    DIR_PARTIALS = ".partials"
+    DIR_WRAPPERS = ".wrappers"
+    RESERVED_DIRS = (DIR_PARTIALS, DIR_WRAPPERS)
 
     def __init__(self, directory, lib):
         self.dir, self.lib = directory, lib
@@ -13,18 +21,30 @@ class Build:
 
         self.name_mapping = dict()
         self.included_files = list()
+        self.original_names = None
         self.reload()
 
     def resolve_function(self, funcname):
         return self.name_mapping['@' + funcname][1:]
 
+    def original_name(self, name):
+        """ Map a renamed symbol back to its original name. Symbols that aren't renamed by the
+        build (e.g. functions declared outside of the library) are returned unchanged. """
+
+        if self.original_names is None:
+            self.original_names = {v[1:]: k[1:] for k, v in self.name_mapping.items()}
+
+        return self.original_names.get(name, name)
+
     def reload(self):
         self.name_mapping = self.load_name_mapping()
         self.included_files = self.load_included_files()
+        self.original_names = None
 
     def flush(self):
         self.name_mapping = dict()
         self.included_files = list()
+        self.original_names = None
 
     def load_included_files(self):
         p = os.path.join(self.dir, Build.FILENAME_INCLUDED_FILES)
@@ -60,9 +80,174 @@ class Build:
         with open(p, 'w') as f:
             f.write(json.dumps(mapping))
 
+    def symbol_index(self):
+        """ Returns:
+            The cached symbols.SymbolIndex of this build or None if there is no index.
+        """
+
+        if getattr(self, '_symbol_index', None) is None:
+            if not os.path.isfile(os.path.join(self.dir, Build.FILENAME_SYMBOL_INDEX)):
+                return None
+            self._symbol_index = self.load_symbol_index()
+
+        return self._symbol_index
+
+    def load_symbol_index(self):
+        """ Returns:
+            The symbols.SymbolIndex of this build (see prebuild.py)
+        """
+
+        from sputnik.symbols import SymbolIndex
+        return SymbolIndex(os.path.join(self.dir, Build.FILENAME_SYMBOL_INDEX), self.dir)
+
     def abspath(self, path):
         return os.path.join(self.dir, path)
 
+class SourceIndex:
+    """ This class indexes the source files of a library. The index is built with os.scandir
+    and a snapshot of every indexed file (mtime and size) and of every visited directory is
+    stored in the build directory. A directory whose mtime didn't change since the last snapshot
+    still has the same entries, so its listing is taken from the snapshot instead of scanning
+    it again. Only the files themselves need to be checked for modifications.
+    """
+
+    FILENAME = "source_index.json"
+
+    def __init__(self, lib):
+        self.lib = lib
+        self.path = os.path.join(lib.builddir, SourceIndex.FILENAME)
+
+        # the current state of the source tree, filled by self.scan():
+        self.dirs = dict()
+        self.files = dict()
+        self.scanned = False
+
+    def load(self):
+        """ Load the stored snapshot.
+
+        Returns:
+            A tuple (dirs, files) of the stored snapshot (empty if there is no snapshot)
+        """
+
+        try:
+            with open(self.path) as f:
+                snapshot = json.loads(f.read())
+        except:
+            snapshot = dict()
+
+        return snapshot.get('dirs', dict()), snapshot.get('files', dict())
+
+    def store(self, exclude=()):
+        """ Store the current state of the source tree as snapshot in the build directory.
+
+        Args:
+            exclude: source files left out of the snapshot (like files that failed to compile),
+                so they are reported as added by the next changes()
+        """
+
+        if not self.scanned:
+            self.scan()
+
+        os.makedirs(self.lib.builddir, exist_ok=True)
+
+        exclude = set(exclude)
+        files = {path: state for path, state in self.files.items() if path not in exclude}
+
+        with open(self.path, 'w') as f:
+            f.write(json.dumps({'dirs': self.dirs, 'files': files}))
+
+    def included(self, path):
+        """ Check if path (relative to the library directory) matches the include and
+        exclude patterns of the library. """
+
+        if any(fnmatch.fnmatch(path, p) for p in self.lib.exclude):
+            return False
+        return any(fnmatch.fnmatch(path, p) for p in self.lib.include)
+
+    def scan(self):
+        """ Build the index of the source tree based on the traversals of the library. """
+
+        old_dirs, _ = self.load()
+        self.dirs, self.files = dict(), dict()
+
+        def add_file(path):
+            try:
+                st = os.stat(os.path.join(self.lib.directory, path))
+            except FileNotFoundError:
+                return
+            self.files[path] = [st.st_mtime_ns, st.st_size]
+
+        def walk(reldir):
+            if reldir in self.dirs:
+                return
+
+            absdir = os.path.join(self.lib.directory, reldir)
+            mtime = os.stat(absdir).st_mtime_ns
+            cached = old_dirs.get(reldir)
+
+            if cached and cached['mtime'] == mtime:
+                files, subdirs = cached['files'], cached['subdirs']
+            else:
+                files, subdirs = list(), list()
+                with os.scandir(absdir) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            files.append(entry.name)
+                        elif entry.is_dir():
+                            subdirs.append(entry.name)
+
+            self.dirs[reldir] = {'mtime': mtime, 'files': sorted(files), 'subdirs': sorted(subdirs)}
+
+            for name in self.dirs[reldir]['files']:
+                path = os.path.normpath(os.path.join(reldir, name))
+                if self.included(path):
+                    add_file(path)
+
+            if self.lib.recursive:
+                for name in self.dirs[reldir]['subdirs']:
+                    path = os.path.normpath(os.path.join(reldir, name))
+                    if path in Build.RESERVED_DIRS:
+                        continue
+                    if not any(fnmatch.fnmatch(path, p) for p in self.lib.exclude):
+                        walk(path)
+
+        for traversal in self.lib.traversals:
+            if traversal.endswith('.c'):
+                add_file(os.path.normpath(traversal))
+            else:
+                walk(os.path.normpath(traversal))
+
+        self.scanned = True
+
+    def sources(self):
+        """ Returns:
+            A sorted list of all indexed source files (relative to the library directory)
+        """
+
+        if not self.scanned:
+            self.scan()
+
+        return sorted(self.files)
+
+    def changes(self):
+        """ Compare the current state of the source tree with the stored snapshot.
+
+        Returns:
+            A tuple (added, modified, removed) of sets holding the paths of the source files
+            that changed since the snapshot was stored.
+        """
+
+        if not self.scanned:
+            self.scan()
+
+        _, old_files = self.load()
+
+        added = set(self.files) - set(old_files)
+        removed = set(old_files) - set(self.files)
+        modified = {f for f in set(self.files) & set(old_files) if self.files[f] != old_files[f]}
+
+        return added, modified, removed
+
 class Library:
     CONFIGNAME = "config.json"
 
@@ -81,6 +266,13 @@ class Library:
             # should be searched in order to find implementations. Add '.'
             # to invoke a greedy search.
             "traversals": [],
+
+            # source files are searched recursively inside the traversals if "recursive" is
+            # set. Only files matching one of the "include" globs and none of the "exclude"
+            # globs are considered. The globs are relative to "directory".
+            "recursive": False,
+            "include": ["*.c"],
+            "exclude": [],
             "target": "./here_name_of_target.bc"
         }, indent=4)
 
@@ -111,6 +303,9 @@ class Library:
         config['directory'] = os.path.join(path, config['directory'])
         config['builddir'] = config['directory'] + '-build'
         config['target'] = os.path.join(config['builddir'], config['target'])
+        config['slim_target'] = config['target'].rsplit('.', 1)[0] + '.slim.bc'
+        config['coverage_target'] = os.path.join(config['builddir'], "coverage",
+                                                 os.path.basename(config['target']).rsplit('.', 1)[0] + '.o')
         config['rename_mapping'] = os.path.join(config['builddir'], "rename_mapping.json")
 
         return Library(**config)
@@ -125,37 +320,48 @@ class Library:
         self.directory = str()
         self.builddir = str()
         self.target = str()
+        self.slim_target = str()
+        self.coverage_target = str()
         self.rename_mapping = dict()
+        self.recursive = False
+        self.include = ["*.c"]
+        self.exclude = list()
 
         for k, v in kwargs.items():
             setattr(self, k, v)
 
         self.build = Build(self.builddir, self)
+        self.index = SourceIndex(self)
 
     def load_rename_mapping(self):
         with open(self.rename_mapping) as f:
             m = json.loads(f.read())
         return m
 
-    def sources(self):
-        """ This method generates an iterable that yields every path to a source file that should
-        be considered in build- or analysis process. This paths are relative to self.directory or
-        to further builddirs (e.g. 'src/linux/link.c') """
+    def traversal_group(self, path):
+        """ This method determines the group of a source path that is used to link the compiled
+        files of a library hierarchically. Every traversal directory builds its own group and
+        explicitly listed source files are grouped by the directory they are placed in.
+
+        Args:
+            path: path relative to self.directory (e.g. 'src/string/strcpy.c')
+
+        Returns:
+            A string naming the group (e.g. 'src/string' or '.' for the greedy traversal)
+        """
+
+        directory = os.path.dirname(os.path.normpath(path)) or '.'
 
         for traversal in self.traversals:
-            if traversal.endswith('.c'):
-                yield traversal
-                continue
+            if not traversal.endswith('.c') and os.path.normpath(traversal) == directory:
+                return os.path.normpath(traversal)
 
-            # search in fld for source files:
-            fld = os.path.join(self.directory, traversal)
+        return directory
 
-            #for dirpath, dirnames, filenames in os.walk(fld):
-            #    for filename in filter(lambda f: f.endswith('.c'), filenames):
-            #        yield os.path.relpath(os.path.join(dirpath, filename), self.directory)
+    def sources(self):
+        """ This method returns every path to a source file that should be considered in build-
+        or analysis process. This paths are relative to self.directory or to further builddirs
+        (e.g. 'src/linux/link.c'). The paths are taken from the source index which is built on
+        the first call. """
 
-            # we do not want to have recursion so we switch to this snippet:
-            for f in os.listdir(fld):
-                fe = os.path.join(fld, f)
-                if os.path.isfile(fe) and fe.endswith('.c'):
-                    yield os.path.relpath(fe, self.directory)
+        return self.index.sources()
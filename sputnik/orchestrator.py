@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+""" This module interleaves the builds of many test harnesses with asyncio. The Python part of
+every build (generating the harness, renaming, ...) runs in a worker thread, while every
+toolchain step (clang, llvm-link, opt, ...) of compiler.run_command() becomes an asynchronous
+subprocess task of the event loop. A global limit bounds the number of toolchain steps
+running at once, so the builds of different functions and array widths share the cores while
+one of them waits for the disk.
+
+Example:
+
+    import asyncio
+    from sputnik import orchestrator
+
+    builds = [(test, folder_iter) for test, folder_iter in ...]
+    blobs = asyncio.run(orchestrator.build_many(builds, limit=8))
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from sputnik import compiler
+
+class Orchestrator:
+    """ While an orchestrator is active (async with), compiler.run_command() dispatches every
+    command to its event loop. """
+
+    def __init__(self, limit=None, builds=None):
+        """ Args:
+            limit: number of toolchain steps running at once (default: number of cores)
+            builds: number of builds running at once (default: twice the limit)
+        """
+
+        self.limit = limit or os.cpu_count()
+        self.builds = builds or 2 * self.limit
+        self.logger = logging.getLogger("orchestrator")
+
+        self.loop = None
+        self.thread = None
+        self.semaphore = None
+        self.pool = None
+        self.previous = None
+
+    async def __aenter__(self):
+        self.loop = asyncio.get_running_loop()
+        self.thread = threading.get_ident()
+        self.semaphore = asyncio.Semaphore(self.limit)
+        self.pool = ThreadPoolExecutor(max_workers=self.builds)
+
+        self.previous, compiler.dispatcher = compiler.dispatcher, self.dispatch
+        return self
+
+    async def __aexit__(self, *exc):
+        compiler.dispatcher = self.previous
+        self.pool.shutdown(wait=True)
+
+    async def run(self, call, cwd=None):
+        """ Run a shell command as soon as the limit allows it.
+
+        Returns:
+            The warnings (stderr) of the command or None (see compiler.run_command()).
+        """
+
+        async with self.semaphore:
+            return await compiler.run_command_async(call, cwd)
+
+    def dispatch(self, call, cwd=None):
+        """ This function replaces the blocking subprocess of compiler.run_command(). It is
+        called by the worker threads and blocks until the task finished. """
+
+        if threading.get_ident() == self.thread:
+            # called by the event loop itself, which must not wait for itself:
+            return compiler.run_process(call, cwd)
+
+        return asyncio.run_coroutine_threadsafe(self.run(call, cwd), self.loop).result()
+
+    async def build(self, test, folder_iter, method='build_targets', **kwargs):
+        """ Run the given build method of a prepared test in a worker thread.
+
+        Returns:
+            The result of that method (the list of built blobs).
+        """
+
+        call = functools.partial(getattr(test, method), folder_iter, **kwargs)
+        return await self.loop.run_in_executor(self.pool, call)
+
+    async def build_many(self, builds, **kwargs):
+        """ Build every given test concurrently.
+
+        Args:
+            builds: iterable of tuples (test, folder_iter) with a prepared TestHarness instance
+                each (every build needs its own instance)
+            kwargs: arguments for the build method (like test_harness=True)
+
+        Returns:
+            A list holding the result of every build in the given order. A failed build is
+            logged and its exception is returned instead of the blobs.
+        """
+
+        builds = list(builds)
+        results = await asyncio.gather(*[self.build(test, folder_iter, **kwargs)
+                                         for test, folder_iter in builds], return_exceptions=True)
+
+        for (test, _), result in zip(builds, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"build of '{test.function}' failed: {result}")
+
+        return results
+
+async def build_many(builds, limit=None, **kwargs):
+    """ Build every given test concurrently with at most limit toolchain steps at once (see
+    Orchestrator.build_many()). """
+
+    async with Orchestrator(limit) as orchestrator:
+        return await orchestrator.build_many(builds, **kwargs)
+
+def build_all(builds, limit=None, **kwargs):
+    """ This is the synchronous variant of build_many() for callers without event loop. """
+
+    return asyncio.run(build_many(builds, limit, **kwargs))
@@ -0,0 +1,666 @@
+#!/usr/bin/env python3
+
+from sputnik import artifacts
+from sputnik import compiler
+from sputnik import tools
+from sputnik.library import Build, Library
+from sputnik.rename import rename
+
+from concurrent.futures import ThreadPoolExecutor
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+
+class Builder:
+    # directory inside the build directory holding the partially linked modules:
+    PARTIALS_DIR = Build.DIR_PARTIALS
+    FILENAME_PARTIALS = "partials.json"
+
+    FILENAME_SIZE_REPORT = "size_report.json"
+
+    # directory inside the build directory holding the compiled shards of the call wrappers:
+    WRAPPERS_DIR = Build.DIR_WRAPPERS
+    FILENAME_WRAPPERS = "wrappers.json"
+
+    @staticmethod
+    def invoke(lib, config, rebuild, jobs=None, slim=False, cache=None, coverage=False):
+        b = Builder(lib, jobs)
+        b.run(config, rebuild, slim, cache, coverage)
+
+    def __init__(self, lib, jobs=None):
+        self.lib = lib
+        self.jobs = jobs or os.cpu_count() or 1
+        self.logger = logging.getLogger(lib.name)
+
+    def pre_compile(self, rebuild):
+        """ Build all files that are yielded by self.lib.sources(). It compiles them and writes
+        it to self.lib.builddir.
+
+        Args:
+            rebuild: boolean that flags if the lib should be rebuild despite already built files
+
+        Returns:
+            A list of all considerable files (including all already built files and the new ones
+        """
+
+        # path to the file where we want to store all files that we built:
+        included_files = os.path.join(self.lib.builddir, "included_files.json")
+
+        old_files = list()
+
+        cflags = "-S -emit-llvm -g -fno-builtin {0}".format(self.lib.compiler_flags)
+
+        if rebuild:
+            self.logger.debug("explicit rebuild")
+
+            # cleanup before (re-) compiling and create builddir:
+            shutil.rmtree(self.lib.builddir, ignore_errors=True)
+            os.mkdir(self.lib.builddir)
+        else:
+            # try to load the list of those functions that we've already built:
+            try:
+                with open(included_files) as f:
+                    old_files = json.loads(f.read())
+            except:
+                self.logger.debug("error rebuilding current state -> force explit rebuild")
+
+                return self.pre_compile(rebuild=True)
+
+        dest = lambda n: os.path.join(self.lib.builddir, n.rsplit('.', 1)[0] + '.ll')
+
+        # ask the source index which files changed since the last build:
+        sources = self.lib.sources()
+        added, modified, removed = self.lib.index.changes()
+
+        self.logger.debug(f"sources: {len(added)} added, {len(modified)} modified, {len(removed)} removed")
+
+        # forget about compiled files whose source files don't exist anymore:
+        current = set(dest(src) for src in sources)
+        old_files = [f for f in old_files if f in current]
+
+        new_files = {src: dest(src) for src in sources if dest(src) not in old_files or src in modified}
+
+        # build directory structure in build directory:
+        for f in new_files.values():
+            try:
+                os.makedirs(os.path.dirname(f))
+            except FileExistsError:
+                pass
+
+        # compile every considerable file:
+        compiled_files, stats = compiler.compile_collection(new_files, cflags, self.lib.directory)
+
+        self.logger.debug( "compile statistics:")
+        self.logger.debug(f"    compiled files: {stats['compiled']}")
+        self.logger.debug(f"    skipped files:  {stats['skipped']}")
+        self.logger.debug(f"    nr. failed:     {stats['failed']}")
+        self.logger.debug(f"    nr. warnings:   {stats['warning']}")
+
+        # a failed source keeps neither its stale compiled file nor its snapshot entry, so the
+        # blob never links outdated code and the source is compiled again next time:
+        failed = [src for src, f in new_files.items() if f not in compiled_files]
+
+        for src in failed:
+            self.logger.warning(f"'{src}' failed to compile, it is left out of the blob")
+            try:
+                os.remove(new_files[src])
+            except FileNotFoundError:
+                pass
+
+        stale = set(new_files[src] for src in failed)
+        all_files = [f for f in old_files if f not in stale] + [f for f in compiled_files if f not in old_files]
+
+        # write every file that we've touched here in a list, so we know next
+        # time which file should be already built.
+        with open(included_files, 'w') as f:
+            f.write(json.dumps(all_files, indent=4))
+
+        self.lib.index.store(exclude=failed)
+
+        return all_files
+
+    def link_partials(self, files):
+        """ Link the compiled files group-wise into partial modules. The groups are given by
+        self.lib.traversal_group() so every source directory gets its own partial module. A
+        partial module is only relinked if one of its members changed or the set of members
+        differs from the last build. The partial modules are linked in parallel.
+
+        Args:
+            files: list of paths to compiled files inside self.lib.builddir
+
+        Returns:
+            A list of paths to the partial modules
+        """
+
+        partials_dir = os.path.join(self.lib.builddir, Builder.PARTIALS_DIR)
+        partials_file = os.path.join(self.lib.builddir, Builder.FILENAME_PARTIALS)
+
+        os.makedirs(partials_dir, exist_ok=True)
+
+        try:
+            with open(partials_file) as f:
+                old_groups = json.loads(f.read())
+        except:
+            old_groups = dict()
+
+        groups = dict()
+        for f in files:
+            group = self.lib.traversal_group(os.path.relpath(f, self.lib.builddir))
+            groups.setdefault(group, list()).append(f)
+
+        # the hash tells groups apart that are mangled to the same name (like 'a/b' and 'a_b'):
+        partial = lambda g: os.path.join(partials_dir, re.sub(r"[^\w-]", '_', g) + '_' + short_hash(g) + '.bc')
+
+        def outdated(group, members):
+            target = partial(group)
+
+            if old_groups.get(group) != sorted(members) or not os.path.isfile(target):
+                return True
+
+            mtime = os.path.getmtime(target)
+            return any(os.path.getmtime(m) > mtime for m in members)
+
+        outdated_groups = [g for g, m in groups.items() if outdated(g, m)]
+
+        self.logger.debug(f"relink {len(outdated_groups)} of {len(groups)} partial modules")
+
+        def link_group(group):
+            warn = compiler.link(partial(group), groups[group])
+            if warn:
+                self.logger.warning(f"linker warning in partial '{group}': '{warn}'")
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            # list() to propagate the exceptions of the workers:
+            list(pool.map(link_group, outdated_groups))
+
+        # remove partials of groups that don't exist anymore:
+        for group in set(old_groups) - set(groups):
+            try:
+                os.remove(partial(group))
+            except FileNotFoundError:
+                pass
+
+        with open(partials_file, 'w') as f:
+            f.write(json.dumps({g: sorted(m) for g, m in groups.items()}, indent=4))
+
+        return [partial(g) for g in sorted(groups)]
+
+    def rename(self):
+        """ Start the renaming process on generated self.lib.target.
+
+        Returns:
+            The mapping from rename.py
+        """
+
+        tmp_dir = tools.generate_tmp_dir()
+        tmp_file = os.path.basename(self.lib.target).split('.')[0] + '.ll'
+
+        file_ll = os.path.join(tmp_dir, tmp_file)
+        file_ll_rn = os.path.join(tmp_dir, "new_" + tmp_file)
+
+        self.logger.debug(f"tmp build dir is '{tmp_dir}'")
+
+        compiler.disassemble(file_ll, self.lib.target)
+
+        mapping = rename(file_ll_rn, file_ll, self.lib.name)
+
+        # compile the renamed code stored in file_ll_rn and write it as
+        # the used binary blob:
+
+        shutil.copyfile(self.lib.target, self.lib.target + ".unrenamed")
+
+        compiler.assemble(self.lib.target, file_ll_rn)
+        tools.cleanup_tmp_dir(tmp_dir)
+
+        return mapping
+
+    def inject_wrappers(self, filename, shards_dir=None):
+        """ This method compiles the given wrapper code into the lib build directory.
+        It's used to include the call-wrappers. If the call wrappers are sharded (see
+        build_call_wrappers()), every shard is compiled on its own and in parallel. A shard is
+        only recompiled if its source (or the compiler flags) changed since the last build.
+
+        Args:
+            filename: path to the source file of the call wrappers
+            shards_dir: directory holding the shards (default: see wrapper_shards_dir())
+
+        Returns:
+            The list of the filenames of the new files in order to know the paths that should be
+            linked in at further processes.
+        """
+
+        cflags = "-S -emit-llvm -g -fno-builtin {0}".format(self.lib.compiler_flags)
+
+        shards_dir = shards_dir or wrapper_shards_dir({'wrappers': filename})
+        shards_file = os.path.join(shards_dir, WRAPPER_SHARDS_FILE)
+
+        if not os.path.isfile(shards_file):
+            target = os.path.join(self.lib.builddir, "./wrapper.ll")
+            compiler.compile_file(target, filename, cflags, self.lib.directory)
+            return [target]
+
+        with open(shards_file) as f:
+            shards = json.loads(f.read())
+
+        wrappers_dir = os.path.join(self.lib.builddir, Builder.WRAPPERS_DIR)
+        wrappers_file = os.path.join(self.lib.builddir, Builder.FILENAME_WRAPPERS)
+
+        os.makedirs(wrappers_dir, exist_ok=True)
+
+        try:
+            with open(wrappers_file) as f:
+                old_hashes = json.loads(f.read())
+        except:
+            old_hashes = dict()
+
+        source = lambda s: os.path.join(shards_dir, s + '.c')
+        target = lambda s: os.path.join(wrappers_dir, s + '.ll')
+
+        def digest(shard):
+            with open(source(shard), 'rb') as f:
+                return hashlib.sha256(f.read() + cflags.encode()).hexdigest()
+
+        hashes = {s: digest(s) for s in shards}
+        outdated = [s for s in shards if old_hashes.get(s) != hashes[s] or not os.path.isfile(target(s))]
+
+        self.logger.debug(f"compile {len(outdated)} of {len(shards)} call wrapper shards")
+
+        def compile_shard(shard):
+            warn = compiler.compile_file(target(shard), source(shard), cflags, self.lib.directory)
+            if warn:
+                self.logger.warning(f"compiler warning in call wrapper shard '{shard}': '{warn}'")
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            # list() to propagate the exceptions of the workers:
+            list(pool.map(compile_shard, outdated))
+
+        # remove compiled shards that don't exist anymore:
+        for shard in set(old_hashes) - set(shards):
+            try:
+                os.remove(target(shard))
+            except FileNotFoundError:
+                pass
+
+        with open(wrappers_file, 'w') as f:
+            f.write(json.dumps(hashes, indent=4))
+
+        return [target(s) for s in sorted(shards)]
+
+    def index_symbols(self, files):
+        """ Update the symbol index of the library (symbol -> defining file, callees and
+        referenced globals) for the given compiled files. Only changed files are scanned.
+
+        Args:
+            files: list of paths to the compiled files (LLVM IR code)
+        """
+
+        index = self.lib.build.load_symbol_index()
+        scanned = index.update(files)
+        index.close()
+
+        self.logger.debug(f"scanned {len(scanned)} of {len(files)} files for symbols")
+
+    def strip(self, config, mapping):
+        """ Build the slim blob self.lib.slim_target. It holds the call wrappers and the functions
+        of the function database (and everything they need). Every other function is internalized
+        and removed by dead code elimination.
+
+        Args:
+            config: configuration holding at least the key ['functions']
+            mapping: the rename mapping of self.lib.target
+
+        Returns:
+            A dictionary describing the sizes of the full and the slim blob
+        """
+
+        names = list(config['functions'].keys())
+        names += [f"lib_entry_{f}" for f in config['functions'].keys()]
+
+        symbols = [mapping['@' + n][1:] for n in names if '@' + n in mapping]
+
+        warn = compiler.strip(self.lib.slim_target, self.lib.target, symbols)
+        if warn:
+            self.logger.warning(f"optimizer warning '{warn}'")
+
+        report = {
+            'target': os.path.getsize(self.lib.target),
+            'slim_target': os.path.getsize(self.lib.slim_target),
+            'symbols': len(symbols)
+        }
+
+        with open(os.path.join(self.lib.builddir, Builder.FILENAME_SIZE_REPORT), 'w') as f:
+            f.write(json.dumps(report, indent=4))
+
+        ratio = report['slim_target'] / report['target'] if report['target'] else 0
+
+        self.logger.info(f"size of blob:      {report['target']} bytes")
+        self.logger.info(f"size of slim blob: {report['slim_target']} bytes ({ratio:.1%})")
+
+        return report
+
+    def cache_key(self, config, slim):
+        """ Calculate the key of the build of this library in the artifact cache. It covers the
+        content of every source file and of every header below the library directory, the
+        compiler flags, the versions of the toolchain, the call wrappers and the function
+        database.
+
+        Returns:
+            The key as hex string (see artifacts.key()).
+        """
+
+        sources = {p: tools.file_hash(os.path.join(self.lib.directory, p)) for p in self.lib.sources()}
+
+        headers = dict()
+        for root, _, names in os.walk(self.lib.directory):
+            for name in names:
+                if name.endswith('.h'):
+                    path = os.path.join(root, name)
+                    headers[os.path.relpath(path, self.lib.directory)] = tools.file_hash(path)
+
+        wrappers = dict()
+        if config['wrappers']:
+            shards_dir = wrapper_shards_dir(config)
+            paths = [os.path.abspath(config['wrappers'])]
+            if os.path.isdir(shards_dir):
+                paths += [os.path.join(shards_dir, f) for f in sorted(os.listdir(shards_dir))]
+            wrappers = {os.path.basename(p): tools.file_hash(p) for p in paths if os.path.isfile(p)}
+
+        toolchain = [artifacts.tool_version(t) for t in [compiler.COMPILER, compiler.LINKER,
+                     compiler.ASSEMBLER, compiler.DISASSEMBLER, compiler.OPTIMIZER]]
+
+        return artifacts.key('builder', self.lib.name, self.lib.compiler_flags, sources, headers,
+                             wrappers, sorted(config['functions']), slim, toolchain)
+
+    def cached_files(self, slim):
+        """ Returns:
+            The outputs of the build that are stored in the artifact cache (relative to the
+            build directory).
+        """
+
+        files = [self.lib.target, self.lib.target + ".unrenamed", self.lib.rename_mapping,
+                 os.path.join(self.lib.builddir, Build.FILENAME_SYMBOL_INDEX)]
+
+        if slim:
+            files += [self.lib.slim_target, self.lib.slim_target + '.symbols',
+                      os.path.join(self.lib.builddir, Builder.FILENAME_SIZE_REPORT)]
+
+        return [os.path.relpath(f, self.lib.builddir) for f in files if os.path.isfile(f)]
+
+    def build_coverage(self):
+        """ Compile the blob into the object self.lib.coverage_target instrumented for gcov. The
+        concrete test harnesses link this object in coverage mode, so every replayed input adds
+        to the counters of the library (see coverage.py). The counters of the previous object
+        are removed.
+        """
+
+        target = self.lib.coverage_target
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        for ext in ['.gcda', '.gcno']:
+            try:
+                os.remove(target.rsplit('.', 1)[0] + ext)
+            except FileNotFoundError:
+                pass
+
+        cflags = f"-c -fPIC -g {compiler.COVERAGE_FLAGS}"
+        warn = compiler.compile_file(target, self.lib.target, cflags)
+        if warn:
+            self.logger.warning(f"compiler warning '{warn}'")
+
+    def run(self, config, rebuild, slim=False, cache=None, coverage=False):
+        """ Run the complete build process for that lib.
+
+        Args:
+            config: configuration holding at least the keys ['wrappers']
+            rebuild: boolean that flags if the lib should be rebuild despite already built files
+            slim: boolean that flags if the slim blob should be built, too
+            cache: artifacts.ArtifactCache instance or None. If the cache holds the artifacts of
+                an identical build, they are restored instead of building the library.
+            coverage: boolean that flags if the object instrumented for gcov should be built
+        """
+
+        if cache:
+            key = self.cache_key(config, slim)
+            restored = cache.restore(key, self.lib.builddir)
+
+            if restored:
+                self.lib.build.reload()
+                self.logger.info(f"restored {len(restored)} files from the artifact cache")
+
+                if coverage:
+                    self.build_coverage()
+                return
+
+        self.logger.info("start build process")
+
+        tus = self.pre_compile(rebuild)
+        files = self.link_partials(tus)
+
+        if config['wrappers']:
+            w = os.path.abspath(config['wrappers'])
+            self.logger.debug(f"inject wrappers '{w}'")
+            wrappers = self.inject_wrappers(w, wrapper_shards_dir(config))
+            files += wrappers
+            tus = tus + wrappers
+
+        self.logger.debug("update symbol index")
+        self.index_symbols(tus)
+
+        self.logger.debug(f"link all files to '{self.lib.target}'")
+        warn = compiler.link(self.lib.target, files)
+        if warn:
+            self.logger.warning(f"linker warning '{warn}'")
+
+        self.logger.debug("rename content")
+        mapping = self.rename()
+
+        with open(self.lib.rename_mapping, 'w') as f:
+            f.write(json.dumps(mapping, indent=4))
+
+        # check integrity; check if every listed function is somehow inside that blob
+        integrity_error = False
+        for f in config['functions'].keys():
+            f = '@' + f
+            if f not in mapping.keys():
+                integrity_error = True
+                self.logger.warning(f"missing function '{f}'")
+
+        if integrity_error:
+            self.logger.error("integrity check failed")
+        else:
+            self.logger.info("integrity check passed")
+
+        if slim:
+            self.logger.debug(f"strip blob to '{self.lib.slim_target}'")
+            self.strip(config, mapping)
+
+        if cache:
+            cache.store(key, self.lib.builddir, self.cached_files(slim))
+
+        # the object embeds the path of its counters, so it isn't cached:
+        if coverage:
+            self.logger.debug(f"build instrumented object '{self.lib.coverage_target}'")
+            self.build_coverage()
+
+        self.logger.info("build finished")
+
+def short_hash(name):
+    """ Returns:
+        A short hash of the given name to keep the mangled names of files apart.
+    """
+
+    return hashlib.sha256(name.encode()).hexdigest()[:8]
+
+# name of the file inside the shards directory listing every shard and its functions:
+WRAPPER_SHARDS_FILE = "shards.json"
+
+def wrapper_shards_dir(config):
+    """ Returns:
+        The directory holding the shards of the call wrappers: config['wrappers_shards'] or the
+        path of config['wrappers'] without extension plus '.shards'.
+    """
+
+    if config.get('wrappers_shards'):
+        return os.path.abspath(config['wrappers_shards'])
+
+    return os.path.abspath(os.path.splitext(config['wrappers'])[0] + '.shards')
+
+def wrapper_shards(db, buckets=1):
+    """ Group the functions of the function database into shards. Functions including the same
+    headers share a shard, so every shard includes only the headers its functions need. Every
+    header group is split into the given number of buckets by the hash of the function names.
+    The shard of a function doesn't depend on any other function, so adding a function to the
+    database only changes the shard holding it.
+
+    Args:
+        db: function database (function name -> list of headers)
+        buckets: number of shards per header group
+
+    Returns:
+        A dictionary mapping the name of every shard to a tuple (headers, functions)
+    """
+
+    shards = dict()
+
+    for funcname in sorted(db.keys()):
+        headers = sorted(set(db[funcname]))
+
+        # the hash tells header groups apart that are mangled to the same name:
+        group = (re.sub(r"[^\w-]", '_', '+'.join(headers))[:48] or "noheader") + '_' + short_hash('+'.join(headers))
+
+        bucket = int(hashlib.sha256(funcname.encode()).hexdigest(), 16) % buckets
+        name = f"{group}_{bucket}" if buckets > 1 else group
+
+        shards.setdefault(name, (headers, list()))[1].append(funcname)
+
+    return shards
+
+def build_call_wrappers(config):
+    """ Generate the source and the header file for the call wrappers. The definitions are split
+    into shards (see wrapper_shards()) that are stored in wrapper_shards_dir(config). The source
+    file config['wrappers'] just includes every shard.
+    
+    Args:
+        config: dictionary serves at least 'function_list', 'wrappers_header' and 'wrappers' where
+        all items serves the path to the proper file. The optional key 'wrappers_buckets' sets
+        the number of shards per header group.
+    """
+
+    from sputnik.language import function_signature
+
+    logger = logging.getLogger("call_wapper")
+
+    logger.info("start building call wrappers")
+
+    #with open(config['function_list']) as f:
+    #    db = json.loads(f.read())
+
+    db = config['functions']
+
+    shards = wrapper_shards(db, config.get('wrappers_buckets', 1))
+    shards_dir = wrapper_shards_dir(config)
+
+    os.makedirs(shards_dir, exist_ok=True)
+
+    fd_h = open(config['wrappers_header'], 'w')
+
+    print("#ifndef __CALL_WRAPPERS", file=fd_h)
+    print("#define __CALL_WRAPPERS", file=fd_h)
+    print("", file=fd_h)
+
+    for shard, (headers, functions) in sorted(shards.items()):
+        lines = list()
+
+        # write defined header for every function of the shard to the source file:
+        for header in headers:
+            lines.append(f"#include <{header}>")
+        lines.append('')
+
+        # build definition and declaration for every function of the shard:
+        for funcname in functions:
+            logger.debug(f"considering function {funcname}")
+
+            f = function_signature(funcname).fork(f"lib_entry_{funcname}")
+
+            # generate the declaration:
+            args = ', '.join([a.name for a in f.args])
+            c = f.definition(f"return {funcname}({args});")
+
+            # generate the definition:
+            d = f.declaration()
+
+            lines += [c, '']
+            print(d, end='\n\n', file=fd_h)
+
+        with open(os.path.join(shards_dir, shard + '.c'), 'w') as fd_s:
+            fd_s.write('\n'.join(lines) + '\n')
+
+    print("#endif", file=fd_h)
+    fd_h.close()
+
+    # remove the shards that don't exist anymore:
+    for f in os.listdir(shards_dir):
+        if f.endswith('.c') and f[:-2] not in shards:
+            os.remove(os.path.join(shards_dir, f))
+
+    with open(os.path.join(shards_dir, WRAPPER_SHARDS_FILE), 'w') as f:
+        f.write(json.dumps({s: fs for s, (_, fs) in sorted(shards.items())}, indent=4))
+
+    with open(config['wrappers'], 'w') as fd_s:
+        for shard in sorted(shards):
+            print(f'#include "{os.path.join(shards_dir, shard + ".c")}"', file=fd_s)
+
+    logger.info(f"call wrappers built finished ({len(shards)} shards)")
+
+def main():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    parser.add_argument('-v', '--verbosity', action='count', help='increase output verbosity')
+    parser.add_argument('-w', '--wrappers', action='store_true', help='rebuild call wrappers')
+    parser.add_argument('-r', '--rebuild', action='store_true', help="don't consider existing compiled files")
+    parser.add_argument('-c', '--config',  default='./configs/config_builder.json', help='path to wrapper file')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of parallel link jobs')
+    parser.add_argument('-s', '--slim', action='store_true', help='build a stripped blob holding listed functions only')
+    parser.add_argument('-n', '--no-cache', action='store_true', help="don't use the artifact cache of the config")
+    parser.add_argument('-C', '--coverage', action='store_true', help='build an object instrumented for gcov as well')
+    args = parser.parse_args()
+
+    # load config:
+    with open(args.config) as f:
+        config = json.load(f)
+
+    # set logging (output) configuration:
+    log_config = {
+        'level': logging.WARNING,
+        'format': "%(asctime)-8s | %(name)s | %(levelname)s | %(message)s",
+        'datefmt': "%H:%M:%S"
+    }
+
+    if args.verbosity == 1:
+        log_config['level'] = logging.INFO
+    elif args.verbosity == 2:
+        log_config['level'] = logging.DEBUG
+
+    logging.basicConfig(**log_config)
+
+    # place the scratch directories of the builds:
+    tools.workspaces.configure(**config.get('workspace', dict()))
+
+    # build call wrappers
+    if args.wrappers:
+        build_call_wrappers(config)
+
+    cache = None if args.no_cache else artifacts.from_config(config)
+
+    # run build process for every library:
+    for lib in config['libs']:
+        Builder.invoke(Library.load(lib), config, args.rebuild, args.jobs, args.slim, cache, args.coverage)
+
+if __name__ == "__main__":
+    main()
+
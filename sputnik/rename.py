@@ -34,6 +34,26 @@ def detect_names(src, sub):
 
     return mapping
 
+def detect_declarations(src):
+    """ This function detects every symbol inside the file of given filename src that is
+    declared but not defined there (functions and global variables) and returns a set of
+    these names without the leading '@'.
+    """
+
+    names = set()
+
+    catchall = re.compile("(?:@(?P<variable_name>\\S+) = (?:[\\w]+ )*external |"
+                          "declare [^@]*@(?P<function_name>[^(\"]+|\"[^\"]*\")\\()")
+
+    with open(src) as fd_src:
+        for line in fd_src:
+            match = re.match(catchall, line)
+
+            if match:
+                names.add((match.group("variable_name") or match.group("function_name")).strip('"'))
+
+    return names
+
 def substitute(dest, src, mapping):
     """ This function substitutes every given symbol s in mapping.keys() by it's
     associated substitution in mapping[s] inside the given file src and
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+""" This module replays the test cases KLEE generated for a test (the .ktest files of the
+klee-out-* directories) natively on every library. The test cases are replayed on the concrete
+test harness of the same test (see TestHarness.replay()), so the symbolic objects map to the
+arguments of that test by their names.
+
+Example:
+
+    $ python -m sputnik.replay ./concrete/strcpy.so ./symex/klee-out-0 ./symex/klee-out-1
+"""
+
+import logging
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+from sputnik import concrete
+from sputnik import ktest
+from sputnik.inputs import numpy
+
+# the loaded concrete test harnesses of this process:
+_targets = dict()
+
+def load_target(path):
+    if path not in _targets:
+        _targets[path] = concrete.ConcreteTarget(path)
+    return _targets[path]
+
+def build_records(layout, ktests):
+    """ Build the input records of the given test cases. Every symbolic object is mapped to
+    the argument of the same name. Objects without argument (like KLEE's 'model_version') are
+    ignored and arguments without object are zero.
+
+    Args:
+        layout: inputs.InputLayout of the concrete test harness
+        ktests: list of ktest.KTest instances
+
+    Returns:
+        A NumPy array of the records.
+    """
+
+    np = numpy()
+    logger = logging.getLogger("replay")
+
+    records = np.zeros((len(ktests), layout.record_size), dtype=np.uint8)
+    names = {f.name for f in layout.fields}
+
+    for i, test in enumerate(ktests):
+        values = {name: data for name, data in test.objects if name in names}
+
+        for name, data in values.items():
+            if len(data) != layout.field(name).size:
+                logger.warning(f"{test.path}: size of '{name}' is {len(data)} instead of "
+                               f"{layout.field(name).size} (different array width?)")
+
+        records[i] = np.frombuffer(layout.pack(values), dtype=np.uint8)
+
+    return records
+
+def replay_directory(target_path, directory):
+    """ Replay every test case of a KLEE output directory.
+
+    Returns:
+        A list holding a dictionary for every test case with the keys 'test', 'errors',
+        'input', 'outputs' (a dictionary mapping every library to its decoded output or to
+        the signal that crashed it) and 'assignment' (the cluster of every library).
+    """
+
+    target = load_target(target_path)
+    ktests = ktest.load_directory(directory)
+
+    if not ktests:
+        return list()
+
+    records = build_records(target.layout, ktests)
+    outputs, status = target.run(records)
+    assignments = concrete.cluster(outputs, status)
+
+    target.dump_coverage()
+
+    results = list()
+
+    for i, test in enumerate(ktests):
+        libs = dict()
+
+        for j, lib in enumerate(target.libs):
+            if status[i, j] == concrete.SKIPPED:
+                libs[lib] = "skipped (assumption violated)"
+            elif status[i, j]:
+                libs[lib] = f"crashed (signal {status[i, j]})"
+            else:
+                libs[lib] = target.decode_output(outputs[i, j])
+
+        results.append({
+            'test': test.path,
+            'errors': [os.path.basename(e) for e in test.errors()],
+            'input': target.layout.unpack(records[i]),
+            'outputs': libs,
+            'assignment': concrete.assignment_string(target.libs, assignments[i]),
+        })
+
+    return results
+
+def replay(target_path, directories, jobs=None):
+    """ Replay the test cases of every given KLEE output directory on the concrete test harness.
+    The directories are replayed in parallel.
+
+    Returns:
+        A dictionary mapping every directory to the result of replay_directory().
+    """
+
+    target_path = os.path.abspath(target_path)
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(replay_directory, [target_path] * len(directories), directories)
+        return dict(zip(directories, results))
+
+def format_value(value):
+    if isinstance(value, bytes):
+        return repr(value.split(b'\0', 1)[0]) + f" ({value.hex()})"
+    return repr(value)
+
+def print_results(results, errors_only=False):
+    for directory, tests in results.items():
+        print(f"[+] {directory}: {len(tests)} test cases")
+
+        for test in tests:
+            if errors_only and not test['errors']:
+                continue
+
+            errors = f" [{', '.join(test['errors'])}]" if test['errors'] else ""
+            print(f"[>] {os.path.basename(test['test'])}{errors}")
+
+            for name, value in test['input'].items():
+                print(f"    input  {name} = {format_value(value)}")
+
+            for lib, output in test['outputs'].items():
+                if isinstance(output, dict):
+                    output = ', '.join(f"{k} = {format_value(v)}" for k, v in output.items())
+                print(f"    {lib}: {output}")
+
+            print("    clusters: " + test['assignment'].strip().replace('\n', ', '))
+
+def main():
+    """ This function is called if this script should be run standalone. """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay KLEE test cases on every library')
+    parser.add_argument('target', help='path to the shared object of the concrete test harness')
+    parser.add_argument('directories', nargs='+', help='KLEE output directories (klee-out-*)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of parallel replays')
+    parser.add_argument('-e', '--errors-only', action='store_true', help='print test cases with errors only')
+    args = parser.parse_args()
+
+    print_results(replay(args.target, args.directories, args.jobs), args.errors_only)
+
+if __name__ == "__main__":
+    main()
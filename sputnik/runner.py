@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+""" This module runs the build of given tests from the command line. Every test is built for
+every requested array width and all builds are interleaved by the orchestrator (see
+orchestrator.py). The blobs are stored in {output}/{function}/{engine}_{width}_{n}.
+
+Example:
+
+    # mytests.py:
+    from sputnik import TestHarness
+    from sputnik.runner import runner
+
+    class isalnum(TestHarness):
+        ...
+
+    if __name__ == "__main__":
+        runner(isalnum)
+
+    $ python mytests.py -c ./configs/config_crafter.json -o ./targets -e symex -w 4 8 -j 8
+
+The same builds are started without a script of their own by naming the tests:
+
+    $ sputnik craft mytests.py:isalnum -c ./configs/config_crafter.json -w 4 8
+"""
+
+# this module is imported by test files and the daemon, so every import that isn't needed by all
+# of them is placed inside of the functions:
+import itertools
+import os
+import sys
+import threading
+
+# imported test files: path -> (mtime, module)
+_modules = dict()
+_modules_lock = threading.Lock()
+
+def test_spec(test):
+    """ Make the file of a test spec absolute, so it is found from every directory. """
+
+    location, _, name = test.rpartition(':')
+    if location.endswith('.py'):
+        return f"{os.path.abspath(location)}:{name}"
+    return test
+
+def load_test(spec):
+    """ Load a test class by its spec 'path/to/file.py:name' or 'package.module:name'. A file is
+    imported again if it changed since the last import.
+
+    Returns:
+        The test class.
+    """
+
+    location, _, name = spec.rpartition(':')
+    if not location:
+        raise ValueError(f"invalid test '{spec}', expected 'file.py:name' or 'module:name'")
+
+    if not location.endswith('.py'):
+        import importlib
+        return getattr(importlib.import_module(location), name)
+
+    path = os.path.abspath(location)
+    mtime = os.stat(path).st_mtime_ns
+
+    with _modules_lock:
+        if path not in _modules or _modules[path][0] != mtime:
+            _modules[path] = (mtime, import_file(path))
+
+        return getattr(_modules[path][1], name)
+
+def import_file(path):
+    """ Import a test file under a module name other than __main__, so its runner() isn't run. """
+    import importlib.util
+
+    module_name = "sputnik_test_" + os.path.basename(path)[:-3]
+    module_spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(module_spec)
+
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        module_spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(os.path.dirname(path))
+
+    return module
+
+def folders(base):
+    """ Yield the folders base_0, base_1, ... that didn't exist yet and create them. A folder
+    is claimed by creating it, so concurrent builds (e.g. of two daemon clients) never share one.
+    """
+
+    os.makedirs(os.path.dirname(base) or '.', exist_ok=True)
+
+    for n in itertools.count():
+        folder = f"{base}_{n}"
+        try:
+            os.mkdir(folder)
+        except FileExistsError:
+            continue
+        yield folder
+
+def create_builds(tests, output, engine, widths, symbolic=False):
+    """ Create a prepared instance of every test for every array width. With symbolic set, a
+    single instance covers every width up to the largest one (see TestHarness.symbolic_width).
+
+    Returns:
+        A list of tuples (test, folder_iter) as expected by orchestrator.build_many().
+    """
+
+    builds = list()
+
+    if symbolic and widths:
+        widths = [max(widths)]
+
+    for cls in tests:
+        for width in widths or [None]:
+            test = cls()
+            if width is not None:
+                test.array_width = width
+            if symbolic:
+                test.symbolic_width = True
+
+            getattr(test, f"set_engine_{engine}")()
+            test.prepare()
+
+            width = f"sym{test.array_width}" if test.width_symbolic() else test.array_width
+            base = os.path.join(output, test.function, f"{engine}_{width}")
+            builds.append((test, folders(base)))
+
+    return builds
+
+def add_arguments(parser):
+    """ Add the arguments of a build to the given argparse.ArgumentParser. """
+
+    parser.add_argument('-c', '--config', default='./configs/config_crafter.json', help='path to the crafter config')
+    parser.add_argument('-o', '--output', default='./targets', help='folder the targets are stored in')
+    parser.add_argument('-e', '--engine', default='symex', choices=['symex', 'fuzzing', 'libfuzzer', 'concrete'])
+    parser.add_argument('-w', '--widths', type=int, nargs='*', default=None, help='array widths (default: general_max_array_width)')
+    parser.add_argument('-s', '--symbolic-width', action='store_true', help='cover every width up to the largest one by a single symex target')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of toolchain steps running at once')
+    parser.add_argument('-t', '--test-harness', action='store_true', help='keep the test harness in the target folder')
+    parser.add_argument('-v', '--verbose', action='store_true', help='increase output verbosity')
+
+def build(tests, args):
+    """ Build every given test class as described by the parsed arguments (see add_arguments()).
+
+    Returns:
+        The number of failed builds.
+    """
+
+    import logging
+
+    from sputnik import orchestrator
+    from sputnik.crafter import TestHarness
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)-8s | %(name)s | %(levelname)s | %(message)s", datefmt="%H:%M:%S")
+
+    TestHarness.load_general_config(args.config)
+
+    builds = create_builds(tests, args.output, args.engine, args.widths, args.symbolic_width)
+    results = orchestrator.build_all(builds, args.jobs, test_harness=args.test_harness)
+
+    failed = 0
+    for (test, _), result in zip(builds, results):
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"[!] {test.function} (width {test.array_width}): {result}")
+        else:
+            for blob in result:
+                print(f"[+] {blob}")
+
+    return failed
+
+def runner(*tests):
+    """ Parse the command line and build every given test class. """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build test harnesses')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    return build(tests, args)
+
+def main():
+    """ This function is called if this script should be run standalone. """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build test harnesses')
+    parser.add_argument('tests', nargs='+', help="tests like 'path/to/tests.py:isalnum'")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    return 1 if build([load_test(test_spec(t)) for t in args.tests], args) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+
+""" This module schedules KLEE over many blobs (see TestHarness.build_target() with the symex
+engine) with a global time budget. Every blob starts with a short slice. After a slice the
+progress of that run is read from the run.stats of KLEE: a blob that is still covering new
+instructions (or generating new tests) at the end of its slice gets a doubled slice, which is
+seeded with the tests of its previous runs (--seed-dir). Blobs whose run terminated before its
+slice ran out are exhausted, blobs without progress are saturated. The remaining budget is
+always given to the blobs with the highest rate of progress first. Every decision is recorded
+in the report.
+
+The budget is measured in core seconds: a budget of one hour on 8 jobs are 8 core hours.
+
+Example:
+
+    $ python -m sputnik.scheduler ./targets/*/*.bc -b 3600 -j 8 -o schedule.json
+"""
+
+import glob
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import time
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+KLEE = "klee"
+
+# the progress is measured over this last fraction of a run:
+WINDOW = 0.25
+
+class Target:
+    """ This class holds the state of a single blob of the campaign. """
+
+    def __init__(self, blob, root=None):
+        """ Args:
+            blob: path to the blob
+            root: directory the name of the target is relative to (default: the directory of
+                the blob)
+        """
+
+        self.blob = os.path.abspath(blob)
+        # the function of the blob, shared by the blobs of every array width:
+        self.function = os.path.basename(self.blob).rsplit('.', 1)[0]
+        # unique name of the blob like 'strcpy/symex_8_0/strcpy.bc':
+        self.name = os.path.relpath(self.blob, root or os.path.dirname(self.blob))
+        self.runs = list()
+        self.state = 'pending'
+        self.rate = float('inf')
+        self.next_slice = None
+
+    @property
+    def used(self):
+        return sum(run['duration'] for run in self.runs)
+
+    def output_dir(self, n):
+        return os.path.join(os.path.dirname(self.blob), f"klee-sched-{n}")
+
+    def next_output_dir(self):
+        n = 0
+        while os.path.exists(self.output_dir(n)):
+            n += 1
+        return self.output_dir(n)
+
+    def seed_dirs(self):
+        return [run['output'] for run in self.runs if glob.glob(os.path.join(run['output'], '*.ktest'))]
+
+def read_stats(directory):
+    """ Read the run.stats of a KLEE output directory. KLEE writes it as SQLite database (since
+    KLEE 2.0) or as text file holding a header tuple followed by one tuple per line.
+
+    Returns:
+        A list of dictionaries (one per sample) mapping the names of the statistics to their
+        values.
+    """
+
+    path = os.path.join(directory, "run.stats")
+
+    if not os.path.isfile(path):
+        return list()
+
+    with open(path, 'rb') as f:
+        sqlite = f.read(16) == b'SQLite format 3\0'
+
+    if sqlite:
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            cursor = db.execute("SELECT * FROM stats ORDER BY rowid")
+            names = [d[0] for d in cursor.description]
+            return [dict(zip(names, row)) for row in cursor]
+        finally:
+            db.close()
+
+    import ast
+
+    samples = list()
+    with open(path) as f:
+        names = ast.literal_eval(f.readline())
+        for line in f:
+            try:
+                samples.append(dict(zip(names, ast.literal_eval(line))))
+            except (ValueError, SyntaxError):
+                # the last line may be incomplete if KLEE was killed:
+                break
+
+    return samples
+
+def progress(directory, start, end):
+    """ Measure the progress of a KLEE run.
+
+    Args:
+        directory: KLEE output directory of the run
+        start, end: time stamps of the start and the end of the run
+
+    Returns:
+        A dictionary with the covered instructions and the number of tests at the end of the
+        run and the number of newly covered instructions and new tests per second in the last
+        WINDOW of the run.
+    """
+
+    samples = read_stats(directory)
+    tests = glob.glob(os.path.join(directory, '*.ktest'))
+
+    covered, recent = 0, 0
+    if samples:
+        wall = lambda s: s.get('WallTime', 0) / (1e6 if isinstance(s.get('WallTime'), int) else 1)
+        last = wall(samples[-1])
+        window = [s for s in samples if wall(s) >= last * (1 - WINDOW)]
+        covered = samples[-1].get('CoveredInstructions', 0)
+        recent = covered - window[0].get('CoveredInstructions', 0)
+
+    # the tests of the last window (by their modification time):
+    span = max((end - start) * WINDOW, 1e-3)
+    new_tests = len([t for t in tests if os.path.getmtime(t) >= end - span])
+
+    return {
+        'covered': covered,
+        'tests': len(tests),
+        'rate': recent / span + new_tests / span,
+    }
+
+class Scheduler:
+    """ This class runs the campaign. """
+
+    def __init__(self, blobs, budget, jobs=None, initial=60, klee_args='', equivalence=None, priorities=None):
+        """ Args:
+            blobs: list of paths to the blobs
+            budget: wall time budget of the campaign in seconds
+            jobs: number of parallel KLEE instances (default: number of cores)
+            initial: first slice of every blob in seconds
+            klee_args: additional arguments for KLEE (before the blob)
+            equivalence: equivalence table (see equivalence.py). Blobs of functions having a
+                single equivalence class are skipped.
+            priorities: list of function names (e.g. the ranking of coverage.py). Pending blobs
+                of these functions start first in this order.
+        """
+
+        # the blobs are named relative to the common output directory of the campaign:
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(b)) for b in blobs]) if blobs else None
+        self.targets = [Target(b, root) for b in blobs]
+        self.jobs = jobs or os.cpu_count()
+        self.budget = budget * self.jobs
+        self.initial = initial
+        self.klee_args = klee_args
+        self.equivalence = equivalence or dict()
+
+        if priorities:
+            order = {name: i for i, name in enumerate(priorities)}
+            self.targets.sort(key=lambda t: order.get(t.function, len(order)))
+
+        self.decisions = list()
+        self.started = None
+        self.reserved = 0
+        self.logger = logging.getLogger("scheduler")
+
+    @property
+    def remaining(self):
+        return self.budget - sum(t.used for t in self.targets) - self.reserved
+
+    def decide(self, target, action, reason, budget=None):
+        decision = {
+            'time': round(time.time() - self.started, 1),
+            'target': target.name,
+            'action': action,
+            'reason': reason,
+            'budget': budget,
+            'rate': None if target.rate == float('inf') else round(target.rate, 3),
+        }
+
+        self.decisions.append(decision)
+        self.logger.info(f"{target.name}: {action} ({reason})" + (f" for {budget}s" if budget else ""))
+
+    def run_klee(self, target, budget):
+        """ Run KLEE on the target for budget seconds. Every run after the first one is seeded
+        with the tests of the previous runs. """
+
+        output = target.next_output_dir()
+        seeds = ' '.join(f"--seed-dir={d}" for d in target.seed_dirs())
+        if seeds:
+            seeds += " --allow-seed-extension --allow-seed-truncation"
+
+        call = f"{KLEE} --output-dir={output} --max-time={budget}s {seeds} {self.klee_args} {target.blob}"
+
+        start = time.time()
+        with open(output + '.log', 'w') as log:
+            proc = subprocess.run(call, shell=True, stdout=log, stderr=subprocess.STDOUT,
+                                  cwd=os.path.dirname(target.blob))
+        end = time.time()
+        duration = end - start
+
+        run = {'output': output, 'budget': budget, 'duration': round(duration, 1),
+               'returncode': proc.returncode}
+        run.update(progress(output, start, end))
+
+        # KLEE stopped before its time ran out, so every path is explored (or it failed):
+        run['exhausted'] = duration < 0.9 * budget
+
+        return run
+
+    def evaluate(self, target, run):
+        """ Decide how to continue with the target after one of its runs finished. """
+
+        target.runs.append(run)
+        target.rate = run['rate']
+
+        if run['returncode'] != 0 and not run['tests']:
+            target.state = 'failed'
+            self.decide(target, 'stop', f"KLEE failed with {run['returncode']}")
+        elif run['exhausted']:
+            target.state = 'exhausted'
+            self.decide(target, 'stop', "every path explored")
+        elif run['rate'] <= 0:
+            target.state = 'saturated'
+            self.decide(target, 'stop', "no progress in the last part of the run")
+        else:
+            target.state = 'progressing'
+            target.next_slice = run['budget'] * 2
+
+    def next_target(self):
+        """ Choose the next target: every pending target first (by priority), then the progressing target
+        with the highest rate. The slice is shortened to the remaining budget.
+
+        Returns:
+            A tuple (target, budget) or None if nothing should run.
+        """
+
+        candidates = [t for t in self.targets if t.state == 'pending']
+        if candidates:
+            target, budget, reason = candidates[0], self.initial, "initial slice"
+        else:
+            progressing = [(-t.rate, i, t) for i, t in enumerate(self.targets) if t.state == 'progressing']
+            if not progressing:
+                return None
+            target = heapq.nsmallest(1, progressing)[0][2]
+            budget, reason = target.next_slice, "still progressing"
+
+        budget = int(min(budget, self.remaining))
+        if budget < 1:
+            return None
+
+        target.state = 'running'
+        self.decide(target, 'run', reason, budget)
+
+        return target, budget
+
+    def run(self):
+        """ Run the campaign until the budget is exhausted or no blob makes progress.
+
+        Returns:
+            The report of the campaign (see report()).
+        """
+
+        self.started = time.time()
+        running = dict()
+
+        for target in self.targets:
+            if len(self.equivalence.get(target.function, [None, None])) == 1:
+                target.state = 'identical'
+                self.decide(target, 'skip', "every implementation is identical")
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while True:
+                while len(running) < self.jobs:
+                    chosen = self.next_target()
+                    if not chosen:
+                        break
+                    target, budget = chosen
+                    self.reserved += budget
+                    running[pool.submit(self.run_klee, target, budget)] = (target, budget)
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    target, budget = running.pop(future)
+                    self.reserved -= budget
+                    self.evaluate(target, future.result())
+
+        for target in self.targets:
+            if target.state == 'progressing':
+                self.decide(target, 'stop', "budget exhausted")
+
+        return self.report()
+
+    def report(self):
+        return {
+            'budget': self.budget,
+            'used': round(sum(t.used for t in self.targets), 1),
+            'jobs': self.jobs,
+            'decisions': self.decisions,
+            'targets': {t.name: {
+                'blob': t.blob,
+                'function': t.function,
+                'state': t.state,
+                'used': round(t.used, 1),
+                'runs': t.runs,
+            } for t in self.targets},
+        }
+
+def main():
+    """ This function is called if this script should be run standalone. """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run KLEE on many blobs with a global time budget')
+    parser.add_argument('blobs', nargs='+', help='paths to the blobs')
+    parser.add_argument('-b', '--budget', type=int, required=True, help='wall time budget of the campaign in seconds')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of parallel KLEE instances')
+    parser.add_argument('-i', '--initial', type=int, default=60, help='first slice of every blob in seconds')
+    parser.add_argument('-k', '--klee-args', default='', help='additional arguments for KLEE')
+    parser.add_argument('-e', '--equivalence', default=None, help='path to the equivalence table')
+    parser.add_argument('-p', '--priorities', default=None, help='path to a coverage ranking (see coverage.py rank -o)')
+    parser.add_argument('-o', '--output', default='schedule.json', help='path of the report')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(name)s | %(levelname)s | %(message)s")
+
+    table = None
+    if args.equivalence:
+        from sputnik.equivalence import load_table
+        table = load_table(args.equivalence)
+
+    priorities = None
+    if args.priorities:
+        with open(args.priorities) as f:
+            priorities = [entry['function'] for entry in json.load(f)]
+
+    scheduler = Scheduler(args.blobs, args.budget, args.jobs, args.initial, args.klee_args, table, priorities)
+    report = scheduler.run()
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    for name, target in report['targets'].items():
+        print(f"[+] {name}: {target['state']} after {target['used']}s in {len(target['runs'])} runs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+""" This module converts the test cases KLEE generated for a test (the .ktest files of the
+klee-out-* directories) into test cases of the fuzzing test harness of the same test. They are
+written into the testcases folder of the fuzzing target, so afl-fuzz starts with the paths KLEE
+already found. The input encoding is described in {function}.json next to the fuzzing target
+(see TestHarness.build_target_fuzzing()).
+
+Example:
+
+    $ python -m sputnik.seeds ./fuzzing/strcpy.afl ./symex/klee-out-0 ./symex/klee-out-1
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+from sputnik import ktest
+from sputnik.inputs import InputLayout
+from sputnik.replay import build_records
+
+def load_layout(target):
+    """ Load the input layout of a fuzzing target out of {function}.json next to it. """
+
+    with open(target.rsplit('.', 1)[0] + '.json') as f:
+        return InputLayout(json.load(f)['inputs'])
+
+def import_ktests(layout, directories, testcases):
+    """ Write every .ktest file of the given KLEE output directories as fuzzing test case into
+    the folder testcases. Test cases with the same encoding are written only once.
+
+    Args:
+        layout: inputs.InputLayout of the fuzzing test harness
+        directories: list of KLEE output directories
+        testcases: testcases folder of the fuzzing target
+
+    Returns:
+        A list of the paths of the new test cases.
+    """
+
+    logger = logging.getLogger("seeds")
+    os.makedirs(testcases, exist_ok=True)
+
+    existing = set()
+    for name in os.listdir(testcases):
+        with open(os.path.join(testcases, name), 'rb') as f:
+            existing.add(hashlib.sha256(f.read()).hexdigest())
+
+    written = list()
+
+    for directory in directories:
+        tests = ktest.load_directory(directory)
+        if not tests:
+            continue
+
+        for test, record in zip(tests, build_records(layout, tests)):
+            data = layout.to_fuzzing(bytes(record))
+            digest = hashlib.sha256(data).hexdigest()
+
+            if digest in existing:
+                continue
+            existing.add(digest)
+
+            path = os.path.join(testcases, f"testcase_klee_{digest[:16]}")
+            with open(path, 'wb') as f:
+                f.write(data)
+            written.append(path)
+
+        logger.info(f"{directory}: {len(tests)} test cases")
+
+    return written
+
+def main():
+    """ This function is called if this script should be run standalone. """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Seed a fuzzing target with KLEE test cases')
+    parser.add_argument('target', help='path to the fuzzing target ({function}.afl)')
+    parser.add_argument('directories', nargs='+', help='KLEE output directories (klee-out-*)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(name)s | %(levelname)s | %(message)s")
+
+    testcases = os.path.join(os.path.dirname(os.path.abspath(args.target)), "testcases")
+    written = import_ktests(load_layout(args.target), args.directories, testcases)
+
+    print(f"[+] {len(written)} new test cases in {testcases}")
+
+if __name__ == "__main__":
+    main()
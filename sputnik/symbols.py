@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+
+""" This module builds and queries the symbol index of a library. The index is stored as
+SQLite database inside the build directory of the library and it holds for every compiled
+file (translation unit) the defined symbols, the functions every symbol calls and the global
+variables every symbol references. It works on LLVM IR code.
+
+Example:
+
+    $ ipython
+    In [1]: from sputnik import library
+    In [2]: l = library.Library.load("../libs/musl/")
+    In [3]: index = l.build.load_symbol_index()
+    In [4]: index.defining_tu("strcpy")
+    Out[4]: ['src/string/strcpy.ll']
+    In [5]: index.callees("strcpy")
+    Out[5]: ['__stpcpy']
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+# matches every symbol reference like '@foo', '@foo.bar' or '@"foo bar"':
+SYMBOL = re.compile(r'@([-\w$.]+|"[^"]*")')
+
+DEFINE = re.compile(r'define ([^@]*)@([-\w$.]+|"[^"]*")\(')
+DECLARE = re.compile(r'declare [^@]*@([-\w$.]+|"[^"]*")\(')
+GLOBAL = re.compile(r'@([-\w$.]+|"[^"]*") = (.*)')
+
+LOCAL_LINKAGES = ("internal", "private")
+
+# a definition of these linkages is overridden by a strong definition of the same name:
+WEAK_LINKAGES = ("weak", "weak_odr", "linkonce", "linkonce_odr", "common")
+
+def normalize(line):
+    """ This function removes everything from a line of LLVM IR code that doesn't change the
+    semantics of that line but depends on the rest of the module, like metadata attachments,
+    references to attribute groups and comments.
+    """
+
+    line = re.sub(r",?\s*!\w+ !\d+", "", line)
+    line = re.sub(r"\s#\d+", "", line)
+
+    if 'c"' not in line:
+        line = re.sub(r"\s*;.*$", "", line)
+
+    return line.strip()
+
+def scan(src):
+    """ This function scans the LLVM IR code inside the file of given filename src.
+
+    Returns:
+        A dictionary mapping every defined symbol name to a dictionary holding the keys
+        'kind' ('function', 'variable' or 'alias'), 'internal' (True if the symbol isn't
+        visible outside of that file), 'weak' (True if a strong definition overrides it), 'lines' (the normalized code of the definition) and
+        'refs' (the referenced symbols in order of their first appearance), and a dictionary
+        mapping every declared but not defined symbol to its kind.
+    """
+
+    definitions, declarations = dict(), dict()
+    current = None
+
+    def add(name, kind, linkage, text):
+        definitions[name.strip('"')] = {
+            'kind': kind,
+            'internal': any(l in linkage.split() for l in LOCAL_LINKAGES),
+            'weak': any(l in linkage.split() for l in WEAK_LINKAGES),
+            'lines': [normalize(text)],
+        }
+        return definitions[name.strip('"')]
+
+    with open(src) as fd_src:
+        for line in fd_src:
+            if current is not None:
+                if not line.startswith('  call void @llvm.dbg.'):
+                    current['lines'].append(normalize(line))
+                if line.startswith('}'):
+                    current = None
+                continue
+
+            match = DEFINE.match(line)
+            if match:
+                current = add(match.group(2), 'function', match.group(1), line)
+                continue
+
+            match = DECLARE.match(line)
+            if match:
+                declarations[match.group(1).strip('"')] = 'function'
+                continue
+
+            match = GLOBAL.match(line)
+            if match:
+                name, rest = match.groups()
+                linkage = rest.split(' global ')[0].split(' constant ')[0]
+
+                if ' alias ' in f" {rest}":
+                    add(name, 'alias', rest.split(' alias ')[0], line)
+                elif 'external' in linkage.split() or 'extern_weak' in linkage.split():
+                    declarations[name.strip('"')] = 'variable'
+                else:
+                    add(name, 'variable', linkage, line)
+
+    # collect the references of every definition in order of appearance:
+    for name, definition in definitions.items():
+        refs = list()
+
+        for line in definition['lines']:
+            for ref in SYMBOL.findall(line):
+                ref = ref.strip('"')
+                if ref != name and ref not in refs and not ref.startswith('llvm.'):
+                    refs.append(ref)
+
+        # drop false positives (like '@' inside of string constants):
+        definition['refs'] = [r for r in refs if r in definitions or r in declarations]
+
+    return definitions, declarations
+
+def fingerprint(name, definition, internal_names):
+    """ This function calculates the hash of the definition of name as returned by scan().
+    References to symbols in internal_names are replaced by placeholders numbered in the order
+    of their first appearance (like '@<internal0>'), so the hash doesn't depend on the names of
+    file local symbols (like '@.str.1' or static functions) but on which of them is referenced
+    where. A file local definition refers to itself as '@<self>'. The code of the referenced
+    symbols isn't covered, see structural_hash().
+    """
+
+    ordinals = dict()
+
+    def sub(match):
+        ref = match.group(1).strip('"')
+        if ref == name:
+            return '@<self>' if definition['internal'] else match.group(0)
+        if ref not in internal_names:
+            return match.group(0)
+        return f"@<internal{ordinals.setdefault(ref, len(ordinals))}>"
+
+    h = hashlib.sha256()
+    h.update(definition['kind'].encode())
+
+    for line in definition['lines']:
+        h.update(SYMBOL.sub(sub, line).encode() + b'\n')
+
+    return h.hexdigest()
+
+def structural_hash(roots, lookup):
+    """ Calculate a hash of the code reachable from the given symbols. The hash of a definition
+    covers its fingerprint and the hashes of every symbol it references in the order of the
+    references, so two definitions only hash equal if they reference equal code at the same
+    places. Global symbols are hashed with their names, file local symbols without. Cycles are
+    hashed as the distance to the definition the cycle returns to.
+
+    Args:
+        roots: list of tuples (name, context)
+        lookup: function mapping (name, context) to a tuple (key, fingerprint, internal,
+            references) with a unique key of the definition and the list of its references
+            as tuples (name, context), or to None if the symbol isn't defined
+
+    Returns:
+        The hash as hex string.
+    """
+
+    memo, stack = dict(), dict()
+
+    def visit(name, context):
+        """ Returns:
+            A tuple (hash, depth of the outermost definition a cycle inside returns to).
+        """
+
+        symbol = lookup(name, context)
+        if symbol is None:
+            return hashlib.sha256(f"undefined {name}".encode()).hexdigest(), len(stack)
+
+        key, digest, internal, references = symbol
+
+        if key in memo:
+            return memo[key], len(stack)
+        if key in stack:
+            return hashlib.sha256(f"cycle {len(stack) - stack[key]}".encode()).hexdigest(), stack[key]
+
+        depth = stack[key] = len(stack)
+        outermost = depth
+
+        h = hashlib.sha256(f"{'internal' if internal else name} {digest}\n".encode())
+        for reference in references:
+            digest, returns = visit(*reference)
+            h.update(f"{digest}\n".encode())
+            outermost = min(outermost, returns)
+
+        del stack[key]
+
+        # the hash of a definition inside of a cycle depends on the path it is reached by:
+        if outermost >= depth:
+            memo[key] = h.hexdigest()
+
+        return h.hexdigest(), outermost
+
+    h = hashlib.sha256()
+    for root in roots:
+        h.update(visit(*root)[0].encode() + b'\n')
+
+    return h.hexdigest()
+
+class SymbolIndex:
+    """ This class serves the persistent symbol index of a library. Every path of a
+    translation unit is stored relative to the given root directory. """
+
+    # version of the schema and of the hashes (an index of another version is rebuilt):
+    VERSION = 2
+
+    SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS tus (tu TEXT PRIMARY KEY, mtime INTEGER)",
+        "CREATE TABLE IF NOT EXISTS symbols (name TEXT, tu TEXT, kind TEXT, internal INTEGER, hash TEXT, weak INTEGER)",
+        "CREATE TABLE IF NOT EXISTS refs (name TEXT, tu TEXT, ref TEXT, position INTEGER, kind TEXT)",
+        "CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name)",
+        "CREATE INDEX IF NOT EXISTS refs_name ON refs (name, tu)",
+        "CREATE INDEX IF NOT EXISTS refs_ref ON refs (ref)",
+    ]
+
+    # the columns of a symbol (see resolve()):
+    COLUMNS = "name, tu, kind, internal, hash"
+
+    def __init__(self, path, root=None):
+        """ Open (or create) the symbol index stored in the file of given filename path.
+
+        Args:
+            path: path to the SQLite database
+            root: directory the paths of translation units are relative to (default: the
+                directory of path)
+        """
+
+        self.path = path
+        self.root = root or os.path.dirname(os.path.abspath(path))
+        self.lock = threading.Lock()
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+
+        with self.db:
+            if self.db.execute("PRAGMA user_version").fetchone()[0] != SymbolIndex.VERSION:
+                for table in ["tus", "symbols", "refs"]:
+                    self.db.execute(f"DROP TABLE IF EXISTS {table}")
+                self.db.execute(f"PRAGMA user_version = {SymbolIndex.VERSION}")
+
+            for statement in SymbolIndex.SCHEMA:
+                self.db.execute(statement)
+
+    def close(self):
+        self.db.close()
+
+    def query(self, sql, *args):
+        with self.lock:
+            return self.db.execute(sql, args).fetchall()
+
+    def update(self, files):
+        """ Update the index for the given files. Only files that changed since the last
+        update are scanned again and files that aren't given anymore are removed from the index.
+
+        Args:
+            files: list of paths to files holding LLVM IR code
+
+        Returns:
+            The list of translation units (relative to self.root) that were scanned.
+        """
+
+        tus = {os.path.relpath(os.path.abspath(f), self.root): f for f in files}
+        known = dict(self.query("SELECT tu, mtime FROM tus"))
+
+        outdated = [tu for tu, f in tus.items() if known.get(tu) != os.stat(f).st_mtime_ns]
+        removed = [tu for tu in known if tu not in tus]
+
+        with self.lock, self.db:
+            for tu in outdated + removed:
+                self.db.execute("DELETE FROM symbols WHERE tu = ?", (tu,))
+                self.db.execute("DELETE FROM refs WHERE tu = ?", (tu,))
+                self.db.execute("DELETE FROM tus WHERE tu = ?", (tu,))
+
+            for tu in outdated:
+                self.insert(tu, tus[tu])
+
+        return outdated
+
+    def insert(self, tu, path):
+        """ Scan the file of given filename path and insert its symbols as translation unit tu. """
+
+        definitions, declarations = scan(path)
+        internal_names = {n for n, d in definitions.items() if d['internal']}
+
+        def kind(ref):
+            k = definitions[ref]['kind'] if ref in definitions else declarations[ref]
+            return 'global' if k == 'variable' else 'call'
+
+        for name, definition in definitions.items():
+            self.db.execute("INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)", (
+                name, tu, definition['kind'], int(definition['internal']),
+                fingerprint(name, definition, internal_names), int(definition['weak'])
+            ))
+
+            for position, ref in enumerate(definition['refs']):
+                self.db.execute("INSERT INTO refs VALUES (?, ?, ?, ?, ?)",
+                                (name, tu, ref, position, kind(ref)))
+
+        self.db.execute("INSERT INTO tus VALUES (?, ?)", (tu, os.stat(path).st_mtime_ns))
+
+    def defining_tu(self, name):
+        """ Returns:
+            A list of translation units defining the given symbol (global definitions first)
+        """
+
+        rows = self.query("SELECT tu FROM symbols WHERE name = ? ORDER BY internal, weak, tu", name)
+        return [tu for tu, in rows]
+
+    def resolve(self, name, tu=None):
+        """ Resolve the definition a reference to the given symbol inside translation unit tu
+        points to. File local definitions of tu are preferred over global definitions and
+        strong global definitions over weak ones (like the weak aliases of musl).
+
+        Returns:
+            A tuple (name, tu, kind, internal, hash) or None if the symbol isn't defined.
+        """
+
+        if tu is not None:
+            rows = self.query(f"SELECT {self.COLUMNS} FROM symbols WHERE name = ? AND tu = ? AND internal = 1", name, tu)
+            if rows:
+                return rows[0]
+
+        rows = self.query(f"SELECT {self.COLUMNS} FROM symbols WHERE name = ? AND internal = 0 ORDER BY weak, tu", name)
+        return rows[0] if rows else None
+
+    def references(self, name, tu=None, kind=None):
+        symbol = self.resolve(name, tu)
+        if symbol is None:
+            return list()
+
+        sql = "SELECT ref FROM refs WHERE name = ? AND tu = ?"
+        args = [symbol[0], symbol[1]]
+
+        if kind:
+            sql += " AND kind = ?"
+            args.append(kind)
+
+        return [ref for ref, in self.query(sql + " ORDER BY position", *args)]
+
+    def callees(self, name, tu=None):
+        """ Returns:
+            A list of the functions the given symbol calls (or references)
+        """
+
+        return self.references(name, tu, 'call')
+
+    def globals(self, name, tu=None):
+        """ Returns:
+            A list of the global variables the given symbol references
+        """
+
+        return self.references(name, tu, 'global')
+
+    def callers(self, name):
+        """ Returns:
+            A list of tuples (name, tu) of every symbol referencing the given symbol
+        """
+
+        return self.query("SELECT DISTINCT name, tu FROM refs WHERE ref = ?", name)
+
+    def closure(self, roots):
+        """ Calculate every definition that is reachable from the given symbols.
+
+        Args:
+            roots: iterable of symbol names
+
+        Returns:
+            A list of tuples (name, tu, kind, internal, hash) in the order the definitions
+            are found by a breadth first search. Symbols without definition are listed as
+            (name, None, None, None, None).
+        """
+
+        closure, visited = list(), set()
+        queue = [(r, None) for r in roots]
+
+        while queue:
+            name, tu = queue.pop(0)
+            symbol = self.resolve(name, tu) or (name, None, None, None, None)
+
+            if symbol[:2] in visited:
+                continue
+
+            visited.add(symbol[:2])
+            closure.append(symbol)
+
+            if symbol[1] is not None:
+                queue += [(ref, symbol[1]) for ref in self.references(*symbol[:2])]
+
+        return closure
+
+    def closure_hash(self, roots):
+        """ Calculate a hash of every definition that is reachable from the given symbols (see
+        structural_hash()). The hash doesn't depend on the names of file local symbols or on
+        the translation units the definitions are placed in.
+        """
+
+        def lookup(name, tu):
+            symbol = self.resolve(name, tu)
+            if symbol is None:
+                return None
+
+            references = [(ref, symbol[1]) for ref in self.references(*symbol[:2])]
+            return symbol[:2], symbol[4], bool(symbol[3]), references
+
+        return structural_hash([(r, None) for r in roots], lookup)
+
+    def affected(self, tus):
+        """ Determine every global symbol whose closure contains a definition of one of the
+        given translation units.
+
+        Returns:
+            A set of symbol names
+        """
+
+        queue = list()
+        for tu in tus:
+            queue += self.query("SELECT name, tu FROM symbols WHERE tu = ?", tu)
+
+        affected, visited = set(), set()
+
+        while queue:
+            name, tu = queue.pop()
+            if (name, tu) in visited:
+                continue
+            visited.add((name, tu))
+
+            symbol = self.resolve(name, tu)
+            if symbol and not symbol[3]:
+                affected.add(name)
+
+            for caller in self.callers(name):
+                # only references inside tu can point to a file local definition:
+                if symbol and symbol[3] and caller[1] != tu:
+                    continue
+                queue.append(caller)
+
+        return affected
+
+def main():
+    """ This function is called if this script should be run standalone. """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Query the symbol index of a library')
+    parser.add_argument('index', help='path to the symbol index (symbols.db in the build directory)')
+    parser.add_argument('query', choices=['tu', 'callees', 'globals', 'callers', 'closure'])
+    parser.add_argument('symbol', help='name of the symbol (without leading @)')
+    args = parser.parse_args()
+
+    index = SymbolIndex(args.index)
+
+    if args.query == 'tu':
+        result = index.defining_tu(args.symbol)
+    elif args.query == 'callees':
+        result = index.callees(args.symbol)
+    elif args.query == 'globals':
+        result = index.globals(args.symbol)
+    elif args.query == 'callers':
+        result = [f"{name} ({tu})" for name, tu in index.callers(args.symbol)]
+    else:
+        result = [f"{name} ({tu})" for name, tu, *_ in index.closure([args.symbol])]
+
+    for line in result:
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@
 import os
 import shutil
 
+from sputnik.workspace import workspaces
+
 def indent(code, indentation=1, indenter='\t'):
     line_indent = lambda line: indenter * indentation + line
 
@@ -13,11 +15,13 @@ def indent(code, indentation=1, indenter='\t'):
 
     return line_indent(code)
 
-def generate_tmp_dir(tmp='/tmp/', add='sputnik_'):
-    """ Generate a temporary directory with random name.
+def generate_tmp_dir(tmp=None, add='sputnik_'):
+    """ Generate a temporary directory with random name. The directory is taken from the
+    workspace manager (see workspace.py), so it is placed on tmpfs if possible and may be a
+    reused workspace.
 
     Args:
-        tmp: path of forced parent directory
+        tmp: path of forced parent directory (None lets the workspace manager choose)
         add: prefix of the random generated name of the tmp directory
 
     Returns:
@@ -25,24 +29,16 @@ def generate_tmp_dir(tmp='/tmp/', add='sputnik_'):
         path is relative to the base of given tmp.
     """
 
-    from random import choices
-    from string import ascii_lowercase as alphabet
-
-    while True:
-        target = os.path.join(tmp, add + ''.join(choices(alphabet, k=11)))
-
-        if not os.path.isfile(target):
-            os.mkdir(target)
-            return target
+    return workspaces.acquire(add, tmp)
 
 def cleanup_tmp_dir(dirname):
-    """ Remove the temporary generated directory.
+    """ Remove the temporary generated directory (or give it back to the workspace manager).
 
     Args:
         dirname: path to directory that should be deleted
     """
 
-    shutil.rmtree(dirname)
+    workspaces.release(dirname)
 
 def generate_signature_list(lst="../functions/list.json"):
     """ This is a helper function that prints every signature of every
@@ -72,6 +68,36 @@ def copyfile(dest, src):
 
     shutil.copyfile(src, dest)
 
+# cache of file hashes: path -> (mtime_ns, size, hexdigest)
+_file_hashes = dict()
+
+def file_hash(path):
+    """ Calculate the sha256 hash of a file. The hash is cached as long as the mtime and the
+    size of that file doesn't change.
+
+    Args:
+        path: path to the file that should be hashed
+
+    Returns:
+        The hash as hex string.
+    """
+
+    import hashlib
+
+    st = os.stat(path)
+    cached = _file_hashes.get(path)
+
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+
+    _file_hashes[path] = (st.st_mtime_ns, st.st_size, h.hexdigest())
+    return h.hexdigest()
+
 def adjust_path(path, prefix=''):
     return os.path.abspath(os.path.join(prefix, path))
 
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+""" This module triages the findings of the testing engines: the crashes afl-fuzz found
+(findings/crashes, caused by sputnik_abort() -> abort()) and the test cases KLEE reported an
+error for. Every finding is replayed natively on the concrete test harness of the same test
+and put into a bucket by (function, assignment of the libraries to clusters, faulting
+location). One representative of every bucket is minimized by delta debugging, so only a small
+set of unique and minimal reproducers is left.
+
+Example:
+
+    $ python -m sputnik.triage ./concrete/strcpy.so --afl ./fuzzing --klee ./symex/klee-out-* -o ./triage
+"""
+
+import glob
+import json
+import logging
+import os
+import re
+
+from concurrent.futures import ProcessPoolExecutor
+
+from sputnik import concrete
+from sputnik import ktest
+from sputnik.inputs import numpy
+from sputnik.replay import load_target, build_records
+
+SIGNALS = {4: "SIGILL", 6: "SIGABRT", 7: "SIGBUS", 8: "SIGFPE", 11: "SIGSEGV"}
+
+def klee_location(path):
+    """ Read the faulting location out of a KLEE error report. Errors raised by the test
+    harness itself (sputnik_error) don't have a location. """
+
+    if path.endswith('.sputnik_error.err'):
+        return None
+
+    with open(path, errors='replace') as f:
+        report = f.read()
+
+    kind = os.path.basename(path).split('.')[-2]
+    location = re.search(r"^File: (.*)\nLine: (\d+)", report, re.MULTILINE)
+
+    if location:
+        return f"{kind} at {os.path.basename(location.group(1))}:{location.group(2)}"
+    return kind
+
+def native_location(libs, status):
+    """ Describe the libraries that crashed while replaying a finding. """
+
+    crashes = [f"{lib}: {SIGNALS.get(s, f'signal {s}')}" for lib, s in zip(libs, status)
+               if s and s != concrete.SKIPPED]
+    return ', '.join(crashes) or None
+
+def bucket_keys(target, records, locations=None):
+    """ Replay the records and determine the bucket of every record.
+
+    Args:
+        target: concrete.ConcreteTarget instance
+        records: NumPy array of input records
+        locations: list of faulting locations reported by the engine (or None) for every record
+
+    Returns:
+        A list of tuples (function, assignment, location) or None for records that don't show
+        a divergence (or violate an assumption).
+    """
+
+    outputs, status = target.run(records)
+    assignments = concrete.cluster(outputs, status)
+
+    keys = list()
+
+    for i in range(len(records)):
+        location = native_location(target.libs, status[i])
+        if locations and locations[i]:
+            location = f"{locations[i]}; {location}" if location else locations[i]
+
+        skipped = (status[i] == concrete.SKIPPED).any()
+        if skipped or ((assignments[i] == 1).all() and not location):
+            keys.append(None)
+            continue
+
+        assignment = concrete.assignment_string(target.libs, assignments[i])
+        keys.append((target.function, assignment, location))
+
+    return keys
+
+def minimize(target_path, record, key, location=None, max_rounds=1000):
+    """ Minimize a record by delta debugging: bytes are set to zero as long as the record stays
+    in the same bucket. Every round tests all candidates of a partition in a single batch.
+
+    Args:
+        target_path: path to the concrete test harness
+        record: the record as bytes
+        key: the bucket of that record (see bucket_keys())
+        location: the faulting location reported by the engine for that record
+
+    Returns:
+        The minimized record as bytes.
+    """
+
+    np = numpy()
+    target = load_target(target_path)
+
+    record = np.frombuffer(record, dtype=np.uint8).copy()
+    kept = list(np.flatnonzero(record))
+    n = 2
+
+    def candidate(positions):
+        c = np.zeros_like(record)
+        c[positions] = record[positions]
+        return c
+
+    for _ in range(max_rounds):
+        if len(kept) < 2:
+            break
+
+        n = min(n, len(kept))
+        subsets = [kept[i * len(kept) // n:(i + 1) * len(kept) // n] for i in range(n)]
+        complements = [[p for p in kept if p not in s] for s in map(set, subsets)]
+
+        # test every subset and every complement at once:
+        configurations = subsets + complements
+        candidates = np.stack([candidate(c) for c in configurations])
+        keys = bucket_keys(target, candidates, [location] * len(candidates))
+
+        passing = [c for c, k in zip(configurations, keys) if k == key]
+
+        if passing:
+            smallest = min(passing, key=len)
+            n = 2 if len(smallest) <= len(kept) // n else max(n - 1, 2)
+            kept = smallest
+        elif n < len(kept):
+            n = min(2 * n, len(kept))
+        else:
+            break
+
+    # finally try to drop the last remaining bytes one by one:
+    for p in list(kept):
+        c = candidate([q for q in kept if q != p])
+        if bucket_keys(target, c[None, :], [location])[0] == key:
+            kept.remove(p)
+
+    return bytes(candidate(kept))
+
+def collect_findings(target, afl_dirs=(), klee_dirs=()):
+    """ Collect the findings of the given afl-fuzz and KLEE output directories.
+
+    Returns:
+        A tuple (sources, records, locations) with the path, the record and the faulting
+        location reported by the engine of every finding.
+    """
+
+    np = numpy()
+    sources, records, locations = list(), list(), list()
+
+    for directory in afl_dirs:
+        # findings/crashes of a single instance or findings/*/crashes of a campaign:
+        paths = glob.glob(os.path.join(directory, '**', 'crashes', 'id:*'), recursive=True)
+        for path in sorted(paths):
+            with open(path, 'rb') as f:
+                records.append(target.layout.from_fuzzing(f.read()))
+            sources.append(path)
+            locations.append(None)
+
+    for directory in klee_dirs:
+        tests = [t for t in ktest.load_directory(directory) if t.errors()]
+        if tests:
+            records += [bytes(r) for r in build_records(target.layout, tests)]
+            sources += [t.path for t in tests]
+            locations += [klee_location(t.errors()[0]) for t in tests]
+
+    records = np.array([np.frombuffer(r, dtype=np.uint8) for r in records], dtype=np.uint8)
+    return sources, records.reshape(len(sources), target.layout.record_size), locations
+
+def triage(target_path, afl_dirs=(), klee_dirs=(), output=None, jobs=None):
+    """ Replay, bucket and minimize every finding of the given directories.
+
+    Args:
+        target_path: path to the concrete test harness of the test
+        afl_dirs: list of afl-fuzz output directories
+        klee_dirs: list of KLEE output directories
+        output: directory the reproducers are written to (or None)
+        jobs: number of buckets that are minimized in parallel
+
+    Returns:
+        A list holding a dictionary for every bucket.
+    """
+
+    logger = logging.getLogger("triage")
+
+    target_path = os.path.abspath(target_path)
+    target = load_target(target_path)
+
+    sources, records, locations = collect_findings(target, afl_dirs, klee_dirs)
+    keys = bucket_keys(target, records, locations) if len(records) else list()
+
+    buckets = dict()
+    for i, key in enumerate(keys):
+        if key is None:
+            logger.info(f"finding '{sources[i]}' doesn't reproduce")
+            continue
+        buckets.setdefault(key, list()).append(i)
+
+    logger.info(f"{len(records)} findings in {len(buckets)} buckets")
+
+    representatives = [min(b, key=lambda i: np_count(records[i])) for b in buckets.values()]
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        minimized = list(pool.map(minimize, [target_path] * len(buckets),
+                                  [bytes(records[i]) for i in representatives], list(buckets),
+                                  [locations[i] for i in representatives]))
+
+    results = list()
+
+    for n, ((function, assignment, location), members) in enumerate(buckets.items()):
+        record = minimized[n]
+        results.append({
+            'function': function,
+            'assignment': assignment,
+            'location': location,
+            'findings': len(members),
+            'sources': [sources[i] for i in members],
+            'input': {k: v.hex() if isinstance(v, bytes) else v
+                      for k, v in target.layout.unpack(record).items()},
+            'record': record.hex(),
+        })
+
+        if output:
+            folder = os.path.join(output, function, f"bucket_{n:04d}")
+            os.makedirs(folder, exist_ok=True)
+
+            with open(os.path.join(folder, "reproducer.bin"), 'wb') as f:
+                f.write(record)
+            with open(os.path.join(folder, "reproducer.json"), 'w') as f:
+                json.dump(results[-1], f, indent=4)
+
+    if output:
+        os.makedirs(output, exist_ok=True)
+        with open(os.path.join(output, "triage.json"), 'w') as f:
+            json.dump(results, f, indent=4)
+
+    return results
+
+def np_count(record):
+    """ Number of nonzero bytes of a record (used to choose a small representative). """
+
+    return int((record != 0).sum())
+
+def main():
+    """ This function is called if this script should be run standalone. """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Deduplicate and minimize findings')
+    parser.add_argument('target', help='path to the shared object of the concrete test harness')
+    parser.add_argument('--afl', nargs='*', default=[], help='afl-fuzz output directories')
+    parser.add_argument('--klee', nargs='*', default=[], help='KLEE output directories (klee-out-*)')
+    parser.add_argument('-o', '--output', default=None, help='directory to write the reproducers to')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of parallel minimizations')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(name)s | %(levelname)s | %(message)s")
+
+    for bucket in triage(args.target, args.afl, args.klee, args.output, args.jobs):
+        print(f"[+] {bucket['function']}: {bucket['findings']} findings, location: {bucket['location']}")
+        print("    clusters: " + bucket['assignment'].strip().replace('\n', ', '))
+        for name, value in bucket['input'].items():
+            print(f"    input {name} = {value}")
+
+if __name__ == "__main__":
+    main()
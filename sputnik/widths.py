@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+""" This module reports the KLEE tests of symex targets per array width. A target built in
+symbolic width mode ("symbolic_width": true in the crafter config) allocates its arrays with the
+maximal width and covers every smaller width by the symbolic object 'sputnik_width', so a single
+KLEE run replaces the runs of every width. The width of each test is read back from that object.
+The tests of a target built for a fixed width are reported under that width, so both modes can be
+compared by passing the KLEE output directories of either.
+
+Every symex target folder holds a widths.json describing its widths (see
+TestHarness.build_target_symex()):
+
+    {"object": "sputnik_width", "low": 2, "high": 64}
+
+Example:
+
+    $ python -m sputnik.widths ./targets/strcpy/symex_64_0/klee-out-0
+    $ python -m sputnik.widths ./targets/strcpy/symex_*/klee-out-0 -o widths_report.json
+"""
+
+import json
+import logging
+import os
+
+from sputnik import ktest
+
+FILENAME = "widths.json"
+
+def load(directory):
+    """ Load the description of the widths of the target a KLEE output directory belongs to.
+    KLEE writes its output directories next to the blob.
+
+    Returns:
+        The dictionary of widths.json or None if the target doesn't have one.
+    """
+
+    path = os.path.join(os.path.dirname(os.path.abspath(directory)), FILENAME)
+
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def width_of(test, description):
+    """ Returns:
+        The array width of the ktest.KTest instance test or None if it is unknown.
+    """
+
+    if description is None:
+        return None
+
+    if description['object'] is None:
+        return description['high']
+
+    data = test.values().get(description['object'])
+    if data is None:
+        return None
+
+    # size_t of the target (KLEE runs on little endian hosts only):
+    return int.from_bytes(data, 'little')
+
+def error_kind(path):
+    """ Returns:
+        The kind of an error report like 'ptr' for 'test000001.ptr.err'.
+    """
+
+    return os.path.basename(path).rsplit('.', 2)[-2]
+
+def report(directories):
+    """ Group the tests of the given KLEE output directories by their array width.
+
+    Returns:
+        A dictionary mapping every width (None for tests of unknown width) to a dictionary with
+        the number of tests, the number of errors by kind and the names of the tests with errors.
+    """
+
+    logger = logging.getLogger("widths")
+    widths = dict()
+
+    for directory in directories:
+        description = load(directory)
+        if description is None:
+            logger.warning(f"'{directory}' doesn't belong to a target with {FILENAME}")
+
+        for test in ktest.load_directory(directory):
+            width = width_of(test, description)
+
+            entry = widths.setdefault(width, {'tests': 0, 'errors': dict(), 'failing': list()})
+            entry['tests'] += 1
+
+            errors = test.errors()
+            for path in errors:
+                kind = error_kind(path)
+                entry['errors'][kind] = entry['errors'].get(kind, 0) + 1
+
+            if errors:
+                entry['failing'].append(os.path.join(directory, test.name))
+
+    return dict(sorted(widths.items(), key=lambda item: (item[0] is None, item[0] or 0)))
+
+def main():
+    """ This function is called if this script should be run standalone. """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Report the KLEE tests per array width')
+    parser.add_argument('directories', nargs='+', help='KLEE output directories')
+    parser.add_argument('-o', '--output', default=None, help='path of the report (JSON)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(name)s | %(levelname)s | %(message)s")
+
+    widths = report(args.directories)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({str(w): entry for w, entry in widths.items()}, f, indent=4)
+
+    for width, entry in widths.items():
+        errors = ', '.join(f"{n} {kind}" for kind, n in sorted(entry['errors'].items())) or "no errors"
+        print(f"[+] width {'unknown' if width is None else width}: {entry['tests']} tests, {errors}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+""" This module manages the scratch directories (workspaces) of the builds (see
+tools.generate_tmp_dir()). Workspaces are placed on tmpfs (/dev/shm) if it is available, so the
+large .ll files of a build never hit the disk. Released workspaces are emptied and kept in a
+pool for the next build (a reused workspace is renamed to the prefix of its new build). The size of the workspaces
+in use on tmpfs is accounted: every workspace is measured when it is released, a workspace in
+use counts with the largest size measured so far. If the total exceeds the cap, new workspaces
+are placed in the fallback directory (/tmp) instead. With keep set,
+workspaces are never removed, so the artifacts of every build can be inspected afterwards.
+
+The manager is configured by the "workspace" section of the crafter (or builder) configuration:
+
+    "workspace": {
+        "root": "/dev/shm",
+        "pool": 8,
+        "cap": 1073741824,
+        "keep": false
+    }
+
+Setting the environment variable SPUTNIK_KEEP_WORKSPACES=1 keeps the workspaces as well.
+"""
+
+import atexit
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+DEFAULT_ROOT = "/dev/shm"
+FALLBACK_ROOT = "/tmp"
+
+def default_root():
+    if os.path.isdir(DEFAULT_ROOT) and os.access(DEFAULT_ROOT, os.W_OK):
+        return DEFAULT_ROOT
+    return FALLBACK_ROOT
+
+def disk_usage(path):
+    """ Sum the sizes of every file below path (without following symbolic links). Entries
+    that disappear while they are measured are skipped. """
+
+    size = 0
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return 0
+
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                size += disk_usage(entry.path)
+            else:
+                size += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            pass
+    return size
+
+def clear(path):
+    """ Remove everything inside of the directory path but keep the directory itself. """
+
+    for entry in os.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path)
+        else:
+            os.unlink(entry.path)
+
+def rename(path, prefix):
+    """ Rename the empty directory path to a new name with the given prefix. The name is
+    reserved by tempfile.mkdtemp() first, so it never clashes with another directory.
+
+    Returns:
+        The new path.
+    """
+
+    target = tempfile.mkdtemp(prefix=prefix, dir=os.path.dirname(path))
+    # replacing an empty directory is atomic:
+    os.replace(path, target)
+    return target
+
+class WorkspaceManager:
+    def __init__(self, **kwargs):
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger("workspace")
+
+        # workspaces in use (path -> prefix) and released (empty) workspaces as (path, prefix):
+        self.active = dict()
+        self.pooled = list()
+
+        # accounted size of every workspace in use inside self.root and their total:
+        self.sizes = dict()
+        self.used = 0
+
+        # number of created and reused workspaces and the peak size of a released workspace:
+        self.stats = {'created': 0, 'reused': 0, 'peak': 0}
+
+        self.configure(**kwargs)
+
+    def configure(self, root=None, pool=8, cap=1 << 30, keep=None):
+        """ Args:
+            root: directory the workspaces are placed in (default: /dev/shm if writable)
+            pool: maximal number of released workspaces that are kept for reuse
+            cap: maximal number of bytes of all workspaces inside root
+            keep: boolean that flags if workspaces are retained (for debugging)
+        """
+
+        with self.lock:
+            root = root or default_root()
+
+            if self.pooled and root != getattr(self, 'root', root):
+                self.drain()
+
+            self.root, self.pool, self.cap = root, pool, cap
+
+            if keep is None:
+                keep = os.environ.get("SPUTNIK_KEEP_WORKSPACES", "") not in ["", "0"]
+            self.keep = keep
+
+    def usage(self):
+        """ Returns:
+            The accounted number of bytes used by the workspaces inside self.root. A workspace
+            in use counts with the peak size of a released workspace.
+        """
+
+        return self.used
+
+    def inside_root(self, path):
+        return os.path.dirname(path) == self.root.rstrip(os.sep)
+
+    def account(self, path, prefix):
+        """ Mark the workspace path as used (the lock must be held). """
+
+        self.active[path] = prefix
+        if self.inside_root(path):
+            self.sizes[path] = self.stats['peak']
+            self.used += self.sizes[path]
+
+    def acquire(self, prefix='sputnik_', parent=None):
+        """ Get an empty workspace. The directory is created atomically (tempfile.mkdtemp()),
+        so concurrent builds never share a workspace.
+
+        Args:
+            prefix: prefix of the name of the workspace (a pooled workspace of another prefix
+                is renamed)
+            parent: directory the workspace has to be placed in (this disables the pool)
+
+        Returns:
+            The path to the workspace.
+        """
+
+        if parent is not None:
+            return tempfile.mkdtemp(prefix=prefix, dir=parent)
+
+        with self.lock:
+            if self.pooled and not self.keep:
+                # a workspace of the same prefix doesn't need to be renamed:
+                same = [i for i, (_, p) in enumerate(self.pooled) if p == prefix]
+                path, old_prefix = self.pooled.pop(same[-1] if same else -1)
+                if old_prefix != prefix:
+                    path = rename(path, prefix)
+                self.stats['reused'] += 1
+                self.account(path, prefix)
+                return path
+
+            self.stats['created'] += 1
+
+            if self.usage() < self.cap:
+                path = tempfile.mkdtemp(prefix=prefix, dir=self.root)
+            else:
+                self.logger.info(f"workspaces exceed {self.cap} bytes, use {FALLBACK_ROOT}")
+                path = tempfile.mkdtemp(prefix=prefix, dir=FALLBACK_ROOT)
+
+            self.account(path, prefix)
+
+        return path
+
+    def release(self, path):
+        """ Give a workspace back. A workspace inside self.root is emptied and pooled if the
+        pool has space, otherwise it is removed. Unknown directories are just removed. """
+
+        # the build owning the workspace is done, so nobody changes it while it is measured:
+        size = disk_usage(path) if path in self.active else 0
+
+        with self.lock:
+            managed = path in self.active
+            prefix = self.active.pop(path, None)
+            self.used -= self.sizes.pop(path, 0)
+
+            if managed:
+                self.stats['peak'] = max(self.stats['peak'], size)
+
+            poolable = managed and len(self.pooled) < self.pool and self.inside_root(path)
+
+        if self.keep:
+            self.logger.info(f"keep workspace '{path}'")
+        elif poolable:
+            clear(path)
+            with self.lock:
+                self.pooled.append((path, prefix))
+        else:
+            shutil.rmtree(path)
+
+    def drain(self):
+        """ Remove every pooled workspace (the lock must be held). """
+
+        for path, _ in self.pooled:
+            shutil.rmtree(path, ignore_errors=True)
+        self.pooled = list()
+
+    def close(self):
+        with self.lock:
+            self.drain()
+
+# the workspace manager of this process:
+workspaces = WorkspaceManager()
+atexit.register(workspaces.close)